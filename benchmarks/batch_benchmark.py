@@ -0,0 +1,53 @@
+"""
+Measures question-answering throughput one question at a time versus answer_questions batches.
+
+The bot answers questions that arrive close together as one batch (QUESTION_BATCH_WINDOW and
+QUESTION_BATCH_SIZE in main.py): answer_questions runs spaCy's nlp.pipe over the batch and sends every
+question/definition pair to the intent model in one call.
+
+Run from the repository root:
+    python -m benchmarks.batch_benchmark
+"""
+import argparse
+import os
+import time
+from benchmarks.question_corpus import LABELED_QUESTIONS
+from chatbot.country_information_store import CountryInformationStore
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "countries_clean.csv")
+
+
+def run(store, questions, batch_size):
+    # Every cache is cleared so each run pays for the same model work instead of replaying cached answers.
+    store.clear_caches()
+    store.intent_cache.clear()
+    started = time.perf_counter()
+    if batch_size == 1:
+        for question in questions:
+            store.answer_question(question)
+    else:
+        for start in range(0, len(questions), batch_size):
+            store.answer_questions(questions[start:start + batch_size])
+    return len(questions) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", default="1,8,32", help="comma-separated batch sizes to compare")
+    parser.add_argument("--spacy-model", default="en_core_web_lg")
+    arguments = parser.parse_args()
+
+    store = CountryInformationStore(DATA_PATH, spacy_model=arguments.spacy_model)
+    store.warm_up(background=False)
+    questions = [question for question, unused_country, unused_column in LABELED_QUESTIONS]
+    run(store, questions[:4], 4)
+
+    print(f"{len(questions)} questions")
+    for batch_size in (int(size) for size in arguments.batch_sizes.split(",")):
+        label = "one at a time" if batch_size == 1 else f"batches of {batch_size}"
+        print(f"{label:<20}{run(store, questions, batch_size):>10.1f} questions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares the column-intent engines on the labeled question corpus.
+
+CountryInformationStore(intent_engine=...) selects how the question's column is found:
+- "cross-encoder" (default) scores the question against every column definition
+- "bi-encoder" embeds the column definitions once at startup, scores each question with one encode and a
+  dot product, and re-ranks only the top rerank_top_k columns with the cross-encoder
+Each engine's accuracy and per-question latency are reported.
+
+Run from the repository root:
+    python -m benchmarks.intent_benchmark
+"""
+import statistics
+import time
+from sentence_transformers import CrossEncoder, SentenceTransformer
+from benchmarks.question_corpus import LABELED_QUESTIONS
+from chatbot.country_information_store import CountryInformationStore
+from chatbot.intent_engines import BiEncoderIntentEngine, CrossEncoderIntentEngine
+
+
+CROSS_ENCODER_NAME = "cross-encoder/ms-marco-MiniLM-L6-v2"
+BI_ENCODER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_engine(engine, column_order):
+    # One warm-up call so lazy initialization isn't counted.
+    engine.best_index(LABELED_QUESTIONS[0][0])
+    latencies = []
+    correct = 0
+    for question, unused_country, expected_column in LABELED_QUESTIONS:
+        started = time.perf_counter()
+        predicted_column = column_order[engine.best_index(question)]
+        latencies.append((time.perf_counter() - started) * 1000)
+        if predicted_column == expected_column:
+            correct += 1
+    return {
+        "accuracy": correct / len(LABELED_QUESTIONS),
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+    }
+
+
+def main():
+    blueprint = CountryInformationStore.COLUMN_BLUEPRINT
+    definitions = [entry["definition"] for entry in blueprint]
+    column_order = [entry["column"] for entry in blueprint]
+    cross_encoder = CrossEncoder(CROSS_ENCODER_NAME)
+    bi_encoder = SentenceTransformer(BI_ENCODER_NAME)
+
+    engines = [
+        ("cross-encoder", CrossEncoderIntentEngine(cross_encoder, definitions)),
+        ("bi-encoder", BiEncoderIntentEngine(bi_encoder, definitions)),
+        ("bi-encoder + rerank top-3", BiEncoderIntentEngine(bi_encoder, definitions, cross_encoder, top_k=3)),
+    ]
+    print(f"{len(LABELED_QUESTIONS)} questions, {len(definitions)} columns")
+    print(f"{'engine':<28}{'accuracy':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, engine in engines:
+        result = run_engine(engine, column_order)
+        print(f"{label:<28}{result['accuracy']:>10.1%}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
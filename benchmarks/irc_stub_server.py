@@ -0,0 +1,296 @@
+"""
+A small in-process IRC server speaking the subset of the protocol the bot uses.
+
+Supports USER/NICK (answered with 001, or 433 while the nick is taken), JOIN, PART, NAMES (353/366), PRIVMSG, PING/PONG and QUIT.
+Besides real TCP clients it can hold virtual users: members of a channel that exist only inside the
+server, so a load generator can simulate hundreds of people without opening a socket for each.
+Every line received from a real client is checked for framing problems.
+
+Run on its own (then start the bot with --server 127.0.0.1 --port 6667):
+    python -m benchmarks.irc_stub_server --port 6667
+"""
+import argparse
+import asyncio
+import time
+
+
+SERVER_NAME = "stub.irc"
+# RFC 1459 line limit, including the trailing CRLF
+MAX_LINE_BYTES = 512
+
+
+class StubClient:
+    """A connected TCP client."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.nick = None
+        self.user = None
+        self.registered = False
+        self.channels = set()
+
+    @property
+    def prefix(self):
+        return f"{self.nick}!{self.user or self.nick}@127.0.0.1"
+
+    def send(self, line):
+        self.writer.write((line + "\r\n").encode("utf-8"))
+
+
+class VirtualUser:
+    """A channel member simulated inside the server; on_message(sender, target, text) sees what it is sent."""
+
+    def __init__(self, nick, on_message=None):
+        self.nick = nick
+        self.on_message = on_message
+        self.channels = set()
+
+    @property
+    def prefix(self):
+        return f"{self.nick}!{self.nick}@virtual"
+
+    def send(self, line):
+        pass
+
+
+class StubIRCServer:
+    def __init__(self, host="127.0.0.1", port=0, on_join=None):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.clients = {}
+        self.virtual_users = {}
+        self.channels = {}
+        self.connection_tasks = set()
+        # on_join(client, channel_name) is called when a real client joins a channel
+        self.on_join = on_join
+        self.lines_received = 0
+        self.lines_relayed = 0
+        self.oversized_lines = 0
+        self.bare_newline_lines = 0
+        self.undecodable_lines = 0
+        self.started = time.monotonic()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=64 * 1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+        for client in list(self.clients.values()):
+            client.writer.close()
+        # Closed connections end their handlers at EOF; waiting keeps asyncio.run from cancelling them
+        if self.connection_tasks:
+            await asyncio.wait(self.connection_tasks, timeout=5)
+        if self.server:
+            await self.server.wait_closed()
+
+    def framing_errors(self):
+        return self.oversized_lines + self.bare_newline_lines + self.undecodable_lines
+
+    def stats(self):
+        return {
+            "lines_received": self.lines_received,
+            "lines_relayed": self.lines_relayed,
+            "oversized_lines": self.oversized_lines,
+            "bare_newline_lines": self.bare_newline_lines,
+            "undecodable_lines": self.undecodable_lines,
+        }
+
+    def find_member(self, nick):
+        key = nick.lower()
+        return self.clients.get(key) or self.virtual_users.get(key)
+
+    def members(self, channel_name):
+        return self.channels.setdefault(channel_name.lower(), set())
+
+    async def handle_connection(self, reader, writer):
+        client = StubClient(writer)
+        task = asyncio.current_task()
+        self.connection_tasks.add(task)
+        try:
+            while True:
+                try:
+                    raw_line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError as exc:
+                    await reader.readexactly(exc.consumed)
+                    self.oversized_lines += 1
+                    continue
+                self.lines_received += 1
+                if len(raw_line) > MAX_LINE_BYTES:
+                    self.oversized_lines += 1
+                if not raw_line.endswith(b"\r\n") or b"\r" in raw_line[:-2]:
+                    self.bare_newline_lines += 1
+                try:
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                except UnicodeDecodeError:
+                    self.undecodable_lines += 1
+                    continue
+                if line:
+                    self.handle_line(client, line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.disconnect(client, "Connection closed")
+            writer.close()
+            self.connection_tasks.discard(task)
+
+    def handle_line(self, client, line):
+        trailing = None
+        if " :" in line:
+            line, trailing = line.split(" :", 1)
+        params = line.split()
+        command = params.pop(0).upper()
+        if command == "NICK" and (params or trailing):
+            self.change_nick(client, params[0] if params else trailing)
+        elif command == "USER" and params:
+            client.user = params[0]
+            self.try_register(client)
+        elif command == "PING":
+            client.send(f":{SERVER_NAME} PONG {SERVER_NAME} :{trailing or (params[0] if params else '')}")
+        elif command == "PONG":
+            pass
+        elif not client.registered:
+            client.send(f":{SERVER_NAME} 451 * :You have not registered")
+        elif command == "JOIN" and params:
+            for channel_name in params[0].split(","):
+                self.join(client, channel_name)
+        elif command == "PART" and params:
+            self.part(client, params[0])
+        elif command == "NAMES" and params:
+            self.send_names(client, params[0])
+        elif command == "PRIVMSG" and params and trailing is not None:
+            self.privmsg(client, params[0], trailing)
+        elif command == "QUIT":
+            self.disconnect(client, trailing or "Quit")
+            client.writer.close()
+
+    def change_nick(self, client, nick):
+        holder = self.find_member(nick)
+        if holder is client:
+            return
+        if holder:
+            client.send(f":{SERVER_NAME} 433 {client.nick or '*'} {nick} :Nickname is already in use")
+            return
+        old_prefix = client.prefix
+        if client.nick:
+            self.clients.pop(client.nick.lower(), None)
+        client.nick = nick
+        self.clients[nick.lower()] = client
+        if client.registered:
+            client.send(f":{old_prefix} NICK :{nick}")
+            for channel_name in client.channels:
+                self.broadcast(channel_name, f":{old_prefix} NICK :{nick}", exclude=client)
+        self.try_register(client)
+
+    def try_register(self, client):
+        if client.registered or not client.nick or not client.user:
+            return
+        client.registered = True
+        client.send(f":{SERVER_NAME} 001 {client.nick} :Welcome to the stub IRC network {client.prefix}")
+
+    def broadcast(self, channel_name, line, exclude=None):
+        for member in self.members(channel_name):
+            if member is not exclude:
+                member.send(line)
+
+    def join(self, member, channel_name):
+        members = self.members(channel_name)
+        if member in members:
+            return
+        members.add(member)
+        member.channels.add(channel_name.lower())
+        self.broadcast(channel_name, f":{member.prefix} JOIN {channel_name}")
+        if isinstance(member, StubClient):
+            self.send_names(member, channel_name)
+            if self.on_join:
+                self.on_join(member, channel_name)
+
+    def part(self, member, channel_name):
+        members = self.members(channel_name)
+        if member in members:
+            self.broadcast(channel_name, f":{member.prefix} PART {channel_name}")
+            members.discard(member)
+            member.channels.discard(channel_name.lower())
+
+    def send_names(self, client, channel_name):
+        names = [member.nick for member in self.members(channel_name)]
+        # Long member lists are split over several 353 replies, as real servers do
+        for start in range(0, len(names), 50):
+            client.send(f":{SERVER_NAME} 353 {client.nick} = {channel_name} :{' '.join(names[start:start + 50])}")
+        client.send(f":{SERVER_NAME} 366 {client.nick} {channel_name} :End of /NAMES list.")
+
+    def privmsg(self, sender, target, text):
+        line = f":{sender.prefix} PRIVMSG {target} :{text}"
+        if target.startswith("#"):
+            recipients = [member for member in self.members(target) if member is not sender]
+        else:
+            recipient = self.find_member(target)
+            recipients = [recipient] if recipient else []
+        for recipient in recipients:
+            if isinstance(recipient, VirtualUser):
+                if recipient.on_message:
+                    recipient.on_message(sender.nick, target, text)
+            else:
+                recipient.send(line)
+                self.lines_relayed += 1
+
+    def disconnect(self, client, reason):
+        if self.clients.get((client.nick or "").lower()) is not client:
+            return
+        del self.clients[client.nick.lower()]
+        for channel_name in list(client.channels):
+            members = self.members(channel_name)
+            members.discard(client)
+            self.broadcast(channel_name, f":{client.prefix} QUIT :{reason}")
+        client.channels.clear()
+
+    def remove_virtual_user(self, user):
+        if self.virtual_users.get(user.nick.lower()) is not user:
+            return
+        del self.virtual_users[user.nick.lower()]
+        for channel_name in list(user.channels):
+            self.members(channel_name).discard(user)
+            self.broadcast(channel_name, f":{user.prefix} QUIT :Quit")
+        user.channels.clear()
+
+    def add_virtual_user(self, nick, channel_name, on_message=None):
+        user = VirtualUser(nick, on_message)
+        self.virtual_users[nick.lower()] = user
+        self.join(user, channel_name)
+        return user
+
+    def say(self, user, target, text):
+        """Sends a PRIVMSG from a virtual user."""
+        self.privmsg(user, target, text)
+
+
+async def serve(host, port):
+    server = await StubIRCServer(host, port).start()
+    print(f"Stub IRC server listening on {host}:{server.port}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            print(f"Stub IRC server: {server.stats()}")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(serve(arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Load-tests the bot end to end against the bundled stub IRC server.
+
+Starts benchmarks/irc_stub_server.py in-process, launches main.py against it and, once the bot has
+joined, fills the channel with simulated users who send greetings, country questions, "users" and
+"forget" at a configurable rate (Poisson arrivals). Reports response latency p50/p95/p99, requests
+left unanswered, lines the bot sent mis-framed and the bot's RSS over the run. With --ramp the
+offered rate grows every report interval, so the point where latency climbs shows the real capacity.
+At the end it prints p50/p95/p99 per request kind and the bot's memory growth per hour. --bot-args
+passes options to main.py, e.g. "--workers 2" or "--entity-extractor gazetteer".
+
+Run from the repository root:
+    python -m benchmarks.load_generator --users 200 --rate 5 --duration 300
+    python -m benchmarks.load_generator --rate 1 --ramp 1 --duration 600 --output load.json
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.irc_stub_server import StubIRCServer
+from benchmarks.question_corpus import LABELED_QUESTIONS
+
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_NICK = "loadbot"
+GREETINGS = ("hi", "hello", "hey there")
+# The stub server has no flood limits, so the bot's 1 line/s pacing would be all the run measured
+DEFAULT_BOT_ARGS = "--send-rate 100 --warm-up eager"
+# A request whose reply has not arrived after this many seconds is counted as dropped
+REPLY_TIMEOUT = 30.0
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def process_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def parse_mix(text):
+    """Parses "greeting=1,question=4,users=0.5,forget=0.1" into request kinds and weights."""
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split("=")
+        if kind not in ("greeting", "question", "users", "forget"):
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}")
+        mix[kind] = float(weight)
+    return mix
+
+
+class PendingRequest:
+    __slots__ = ("kind", "category", "sent")
+
+    def __init__(self, kind, category, sent):
+        self.kind = kind
+        self.category = category
+        self.sent = sent
+
+
+class LoadGenerator:
+    """Sends requests from virtual users and matches the bot's replies to them.
+
+    Replies are addressed "nick: text", and the bot's send queue may merge several into one line, so
+    each line is split at every "<simulated nick>: ". A reply is matched to that user's oldest pending
+    request of the same category ("users" lists, "forget" confirmations, or anything else). Two replies
+    to one user merged under a single prefix count as one, so the other shows up as dropped; with many
+    simulated users that is rare.
+    """
+
+    def __init__(self, server, channel_name, users, mix, rate, ramp):
+        self.server = server
+        self.channel_name = channel_name
+        self.mix = mix
+        self.rate = rate
+        self.ramp = ramp
+        self.nicks = [f"user{index:04d}" for index in range(users)]
+        self.nick_set = set(self.nicks) | {BOT_NICK}
+        self.reply_pattern = re.compile(r"(?:^|\s)(" + "|".join(self.nicks) + r"): ")
+        # Every member receives each channel line, so only the first simulated user listens
+        self.users = [server.add_virtual_user(nick, channel_name, None if index else self.on_message)
+                      for index, nick in enumerate(self.nicks)]
+        self.pending = collections.defaultdict(collections.deque)
+        self.questions = [question for question, unused_country, unused_column in LABELED_QUESTIONS]
+        self.sent = collections.Counter()
+        self.answered = collections.Counter()
+        self.dropped = collections.Counter()
+        self.latencies = collections.defaultdict(list)
+        self.interval_latencies = []
+        self.unsolicited = 0
+        self.extra_replies = 0
+
+    def make_request(self):
+        kind = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if kind == "greeting":
+            return kind, "other", random.choice(GREETINGS)
+        if kind == "question":
+            return kind, "other", random.choice(self.questions)
+        return kind, kind, kind
+
+    def send_request(self):
+        user = random.choice(self.users)
+        kind, category, text = self.make_request()
+        self.pending[user.nick].append(PendingRequest(kind, category, time.monotonic()))
+        self.sent[kind] += 1
+        self.server.say(user, self.channel_name, f"{BOT_NICK}: {text}")
+
+    def reply_category(self, text):
+        if text.strip().startswith("forgetting everything"):
+            return "forget"
+        words = text.split()
+        if words and all(word in self.nick_set for word in words):
+            return "users"
+        return "other"
+
+    def on_message(self, sender, target, text):
+        if sender != BOT_NICK or target.lower() != self.channel_name.lower():
+            return
+        now = time.monotonic()
+        matches = list(self.reply_pattern.finditer(text))
+        if not matches:
+            self.unsolicited += 1
+        for position, match in enumerate(matches):
+            end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+            self.match_reply(match.group(1), text[match.end():end], now)
+
+    def match_reply(self, nick, reply_text, now):
+        category = self.reply_category(reply_text)
+        pending = self.pending[nick]
+        for request in pending:
+            if request.category == category:
+                pending.remove(request)
+                latency = now - request.sent
+                self.answered[request.kind] += 1
+                self.latencies[request.kind].append(latency)
+                self.interval_latencies.append(latency)
+                return
+        if category == "users":
+            # One "users" request gets a reply per 353 line when the member list is long
+            self.extra_replies += 1
+        else:
+            # Outreach, greeting follow-ups and timeouts are started by the bot itself
+            self.unsolicited += 1
+
+    def expire(self, timeout):
+        cutoff = time.monotonic() - timeout
+        for pending in self.pending.values():
+            while pending and pending[0].sent < cutoff:
+                self.dropped[pending.popleft().kind] += 1
+
+    def outstanding(self):
+        return sum(len(pending) for pending in self.pending.values())
+
+    async def send_loop(self, duration, report_interval):
+        started = time.monotonic()
+        next_ramp = started + report_interval
+        while time.monotonic() - started < duration:
+            await asyncio.sleep(random.expovariate(self.rate))
+            self.send_request()
+            if self.ramp and time.monotonic() >= next_ramp:
+                self.rate += self.ramp
+                next_ramp += report_interval
+
+
+async def wait_for_bot(joined, process, timeout):
+    """Waits until the bot has joined the channel; returns False if it exited or timed out."""
+    deadline = time.monotonic() + timeout
+    while not joined.is_set():
+        if process and process.poll() is not None:
+            return False
+        if time.monotonic() > deadline:
+            return False
+        try:
+            await asyncio.wait_for(joined.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+    return True
+
+
+def launch_bot(port, channel_name, bot_args, log_path):
+    command = [sys.executable, os.path.join(REPOSITORY_DIR, "main.py"), "--server", "127.0.0.1", "--port", str(port),
+               "--channel", channel_name, "--nick", BOT_NICK] + shlex.split(bot_args)
+    log_file = open(log_path, "w", encoding="utf-8")
+    # Unbuffered, so the log is useful when the bot falls over mid-run
+    return subprocess.Popen(command, cwd=REPOSITORY_DIR, stdout=log_file, stderr=subprocess.STDOUT,
+                            env=dict(os.environ, PYTHONUNBUFFERED="1"))
+
+
+async def run(arguments):
+    joined = asyncio.Event()
+
+    def on_join(client, channel_name):
+        if client.nick == BOT_NICK and channel_name.lower() == arguments.channel.lower():
+            joined.set()
+
+    server = await StubIRCServer(port=arguments.port, on_join=on_join).start()
+    print(f"Stub IRC server listening on 127.0.0.1:{server.port}")
+    process = None
+    if arguments.no_spawn:
+        print(f"Waiting for a bot named {BOT_NICK} to join {arguments.channel}")
+    else:
+        process = launch_bot(server.port, arguments.channel, arguments.bot_args, arguments.bot_log)
+        print(f"Started the bot (pid {process.pid}), logging to {arguments.bot_log}")
+    bot_pid = process.pid if process else arguments.bot_pid
+    if not await wait_for_bot(joined, process, arguments.join_timeout):
+        await server.stop()
+        raise SystemExit("The bot did not join the channel; see its log")
+
+    generator = LoadGenerator(server, arguments.channel, arguments.users, arguments.mix, arguments.rate, arguments.ramp)
+    memory_samples = []
+    intervals = []
+    send_task = asyncio.create_task(generator.send_loop(arguments.duration, arguments.report_interval))
+    started = time.monotonic()
+    previous_answered = 0
+    while not send_task.done() or generator.outstanding():
+        await asyncio.sleep(arguments.report_interval)
+        generator.expire(arguments.reply_timeout)
+        elapsed = time.monotonic() - started
+        rss = process_rss_mb(bot_pid) if bot_pid else None
+        if rss is not None:
+            memory_samples.append((elapsed, rss))
+        answered = sum(generator.answered.values())
+        interval = {
+            "elapsed_s": elapsed,
+            "offered_rate": generator.rate,
+            "answered_per_s": (answered - previous_answered) / arguments.report_interval,
+            "p50_ms": percentile(generator.interval_latencies, 0.50) * 1000,
+            "p95_ms": percentile(generator.interval_latencies, 0.95) * 1000,
+            "outstanding": generator.outstanding(),
+            "dropped": sum(generator.dropped.values()),
+            "framing_errors": server.framing_errors(),
+            "rss_mb": rss,
+        }
+        intervals.append(interval)
+        previous_answered = answered
+        generator.interval_latencies = []
+        print(f"{elapsed:7.0f}s  offered {interval['offered_rate']:5.1f}/s  answered {interval['answered_per_s']:5.1f}/s  "
+              f"p50 {interval['p50_ms']:7.0f} ms  p95 {interval['p95_ms']:7.0f} ms  outstanding {interval['outstanding']:4d}  "
+              f"dropped {interval['dropped']:4d}  mis-framed {interval['framing_errors']}"
+              + (f"  RSS {rss:.0f} MB" if rss is not None else ""))
+        if process and process.poll() is not None:
+            print(f"The bot exited with status {process.returncode}")
+            send_task.cancel()
+            break
+
+    if process and process.poll() is None:
+        server.say(generator.users[0], arguments.channel, f"{BOT_NICK}: die")
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    await server.stop()
+    return summarize(arguments, generator, server, intervals, memory_samples)
+
+
+def summarize(arguments, generator, server, intervals, memory_samples):
+    latency = {}
+    for kind in generator.sent:
+        samples = generator.latencies[kind]
+        latency[kind] = {
+            "sent": generator.sent[kind],
+            "answered": generator.answered[kind],
+            "dropped": generator.dropped[kind],
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+    memory = None
+    if memory_samples:
+        first_elapsed, first_rss = memory_samples[0]
+        last_elapsed, last_rss = memory_samples[-1]
+        hours = (last_elapsed - first_elapsed) / 3600
+        memory = {
+            "start_mb": first_rss,
+            "end_mb": last_rss,
+            "peak_mb": max(rss for unused_elapsed, rss in memory_samples),
+            "growth_mb_per_hour": (last_rss - first_rss) / hours if hours else 0.0,
+        }
+    return {
+        "settings": {
+            "users": arguments.users,
+            "rate": arguments.rate,
+            "ramp": arguments.ramp,
+            "duration_s": arguments.duration,
+            "mix": arguments.mix,
+            "bot_args": arguments.bot_args,
+        },
+        "requests": latency,
+        "unsolicited_replies": generator.unsolicited,
+        "extra_users_replies": generator.extra_replies,
+        "server": server.stats(),
+        "memory": memory,
+        "intervals": intervals,
+    }
+
+
+def print_report(results):
+    print(f"\n{'request':<12}{'sent':>8}{'answered':>10}{'dropped':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, stats in results["requests"].items():
+        print(f"{kind:<12}{stats['sent']:>8}{stats['answered']:>10}{stats['dropped']:>9}"
+              f"{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}{stats['p99_ms']:>10.0f}")
+    server_stats = results["server"]
+    print(f"lines from the bot: {server_stats['lines_received']}, oversized {server_stats['oversized_lines']}, "
+          f"bad line endings {server_stats['bare_newline_lines']}, undecodable {server_stats['undecodable_lines']}")
+    print(f"unsolicited replies: {results['unsolicited_replies']}, extra users replies: {results['extra_users_replies']}")
+    memory = results["memory"]
+    if memory:
+        print(f"bot RSS: {memory['start_mb']:.0f} -> {memory['end_mb']:.0f} MB (peak {memory['peak_mb']:.0f} MB, "
+              f"{memory['growth_mb_per_hour']:+.1f} MB/hour)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="simulated users in the channel")
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second across all users")
+    parser.add_argument("--ramp", type=float, default=0.0, help="add this many requests/s every report interval")
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds to send requests for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("greeting=1,question=4,users=0.5,forget=0.2"),
+                        help="relative weights of the request kinds")
+    parser.add_argument("--channel", default="#load")
+    parser.add_argument("--port", type=int, default=0, help="stub server port; 0 picks a free one")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--reply-timeout", type=float, default=REPLY_TIMEOUT,
+                        help="seconds after which an unanswered request counts as dropped")
+    parser.add_argument("--join-timeout", type=float, default=300.0, help="seconds to wait for the bot to join")
+    parser.add_argument("--bot-args", default=DEFAULT_BOT_ARGS, help="extra arguments for main.py")
+    parser.add_argument("--bot-log", default=os.path.join(tempfile.gettempdir(), "load_bot.log"),
+                        help="where the bot's output goes (default: load_bot.log in the temp directory)")
+    parser.add_argument("--no-spawn", action="store_true",
+                        help=f"do not start the bot; wait for one started by hand with --nick {BOT_NICK}")
+    parser.add_argument("--bot-pid", type=int, help="pid of a bot started by hand, for memory sampling")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    arguments = parser.parse_args()
+
+    results = asyncio.run(run(arguments))
+    print_report(results)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
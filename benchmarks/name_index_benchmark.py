@@ -0,0 +1,98 @@
+"""
+Times fuzzy country-name lookups through the name index against a linear Levenshtein scan of every
+name, and checks that the index loses no match the scan finds.
+
+Misspellings are made from every name and alias in the index (a dropped letter, two swapped letters and a
+wrong letter, plus two edits combined) and looked up at the distance CountryNameIndex allows them. Both
+sides are timed on the same lookups; the report also gives how many names the index compared. The exit
+status is 1 if any lookup misses a name the scan finds, or if the index is not at least --min-speedup
+times faster than the scan.
+
+Run from the repository root:
+    python -m benchmarks.name_index_benchmark
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import Levenshtein
+from chatbot.dataset_artifact import build_name_index, table_from_csv
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "countries_clean.csv")
+
+
+def misspell(name, edits, generator):
+    word = name
+    for unused_edit in range(edits):
+        position = generator.randrange(len(word))
+        kind = generator.choice(("drop", "swap", "replace"))
+        if kind == "drop" and len(word) > 3:
+            word = word[:position] + word[position + 1:]
+        elif kind == "swap" and position + 1 < len(word):
+            word = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+        else:
+            word = word[:position] + generator.choice(string.ascii_lowercase) + word[position + 1:]
+    return word
+
+
+def linear_scan(names, query, max_distance):
+    matches = []
+    for name in names:
+        distance = Levenshtein.distance(query, name)
+        if distance <= max_distance:
+            matches.append((distance, name))
+    return matches
+
+
+def best_time(function, lookups, repeats):
+    """Fastest of repeats passes over lookups, in microseconds per lookup."""
+    timings = []
+    for unused_repeat in range(repeats):
+        started = time.perf_counter()
+        for query, max_distance in lookups:
+            function(query, max_distance)
+        timings.append(time.perf_counter() - started)
+    return min(timings) / len(lookups) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--seed", type=int, default=482)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-speedup", type=float, default=1.5,
+                        help="fail unless index lookups are at least this many times faster than the scan")
+    arguments = parser.parse_args()
+
+    name_index = build_name_index(table_from_csv(arguments.data))
+    fuzzy_index = name_index.fuzzy_index
+    names = list(name_index.entries)
+    generator = random.Random(arguments.seed)
+    queries = [misspell(name, edits, generator) for name in names for edits in (1, 2)]
+    lookups = [(query, name_index.max_distance_for(query)) for query in queries]
+
+    missed = 0
+    for query, max_distance in lookups:
+        found = sorted(fuzzy_index.search(query, max_distance))
+        expected = sorted(linear_scan(names, query, max_distance))
+        if found != expected:
+            missed += 1
+            print(f"{query!r}: found {found}, the scan finds {expected}")
+
+    index_us = best_time(fuzzy_index.search, lookups, arguments.repeats)
+    scan_us = best_time(lambda query, max_distance: linear_scan(names, query, max_distance), lookups, arguments.repeats)
+    compared = sorted(len(fuzzy_index.candidates(query, max_distance)) for query, max_distance in lookups)
+    mean_compared = sum(compared) / len(compared)
+    print(f"{len(lookups)} lookups over {len(names)} names")
+    print(f"index {index_us:.1f} us/lookup, linear scan {scan_us:.1f} us/lookup, {scan_us / index_us:.1f}x faster")
+    print(f"index compared {mean_compared:.1f} names on average ({mean_compared / len(names):.1%}), "
+          f"p95 {compared[int(0.95 * (len(compared) - 1))]}, max {compared[-1]}")
+    print(f"{missed} lookups missed a match")
+    sys.exit(1 if missed or scan_us < arguments.min_speedup * index_us else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Measures each stage of CountryInformationStore's question answering on the labeled corpus.
+
+Reports p50/p95/p99 latency for the prefilter, spaCy NER, country matching (with the table-query parse
+when no country matches), infer_column and answer formatting, plus batched throughput, peak RSS and
+accuracy against the gold (country, column). Accuracy and the "total" latency follow the path
+main.handle_command serves: a question the prefilter answers (or skips) stops there, every other one goes
+through the models. The model stages are still timed for all.
+Questions the rule-based prefilter answers by itself are checked against what the models alone would
+answer; the exit status is 1 if the prefilter gets any of them wrong that the models get right, or
+answers any of PREFILTER_PASS_QUESTIONS instead of leaving it to the models.
+Results can be saved as JSON and compared with an earlier run (exit status 1 on a regression).
+
+The prefilter (chatbot/question_prefilter.py) answers "population of China" straight from the table and
+skips small talk; misspelled names and qualified keywords ("people per square mile", "area code") go
+to the models. --entity-extractor compares the spaCy NER with the gazetteer in
+chatbot/entity_extractors.py, and --intent-backend the cross-encoder backends (see
+tools/export_cross_encoder.py); peak RSS shows what each one costs in memory.
+
+Run from the repository root:
+    python -m benchmarks.qa_benchmark --output before.json
+    python -m benchmarks.qa_benchmark --output after.json --compare before.json
+    python -m benchmarks.qa_benchmark --entity-extractor gazetteer
+    python -m benchmarks.qa_benchmark --intent-backend onnx-int8
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from benchmarks.question_corpus import LABELED_QUESTIONS, PREFILTER_PASS_QUESTIONS
+from chatbot.country_information_store import CountryInformationStore
+from chatbot.cross_encoder_backends import CROSS_ENCODER_BACKENDS
+from chatbot.entity_extractors import ENTITY_EXTRACTORS
+from chatbot.model_registry import resident_memory_mb
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "countries_clean.csv")
+STAGES = ("prefilter", "ner", "match", "infer_column", "format", "total")
+# A latency change smaller than this fraction is reported as noise rather than a regression
+LATENCY_TOLERANCE = 0.10
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return resident_memory_mb()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere.
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def clear_caches(store):
+    # Every question pays for the full pipeline; the precomputed sentences are part of normal serving and stay.
+    store.intent_cache.clear()
+    store.answer_cache.clear()
+
+
+def time_stages(store, question):
+    """Runs one question through every stage; returns (timings in ms, the models' plan, the served prediction)."""
+    timings = {}
+    started = time.perf_counter()
+    # prefilter_decision leaves the live prefilter counters and their periodic hit-rate line alone
+    prefilter_answer, needs_model, unused_outcome = store.prefilter_decision(question)
+    timings["prefilter"] = time.perf_counter() - started
+
+    stage_started = time.perf_counter()
+    entity_texts = store.extract_entity_texts([question])[0]
+    timings["ner"] = time.perf_counter() - stage_started
+
+    # Matching runs once; the plan built from it is the one the later stages use
+    stage_started = time.perf_counter()
+    plan = store.plan_from_matches(question, store.match_entities(entity_texts))
+    timings["match"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    if plan:
+        plan.column_name = store.infer_column(plan.question, plan.cache_key)
+    timings["infer_column"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    if plan:
+        store.render_answer(plan)
+    timings["format"] = time.perf_counter() - stage_started
+    # handle_command only asks the models when the prefilter neither answers nor skips the question
+    if needs_model:
+        timings["total"] = time.perf_counter() - started
+        served = plan_prediction(plan)
+    else:
+        timings["total"] = timings["prefilter"]
+        served = scanned_prediction(store, question) if prefilter_answer is not None else (None, None)
+    return {stage: seconds * 1000 for stage, seconds in timings.items()}, plan, served
+
+
+def measure_latency(store, repeat):
+    samples = {stage: [] for stage in STAGES}
+    plans = []
+    served = []
+    for unused_round in range(repeat):
+        clear_caches(store)
+        plans = []
+        served = []
+        for question, unused_country, unused_column in LABELED_QUESTIONS:
+            timings, plan, prediction = time_stages(store, question)
+            for stage in STAGES:
+                samples[stage].append(timings[stage])
+            plans.append(plan)
+            served.append(prediction)
+    latency = {}
+    for stage in STAGES:
+        latency[stage] = {
+            "p50_ms": percentile(samples[stage], 0.50),
+            "p95_ms": percentile(samples[stage], 0.95),
+            "p99_ms": percentile(samples[stage], 0.99),
+        }
+    return latency, plans, served
+
+
+def plan_prediction(plan):
+    if not plan:
+        return None, None
+    return plan.records[0].display_name if plan.records else None, plan.column_name
+
+
+def scanned_prediction(store, question):
+    match = store.prefilter.scan(question)
+    return store.country_table.record(match.rows[0]).display_name if match.rows else None, match.column_name
+
+
+def prefilter_prediction(store, question):
+    """(country, column) when the prefilter answers question by itself, otherwise None."""
+    answer, unused_needs_model, unused_outcome = store.prefilter_decision(question)
+    return scanned_prediction(store, question) if answer is not None else None
+
+
+def check_prefilter(store, plans):
+    """Compares the prefilter with the models on the questions it answers without them."""
+    answered = 0
+    correct = 0
+    model_correct = 0
+    worse = []
+    for (question, expected_country, expected_column), plan in zip(LABELED_QUESTIONS, plans):
+        prediction = prefilter_prediction(store, question)
+        if prediction is None:
+            continue
+        expected = (expected_country, expected_column)
+        model_prediction = plan_prediction(plan)
+        answered += 1
+        correct += prediction == expected
+        model_correct += model_prediction == expected
+        if prediction != expected and model_prediction == expected:
+            worse.append({"question": question, "expected": list(expected), "prefilter": list(prediction)})
+    answered_pass = [question for question in PREFILTER_PASS_QUESTIONS if prefilter_prediction(store, question)]
+    return {"answered": answered, "correct": correct, "model_correct": model_correct, "worse": worse,
+            "answered_pass": answered_pass}
+
+
+def measure_accuracy(predictions):
+    """Scores (country, column) predictions, one per corpus question."""
+    country_correct = 0
+    column_correct = 0
+    both_correct = 0
+    misses = []
+    for (question, expected_country, expected_column), prediction in zip(LABELED_QUESTIONS, predictions):
+        predicted_country, predicted_column = prediction
+        country_correct += predicted_country == expected_country
+        column_correct += predicted_column == expected_column
+        if predicted_country == expected_country and predicted_column == expected_column:
+            both_correct += 1
+        else:
+            misses.append({"question": question, "expected": [expected_country, expected_column],
+                           "predicted": [predicted_country, predicted_column]})
+    total = len(LABELED_QUESTIONS)
+    return {
+        "country": country_correct / total,
+        "column": column_correct / total,
+        "both": both_correct / total,
+        "misses": misses,
+    }
+
+
+def measure_throughput(store, batch_size, repeat):
+    questions = [question for question, unused_country, unused_column in LABELED_QUESTIONS]
+    answered = 0
+    started = time.perf_counter()
+    for unused_round in range(repeat):
+        clear_caches(store)
+        for start in range(0, len(questions), batch_size):
+            store.answer_questions(questions[start:start + batch_size])
+        answered += len(questions)
+    return answered / (time.perf_counter() - started)
+
+
+def run(arguments):
+    started = time.perf_counter()
+    store = CountryInformationStore(DATA_PATH, intent_engine=arguments.intent_engine, spacy_model=arguments.spacy_model,
+                                    cross_encoder_backend=arguments.intent_backend, onnx_model_dir=arguments.onnx_model,
+                                    inference_threads=arguments.threads, entity_extractor=arguments.entity_extractor)
+    store.warm_up(background=False)
+    load_seconds = time.perf_counter() - started
+    # One untimed pass so lazy initialization inside the models isn't counted
+    store.answer_questions([question for question, unused_country, unused_column in LABELED_QUESTIONS[:4]])
+
+    latency, plans, served = measure_latency(store, arguments.repeat)
+    return {
+        "settings": {
+            "questions": len(LABELED_QUESTIONS),
+            "repeat": arguments.repeat,
+            "batch_size": arguments.batch_size,
+            "spacy_model": arguments.spacy_model,
+            "intent_engine": arguments.intent_engine,
+            "intent_backend": arguments.intent_backend,
+            "entity_extractor": arguments.entity_extractor,
+            "threads": arguments.threads,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "load_seconds": load_seconds,
+        "latency": latency,
+        "throughput_qps": measure_throughput(store, arguments.batch_size, arguments.repeat),
+        "peak_rss_mb": peak_memory_mb(),
+        "accuracy": measure_accuracy(served),
+        "prefilter": check_prefilter(store, plans),
+    }
+
+
+def print_report(results):
+    settings = results["settings"]
+    print(f"{settings['questions']} questions x {settings['repeat']} rounds, {settings.get('entity_extractor', 'spacy')} "
+          f"entities (spaCy {settings['spacy_model']}), "
+          f"{settings['intent_engine']} intent engine on {settings.get('intent_backend', 'torch')}")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage in STAGES:
+        stage_latency = results["latency"][stage]
+        print(f"{stage:<16}{stage_latency['p50_ms']:>10.2f}{stage_latency['p95_ms']:>10.2f}{stage_latency['p99_ms']:>10.2f}")
+    accuracy = results["accuracy"]
+    print(f"throughput      {results['throughput_qps']:.1f} questions/s (batches of {settings['batch_size']})")
+    print(f"peak RSS        {results['peak_rss_mb']:.0f} MB, models loaded in {results['load_seconds']:.1f}s")
+    print(f"accuracy        country {accuracy['country']:.1%}, column {accuracy['column']:.1%}, both {accuracy['both']:.1%}")
+    for miss in accuracy["misses"]:
+        print(f"  miss: {miss['question']!r} expected {miss['expected']} got {miss['predicted']}")
+    prefilter = results["prefilter"]
+    print(f"prefilter       answered {prefilter['answered']} without the models, {prefilter['correct']} correct "
+          f"(the models alone: {prefilter['model_correct']})")
+    for worse in prefilter["worse"]:
+        print(f"  prefilter wrong where the models are right: {worse['question']!r} expected {worse['expected']} "
+              f"got {worse['prefilter']}")
+    for question in prefilter.get("answered_pass", ()):
+        print(f"  prefilter answered a question it must leave to the models: {question!r}")
+
+
+def compare(results, baseline):
+    """Prints the change against a baseline run; returns the number of regressions found."""
+    regressions = 0
+    print("\nChange against baseline:")
+    for stage in STAGES:
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            before = baseline["latency"][stage][metric]
+            after = results["latency"][stage][metric]
+            change = (after - before) / before if before else 0.0
+            regressed = change > LATENCY_TOLERANCE
+            regressions += regressed
+            if regressed or change < -LATENCY_TOLERANCE:
+                print(f"  {stage} {metric}: {before:.2f} -> {after:.2f} ({change:+.0%}){'  REGRESSION' if regressed else ''}")
+    throughput_change = (results["throughput_qps"] - baseline["throughput_qps"]) / baseline["throughput_qps"]
+    if throughput_change < -LATENCY_TOLERANCE:
+        regressions += 1
+    print(f"  throughput: {baseline['throughput_qps']:.1f} -> {results['throughput_qps']:.1f} q/s ({throughput_change:+.0%})")
+    print(f"  peak RSS: {baseline['peak_rss_mb']:.0f} -> {results['peak_rss_mb']:.0f} MB")
+    for metric in ("country", "column", "both"):
+        before = baseline["accuracy"][metric]
+        after = results["accuracy"][metric]
+        if after < before:
+            regressions += 1
+        print(f"  {metric} accuracy: {before:.1%} -> {after:.1%}{'  REGRESSION' if after < before else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spacy-model", default="en_core_web_lg")
+    parser.add_argument("--intent-engine", choices=CountryInformationStore.INTENT_ENGINES, default="cross-encoder")
+    parser.add_argument("--entity-extractor", choices=ENTITY_EXTRACTORS, default="spacy",
+                        help="the ner stage times whichever extractor is chosen")
+    parser.add_argument("--intent-backend", choices=CROSS_ENCODER_BACKENDS, default="torch")
+    parser.add_argument("--onnx-model", default=os.path.join(os.path.dirname(DATA_PATH), "cross-encoder-onnx"),
+                        help="directory written by tools/export_cross_encoder.py, for the onnx backends")
+    parser.add_argument("--threads", type=int, help="CPU threads for the intent model")
+    parser.add_argument("--repeat", type=int, default=3, help="rounds over the corpus for latency and throughput")
+    parser.add_argument("--batch-size", type=int, default=16, help="batch size for the throughput run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    arguments = parser.parse_args()
+
+    results = run(arguments)
+    print_report(results)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    regressions = len(results["prefilter"]["worse"]) + len(results["prefilter"]["answered_pass"])
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions += compare(results, baseline)
+    # A non-zero exit status lets a script fail on regressions
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Labeled country questions: (question, expected country, expected column).
+# The first block is taken from SampleChat.txt and demo.txt; the rest are paraphrases.
+LABELED_QUESTIONS = [
+    ("Can you tell me about the cellular subscriptions in austria?", "Austria", "Phones (per 1000)"),
+    ("Cool. what do you know about jamaica's literacy?", "Jamaica", "Literacy (%)"),
+    ("how about the population of inida", "India", "Population"),
+    ("what is the deathrate of south korea?", "South Korea", "Deathrate"),
+    ("what is the area of cuba?", "Cuba", "Area (sq. mi.)"),
+    ("How many people live in Italy?", "Italy", "Population"),
+    ("How big is Italy?", "Italy", "Area (sq. mi.)"),
+    ("How many people have phones in China?", "China", "Phones (per 1000)"),
+
+    ("What region is Peru in?", "Peru", "Region"),
+    ("Where is Kenya located?", "Kenya", "Region"),
+    ("What part of the world is Mongolia in?", "Mongolia", "Region"),
+    ("What is the population of Brazil?", "Brazil", "Population"),
+    ("How many people live in Canada?", "Canada", "Population"),
+    ("How populated is Nigeria?", "Nigeria", "Population"),
+    ("How large is Russia?", "Russia", "Area (sq. mi.)"),
+    ("What is the size of Australia in square miles?", "Australia", "Area (sq. mi.)"),
+    ("How much land does Argentina cover?", "Argentina", "Area (sq. mi.)"),
+    ("What is the population density of Bangladesh?", "Bangladesh", "Pop. Density (per sq. mi.)"),
+    ("How crowded is Singapore?", "Singapore", "Pop. Density (per sq. mi.)"),
+    ("How many people per square mile live in the Netherlands?", "Netherlands", "Pop. Density (per sq. mi.)"),
+    ("What is the coastline ratio of Greece?", "Greece", "Coastline (coast/area ratio)"),
+    ("How much coastline does Norway have?", "Norway", "Coastline (coast/area ratio)"),
+    ("What is the net migration of Germany?", "Germany", "Net migration"),
+    ("Are more people moving into or out of Mexico?", "Mexico", "Net migration"),
+    ("What is the immigration rate for Spain?", "Spain", "Net migration"),
+    ("What is the infant mortality rate in Angola?", "Angola", "Infant mortality (per 1000 births)"),
+    ("How many babies die in Afghanistan?", "Afghanistan", "Infant mortality (per 1000 births)"),
+    ("What is the GDP per capita of Switzerland?", "Switzerland", "GDP ($ per capita)"),
+    ("How rich is Luxembourg?", "Luxembourg", "GDP ($ per capita)"),
+    ("What is the average income in Chile?", "Chile", "GDP ($ per capita)"),
+    ("What is the literacy rate of Egypt?", "Egypt", "Literacy (%)"),
+    ("How many people can read in Pakistan?", "Pakistan", "Literacy (%)"),
+    ("How many phones are there in Japan?", "Japan", "Phones (per 1000)"),
+    ("What is the mobile phone rate in Sweden?", "Sweden", "Phones (per 1000)"),
+    ("What is the birthrate of Niger?", "Niger", "Birthrate"),
+    ("How many babies are born in France each year?", "France", "Birthrate"),
+    ("What is the death rate in Ukraine?", "Ukraine", "Deathrate"),
+    ("How many people die each year in Botswana?", "Botswana", "Deathrate"),
+    ("How much of Ukraine is arable land?", "Ukraine", "Arable (%)"),
+    ("How much farmland does Hungary have?", "Hungary", "Arable (%)"),
+    ("What percentage of Malaysia is used for permanent crops?", "Malaysia", "Crops (%)"),
+    ("What is the climate of Thailand?", "Thailand", "Climate"),
+    ("What is the weather like in Iceland?", "Iceland", "Climate"),
+    ("How much of the economy of Ethiopia is agriculture?", "Ethiopia", "Agriculture"),
+    ("How important is farming to the economy of Malawi?", "Malawi", "Agriculture"),
+    ("What share of GDP comes from industry in Qatar?", "Qatar", "Industry"),
+    ("How big is manufacturing in the economy of South Korea?", "South Korea", "Industry"),
+    ("What share of the economy of the United States is services?", "United States", "Service"),
+    ("How big is the service sector in the UK?", "United Kingdom", "Service"),
+
+    # Aliases, misspellings and casual phrasings
+    ("whats the population of the usa", "United States", "Population"),
+    ("how many ppl live in germny", "Germany", "Population"),
+    ("population of brasil?", "Brazil", "Population"),
+    ("How big is Britain?", "United Kingdom", "Area (sq. mi.)"),
+    ("what's the gdp of holland", "Netherlands", "GDP ($ per capita)"),
+    ("Tell me the literacy rate in Ivory Coast", "Cote d'Ivoire", "Literacy (%)"),
+    ("how rich is swizerland", "Switzerland", "GDP ($ per capita)"),
+    ("birth rate in the philipines?", "Philippines", "Birthrate"),
+    ("What region is Myanmar in?", "Burma", "Region"),
+    ("how many people in new zeland", "New Zealand", "Population"),
+    ("Which continent is Chad in?", "Chad", "Region"),
+    ("What is the area of the Bahamas?", "Bahamas, The", "Area (sq. mi.)"),
+    ("How densely populated is Monaco?", "Monaco", "Pop. Density (per sq. mi.)"),
+    ("What is the coast to area ratio of Japan?", "Japan", "Coastline (coast/area ratio)"),
+    ("Do many people emigrate from Albania?", "Albania", "Net migration"),
+    ("How many infants die in Sierra Leone?", "Sierra Leone", "Infant mortality (per 1000 births)"),
+    ("How wealthy are people in Norway?", "Norway", "GDP ($ per capita)"),
+    ("Can most people in Mali read and write?", "Mali", "Literacy (%)"),
+    ("How many cell phones per person are there in Finland?", "Finland", "Phones (per 1000)"),
+    ("How fast are people being born in Uganda?", "Uganda", "Birthrate"),
+    ("What is the mortality rate in Russia?", "Russia", "Deathrate"),
+    ("How much land in Denmark can be farmed?", "Denmark", "Arable (%)"),
+    ("How much of Italy is covered by orchards and vineyards?", "Italy", "Crops (%)"),
+    ("Is Saudi Arabia a dry or tropical climate?", "Saudi Arabia", "Climate"),
+    ("What share of the economy of Liberia is farming, fishing and forestry?", "Liberia", "Agriculture"),
+    ("How much of Kuwait's GDP is mining and manufacturing?", "Kuwait", "Industry"),
+    ("How much of the Bahamas economy is tourism and finance?", "Bahamas, The", "Service"),
+    ("what about the population of vietnam", "Vietnam", "Population"),
+    ("and the area of egypt?", "Egypt", "Area (sq. mi.)"),
+    ("Give me the GDP per capita for South Africa", "South Africa", "GDP ($ per capita)"),
+    # Everyday words one edit away from a country ("child" and Chile, "begin" and Benin)
+    ("What is the child mortality in France?", "France", "Infant mortality (per 1000 births)"),
+    ("Let's begin with the population of Chad.", "Chad", "Population"),
+    ("What is the rate of child mortality in France?", "France", "Infant mortality (per 1000 births)"),
+    # Lowercase and sentence-initial misspellings where a name is expected
+    ("how big is itlay", "Italy", "Area (sq. mi.)"),
+    ("Swedn has how many people?", "Sweden", "Population"),
+    # Lowercase words one edit from a short name where a name is expected ("woman" and Oman)
+    ("What is the literacy rate of woman in Peru?", "Peru", "Literacy (%)"),
+    ("literacy rate of India for woman", "India", "Literacy (%)"),
+]
+
+# Questions the rule-based prefilter must leave to the models: a qualifier points at another statistic
+# than the keyword ("per square mile", "area code"), or a quantifier reads like a superlative ("most countries").
+PREFILTER_PASS_QUESTIONS = [
+    "How many people live per square mile in Monaco?",
+    "how many people in India can read?",
+    "What is the area code of Jamaica",
+    "How many people per square mile live in the Netherlands?",
+    "How many people can read in Pakistan?",
+    "How many people die each year in Botswana?",
+    "most countries have high literacy, right?",
+]
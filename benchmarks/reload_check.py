@@ -0,0 +1,101 @@
+"""
+Recycles the inference workers over and over while questions keep arriving, the way a dataset reload
+does, and fails if any batch goes unanswered.
+
+Workers are forked from an executor thread while other threads record metrics; a lock copied into a
+worker while held would hang that worker's first batch. Exits with status 1 on a hang or a wrong answer.
+
+Run from the repository root:
+    python -m benchmarks.reload_check
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import threading
+from chatbot.inference_pool import InferencePool
+from chatbot.metrics import metrics_registry
+
+
+CHECK_SECONDS = metrics_registry.histogram("chatbot_reload_check_seconds", "Batches answered by reload_check", ("stage",))
+
+
+class EchoStore:
+    """Stands in for a loaded CountryInformationStore: answers instantly and records a metric per batch."""
+
+    def is_ready(self):
+        return True
+
+    def set_inference_threads(self, threads):
+        pass
+
+    def clear_caches(self):
+        pass
+
+    def answer_questions(self, questions):
+        with CHECK_SECONDS.time("answer"):
+            return [question.upper() for question in questions]
+
+
+def record_metrics(stop):
+    # Keeps the metric locks busy in the parent, so a fork often lands while one is held
+    while not stop.is_set():
+        CHECK_SECONDS.observe(0.001, "parent")
+        metrics_registry.counter("chatbot_reload_check_total", "Metric updates made by reload_check").inc()
+
+
+async def ask(pool, round_number, batches):
+    questions = [f"question {round_number}.{index}" for index in range(batches)]
+    answers = await asyncio.gather(*(pool.answer_questions([question]) for question in questions))
+    return answers == [[question.upper()] for question in questions]
+
+
+async def run(pool, reloads, batches, timeout):
+    loop = asyncio.get_running_loop()
+    failures = 0
+    for round_number in range(reloads):
+        recycled = loop.run_in_executor(None, pool.recycle)
+        try:
+            correct = await asyncio.wait_for(ask(pool, round_number, batches), timeout)
+            await asyncio.wait_for(recycled, timeout)
+            # The fresh workers must answer too, not only the ones already running
+            correct = correct and await asyncio.wait_for(ask(pool, round_number, batches), timeout)
+        except asyncio.TimeoutError:
+            print(f"reload {round_number}: no answer within {timeout}s")
+            return failures + 1
+        if not correct:
+            print(f"reload {round_number}: wrong answers")
+            failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=16, help="batches asked during each reload")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    arguments = parser.parse_args()
+    if not InferencePool.is_supported():
+        print("Inference workers need the fork start method; nothing to check on this platform")
+        return
+
+    pool = InferencePool(EchoStore(), workers=arguments.workers).start()
+    stop = threading.Event()
+    recorders = [threading.Thread(target=record_metrics, args=(stop,), daemon=True) for unused_index in range(2)]
+    for recorder in recorders:
+        recorder.start()
+    try:
+        failures = asyncio.run(run(pool, arguments.reloads, arguments.batches, arguments.timeout))
+    finally:
+        stop.set()
+        # A worker stuck on an inherited lock never exits by itself
+        for worker in multiprocessing.active_children():
+            worker.terminate()
+        pool.shutdown()
+    print(f"{arguments.reloads} reloads, {failures} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
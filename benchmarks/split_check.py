@@ -0,0 +1,55 @@
+"""
+Splits long replies the way IRC.send does and fails if a piece is too long, lost text, or is not addressed.
+
+Every piece of a "nick: ..." reply must carry the prefix and something after it; a word longer than a
+line used to flush a bare "nick:" line before its cut chunks. Exits with status 1 on any failure.
+
+Run from the repository root:
+    python -m benchmarks.split_check
+"""
+import sys
+from chatbot.irc_client import IRC, split_message
+
+
+PREFIX = "alice: "
+# (description, reply text)
+CASES = [
+    ("word longer than a line right after the prefix", PREFIX + "x" * 900),
+    ("word longer than a line after other words", PREFIX + "hello world " + "y" * 900),
+    ("word filling the first line exactly", PREFIX + "z" * 400 + " and more"),
+    ("multi-byte word longer than a line", PREFIX + "é" * 700),
+    ("many short words", PREFIX + " ".join(["word"] * 300)),
+    ("short reply", PREFIX + "hi"),
+]
+
+
+def check(text, max_bytes):
+    """Returns a list of problems with how text is split."""
+    problems = []
+    pieces = split_message(text, max_bytes, PREFIX)
+    for number, piece in enumerate(pieces):
+        if len(piece.encode("UTF-8")) > max_bytes:
+            problems.append(f"piece {number} is {len(piece.encode('UTF-8'))} bytes")
+        if not piece.startswith(PREFIX) or not piece[len(PREFIX):].strip():
+            problems.append(f"piece {number} is not an addressed line: {piece[:20]!r}")
+    # Only the repeated prefixes and the spaces at the cuts may differ from the original text
+    rejoined = "".join(piece[len(PREFIX):].replace(" ", "") for piece in pieces)
+    if rejoined != text[len(PREFIX):].replace(" ", ""):
+        problems.append("text was lost or changed")
+    return problems
+
+
+def main():
+    max_bytes = IRC().max_text_bytes("#CSC482")
+    failures = 0
+    for description, text in CASES:
+        problems = check(text, max_bytes)
+        if problems:
+            failures += 1
+            print(f"{description}: {'; '.join(problems)}")
+    print(f"{len(CASES)} replies split, {failures} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
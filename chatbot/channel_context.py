@@ -0,0 +1,48 @@
+from chatbot.greeting_fsm import GreetingFSM
+from chatbot.outreach_controller import OutreachController
+
+
+class ChannelContext:
+    """Per-channel conversation state; the country store and models are shared by all channels."""
+
+    __slots__ = ("name", "greeting_fsm", "outreach_controller", "requesting_user", "memory")
+
+    def __init__(self, name, botnick, scheduler):
+        self.name = name
+        self.greeting_fsm = GreetingFSM(scheduler)
+        # Also holds the channel's known users
+        self.outreach_controller = OutreachController(self.greeting_fsm, botnick, scheduler)
+        # Nick waiting for the reply to its "users" command
+        self.requesting_user = None
+        # Memory store (for forget command)
+        self.memory = {}
+
+    def forget(self, irc_client):
+        self.memory.clear()
+        self.greeting_fsm.reset()
+        self.outreach_controller.reset_on_join(irc_client, self.name)
+
+
+class ChannelDirectory:
+    """Maps channel names (case-insensitively) to their ChannelContext."""
+
+    def __init__(self, channel_names, botnick, scheduler):
+        self.contexts = {}
+        for channel_name in channel_names:
+            self.contexts[self.key(channel_name)] = ChannelContext(channel_name, botnick, scheduler)
+
+    @staticmethod
+    def key(channel_name):
+        return channel_name.lower()
+
+    def get(self, channel_name):
+        return self.contexts.get(self.key(channel_name)) if channel_name else None
+
+    def names(self):
+        return [context.name for context in self.contexts.values()]
+
+    def __iter__(self):
+        return iter(self.contexts.values())
+
+    def __len__(self):
+        return len(self.contexts)
@@ -1,7 +1,54 @@
-import pandas as pd
-import spacy
-import Levenshtein
-from sentence_transformers import CrossEncoder
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from chatbot.country_queries import CountryQueryEngine
+from chatbot.cross_encoder_backends import CROSS_ENCODER_BACKENDS
+from chatbot.dataset_artifact import load_country_data
+from chatbot.entity_extractors import ENTITY_EXTRACTORS, GazetteerEntityExtractor
+from chatbot.intent_engines import BiEncoderIntentEngine, CrossEncoderIntentEngine
+from chatbot.lru_cache import LRUCache
+from chatbot.metrics import metrics_registry
+from chatbot.question_prefilter import QuestionPrefilter
+from chatbot.model_registry import load_cross_encoder, load_sentence_transformer, load_spacy, model_registry
+
+
+STAGE_SECONDS = metrics_registry.histogram("chatbot_store_stage_seconds", "Time per answering stage and batch", ("stage",))
+CACHE_LOOKUPS = metrics_registry.counter("chatbot_store_cache_lookups_total", "Answer and intent cache lookups",
+                                         ("cache", "result"))
+
+
+class QuestionPlan:
+    """What a question is about once entities are resolved, waiting for its column."""
+
+    __slots__ = ("question", "records", "query", "cache_key", "column_name")
+
+    def __init__(self, question, records, query, cache_key):
+        self.question = question
+        self.records = records
+        self.query = query
+        self.cache_key = cache_key
+        self.column_name = None
+
+
+class DatasetSnapshot:
+    """One loaded version of the dataset and everything derived from it, swapped in as a unit on reload."""
+
+    __slots__ = ("country_table", "name_index", "query_engine", "prefilter", "gazetteer", "sentences", "answer_cache")
+
+    def __init__(self, country_table, name_index, query_engine, prefilter, gazetteer, answer_cache):
+        self.country_table = country_table
+        self.name_index = name_index
+        self.query_engine = query_engine
+        self.prefilter = prefilter
+        # None unless the store extracts entities with the gazetteer
+        self.gazetteer = gazetteer
+        # Formatted single-country sentences keyed on (row, column)
+        self.sentences = {}
+        # Final answers keyed on the normalized question, so exact repeats skip the NLP pipeline
+        self.answer_cache = answer_cache
 
 
 class CountryInformationStore:
@@ -10,93 +57,313 @@ class CountryInformationStore:
     COLUMN_BLUEPRINT = [
         {
             "column": "Region",
+            "label": "region",
             "definition": "Region: the geographic region where the country is located.",
             "template": "{country} is located in the {value} region.",
         },
         {
             "column": "Population",
+            "label": "population",
             "definition": "Population: the total number of people living in the country.",
             "template": "The population of {country} is {value} people.",
         },
         {
             "column": "Area (sq. mi.)",
+            "label": "area",
             "definition": "Area (sq. mi.): total surface area of the country measured in square miles (i.e. how big the country is).",
             "template": "{country} covers {value} square miles.",
         },
         {
             "column": "Pop. Density (per sq. mi.)",
+            "label": "population density",
             "definition": "Population Density (per sq. mi.): the average number of people living in each square mile of the country.",
             "template": "{country} has a population density of {value} people per square mile.",
         },
         {
             "column": "Coastline (coast/area ratio)",
+            "label": "coastline-to-area ratio",
             "definition": "Coastline (coast/area ratio): the ratio of coastline length to total land area.",
             "template": "The coastline-to-area ratio for {country} is {value}.",
         },
         {
             "column": "Net migration",
+            "label": "net migration rate",
             "definition": "Net migration: the number of people entering minus leaving the country per 1,000 residents.",
             "template": "{country} has a net migration rate of {value} people per 1,000 residents.",
         },
         {
             "column": "Infant mortality (per 1000 births)",
+            "label": "infant mortality rate",
             "definition": "Infant mortality: the number of infant deaths per 1,000 live births.",
             "template": "The infant mortality rate in {country} is {value} deaths per 1,000 births.",
         },
         {
             "column": "GDP ($ per capita)",
+            "label": "GDP per capita",
             "definition": "GDP ($ per capita): the average economic output per person in the country in US dollars.",
             "template": "The GDP per capita of {country} is ${value}.",
         },
         {
             "column": "Literacy (%)",
+            "label": "literacy rate",
             "definition": "Literacy: the percentage of people in the country who can read and write.",
             "template": "{country}'s literacy rate is {value}%.",
         },
         {
             "column": "Phones (per 1000)",
+            "label": "number of cellular subscriptions per 1,000 people",
             "definition": "Phones: the average number of cellular mobile phone subscriptions per 1,000 people.",
             "template": "There are {value} cellular subscriptions per 1,000 people in {country}.",
         },
         {
             "column": "Birthrate",
+            "label": "birthrate",
             "definition": "Birthrate: the number of births per 1,000 people each year.",
             "template": "{country} has a birthrate of {value} births per 1,000 people.",
         },
         {
             "column": "Deathrate",
+            "label": "death rate",
             "definition": "Deathrate: the number of deaths per 1,000 people each year.",
             "template": "{country} has a death rate of {value} deaths per 1,000 people.",
         },
+        {
+            "column": "Arable (%)",
+            "label": "share of arable land",
+            "definition": "Arable land: the percentage of the country's land that is suitable for farming and growing crops.",
+            "template": "{value}% of the land in {country} is arable.",
+        },
+        {
+            "column": "Crops (%)",
+            "label": "share of land under permanent crops",
+            "definition": "Crops: the percentage of the country's land planted with permanent crops such as orchards and vineyards.",
+            "template": "Permanent crops cover {value}% of the land in {country}.",
+        },
+        {
+            "column": "Climate",
+            "label": "climate zone code",
+            # Stored as float64 because of half zones ("1.5"); whole codes read "2", not "2.0"
+            "code": True,
+            "definition": "Climate: the climate zone of the country, from dry or tropical to temperate weather.",
+            "template": "{country} has a climate zone code of {value}.",
+        },
+        {
+            "column": "Agriculture",
+            "label": "agriculture share of GDP",
+            "definition": "Agriculture: the share of the country's economy (GDP) that comes from farming, fishing, and forestry.",
+            "template": "Agriculture makes up a {value} share of {country}'s GDP.",
+        },
+        {
+            "column": "Industry",
+            "label": "industry share of GDP",
+            "definition": "Industry: the share of the country's economy (GDP) that comes from manufacturing, mining, and construction.",
+            "template": "Industry makes up a {value} share of {country}'s GDP.",
+        },
+        {
+            "column": "Service",
+            "label": "service share of GDP",
+            "definition": "Service: the share of the country's economy (GDP) that comes from services such as retail, finance, and tourism.",
+            "template": "Services make up a {value} share of {country}'s GDP.",
+        },
     ]
 
-    def __init__(self, data_path, model_name="cross-encoder/ms-marco-MiniLM-L6-v2"):
+    COUNTRY_PLACEHOLDER = "<country>"
+
+    INTENT_ENGINES = ("cross-encoder", "bi-encoder")
+
+    # Comparison wording for questions that name several countries.
+    GREATER_PATTERN = re.compile(r"\b(bigger|larger|greater|higher|more|richer|wealthier|older|longer|denser)\b")
+    LESSER_PATTERN = re.compile(r"\b(smaller|lesser|lower|less|fewer|poorer|younger|shorter)\b")
+    YES_NO_PATTERN = re.compile(r"^\s*(is|are|does|do|has|have)\b")
+
+    # Only the NER component is used, so the rest of the pipeline is never loaded. NER in the
+    # en_core_web_* pipelines has its own internal tok2vec, so the shared one is dropped too.
+    SPACY_EXCLUDE = ("tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter")
+
+    def __init__(self, data_path, model_name="cross-encoder/ms-marco-MiniLM-L6-v2", intent_cache_size=1024, intent_cache_path=None,
+                 intent_engine="cross-encoder", bi_encoder_name="sentence-transformers/all-MiniLM-L6-v2", rerank_top_k=3,
+                 spacy_model="en_core_web_lg", registry=None, answer_cache_size=1024, cross_encoder_backend="torch",
+                 onnx_model_dir=None, inference_threads=None, entity_extractor="spacy"):
+        if intent_engine not in self.INTENT_ENGINES:
+            raise ValueError(f"Unknown intent engine: {intent_engine}")
+        if entity_extractor not in ENTITY_EXTRACTORS:
+            raise ValueError(f"Unknown entity extractor: {entity_extractor}")
+        if cross_encoder_backend not in CROSS_ENCODER_BACKENDS:
+            raise ValueError(f"Unknown cross-encoder backend: {cross_encoder_backend}")
+        if cross_encoder_backend.startswith("onnx") and not onnx_model_dir:
+            raise ValueError("The ONNX cross-encoder backends need onnx_model_dir (see tools/export_cross_encoder.py)")
         self.data_path = data_path
         self.model_name = model_name
+        self.bi_encoder_name = bi_encoder_name
+        self.intent_engine_name = intent_engine
+        self.rerank_top_k = rerank_top_k
+        self.spacy_model = spacy_model
+        self.entity_extractor_name = entity_extractor
+        self.cross_encoder_backend = cross_encoder_backend
+        self.onnx_model_dir = onnx_model_dir
+        # CPU threads for the intent model; None leaves the runtime's default (every core)
+        self.inference_threads = inference_threads
+        # Models are loaded on first use (or by warm_up) and shared through the registry
+        self.registry = registry or model_registry
+        self.warm_up_thread = None
+        # Set when a warm-up failed; a missing package or model would fail the same way again, so it is not retried
+        self.warm_up_error = None
+        # Column predictions keyed on the question with the country masked out. Keys start with the
+        # engine and backend, so a persisted cache written by another model is never served.
+        self.intent_cache_prefix = "/".join(str(part) for part in self.intent_engine_key()[1:]) + "|"
+        self.intent_cache = LRUCache(intent_cache_size, intent_cache_path)
+        self.answer_cache_size = answer_cache_size
         self.column_order = []
         self.templates = {}
+        self.labels = {}
+        self.code_columns = set()
         for entry in self.COLUMN_BLUEPRINT:
             column_name = entry["column"]
             self.column_order.append(column_name)
             self.templates[column_name] = entry["template"]
-        self.cross_encoder = CrossEncoder(model_name)
-        self.spacy_nlp = self.load_spacy_model()
-        self.country_records = []
+            self.labels[column_name] = entry["label"]
+            if entry.get("code"):
+                self.code_columns.add(column_name)
+        # Swapped whole by reload_dataset; a thread answering a batch pins the one it started with
+        self.current_snapshot = None
+        self.local = threading.local()
+        self.reload_lock = threading.Lock()
+        # Modification time of data_path when it was last loaded (or a reload of it was attempted)
+        self.seen_mtime = None
         self.load_dataset()
 
+    @property
+    def snapshot(self):
+        return getattr(self.local, "snapshot", None) or self.current_snapshot
+
+    @contextmanager
+    def pinned_snapshot(self, snapshot=None):
+        """Keeps this thread on one snapshot (the current one by default) until the block ends."""
+        previous = getattr(self.local, "snapshot", None)
+        self.local.snapshot = snapshot or previous or self.current_snapshot
+        try:
+            yield self.local.snapshot
+        finally:
+            self.local.snapshot = previous
+
+    @property
+    def country_table(self):
+        return self.snapshot.country_table
+
+    @property
+    def name_index(self):
+        return self.snapshot.name_index
+
+    @property
+    def query_engine(self):
+        return self.snapshot.query_engine
+
+    @property
+    def prefilter(self):
+        return self.snapshot.prefilter
+
+    @property
+    def sentences(self):
+        return self.snapshot.sentences
+
+    @property
+    def gazetteer(self):
+        return self.snapshot.gazetteer
+
+    @property
+    def answer_cache(self):
+        return self.snapshot.answer_cache
+
+    @property
+    def spacy_nlp(self):
+        return self.load_spacy_model()
+
+    @property
+    def cross_encoder(self):
+        return self.registry.get(self.cross_encoder_key(), lambda: load_cross_encoder(
+            self.model_name, self.cross_encoder_backend, self.onnx_model_dir, self.inference_threads))
+
+    @property
+    def intent_engine(self):
+        return self.registry.get(self.intent_engine_key(), self.build_intent_engine)
+
+    def warm_up(self, background=True, on_complete=None):
+        if self.warm_up_error is not None:
+            return None
+        if self.warm_up_thread and self.warm_up_thread.is_alive():
+            return self.warm_up_thread
+        loaders = [lambda: self.intent_engine]
+        if self.uses_spacy():
+            loaders.insert(0, self.load_spacy_model)
+        self.warm_up_thread = self.registry.warm_up(loaders, background, on_complete, self.record_warm_up_failure)
+        return self.warm_up_thread
+
+    def record_warm_up_failure(self, exc):
+        self.warm_up_error = exc
+
+    def is_ready(self):
+        spacy_ready = not self.uses_spacy() or self.registry.is_loaded(self.spacy_key())
+        return spacy_ready and self.registry.is_loaded(self.intent_engine_key())
+
+    def uses_spacy(self):
+        return self.entity_extractor_name != "gazetteer"
+
     def load_dataset(self):
-        dataset_frame = pd.read_csv(self.data_path)
-        dataset_frame["Country"] = dataset_frame["Country"].astype(str).str.strip()
-        country_records = []
-        for unused_index, row in dataset_frame.iterrows():
-            country_name = str(row.get("Country", "")).strip()
-            if not country_name:
-                continue
-            record = row.to_dict()
-            record["_display_name"] = country_name
-            country_records.append(record)
-        country_records.sort(key=lambda record: record["_display_name"].lower())
-        self.country_records = country_records
+        self.current_snapshot = self.build_snapshot()
+
+    def build_snapshot(self):
+        # The modification time is read first, so a write during the load is picked up by the next check
+        self.seen_mtime = self.data_mtime()
+        # Uses the precompiled artifact next to the CSV, re-parsing the CSV only when it changed
+        country_table, name_index = load_country_data(self.data_path)
+        gazetteer = GazetteerEntityExtractor(name_index) if self.entity_extractor_name != "spacy" else None
+        query_engine = CountryQueryEngine(country_table, code_columns=self.code_columns)
+        snapshot = DatasetSnapshot(country_table, name_index, query_engine,
+                                   QuestionPrefilter(name_index, self.column_order, gazetteer), gazetteer, LRUCache(self.answer_cache_size))
+        with self.pinned_snapshot(snapshot):
+            self.precompute_sentences()
+        return snapshot
+
+    def reload_dataset(self):
+        """Rebuilds the dataset snapshot from data_path and swaps it in, leaving the models loaded.
+
+        Meant to run off the event loop. Batches already being answered finish on the old snapshot.
+        Returns (reloaded, report), where report is one line with the duration and row changes.
+        """
+        with self.reload_lock:
+            started = time.perf_counter()
+            previous = self.current_snapshot
+            try:
+                snapshot = self.build_snapshot()
+            except Exception as exc:
+                return False, f"Reload of {self.data_path} failed, still serving the previous data: {exc}"
+            snapshot.prefilter.carry_counts(previous.prefilter)
+            self.current_snapshot = snapshot
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        previous_names = set(previous.country_table.row_index)
+        names = set(snapshot.country_table.row_index)
+        return True, (f"Reloaded {len(names)} countries in {elapsed_ms:.0f} ms "
+                      f"({len(names) - len(previous_names):+d} rows: {len(names - previous_names)} added, "
+                      f"{len(previous_names - names)} removed)")
+
+    def data_mtime(self):
+        try:
+            return os.stat(self.data_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def data_changed(self):
+        return self.data_mtime() != self.seen_mtime
+
+    def clear_caches(self):
+        """Drops cached answers and sentences (the intent cache only depends on wording, so it stays)."""
+        self.answer_cache.clear()
+        self.sentences.clear()
+
+    def precompute_sentences(self):
+        for record in self.country_table.records():
+            for column_name in self.column_order:
+                self.format_answer(record, column_name)
 
     def population_lookup(self, country_query):
         record = self.get_best_country_match(country_query)
@@ -107,64 +374,341 @@ class CountryInformationStore:
             return None
         return f"{formatted_population} people"
 
+    def prefilter_question(self, question):
+        """Answers from exact country names and column keywords alone, without spaCy or the intent model.
+
+        Returns (answer, needs_model); needs_model is False when the question was answered here or has
+        nothing country-like in it, so the NLP pipeline can be skipped.
+        """
+        if not question:
+            return None, False
+        with self.pinned_snapshot(), STAGE_SECONDS.time("prefilter"):
+            answer, needs_model, outcome = self.prefilter_decision(question)
+            self.prefilter.record(outcome)
+        return answer, needs_model
+
+    def prefilter_decision(self, question):
+        """prefilter_question without the metrics: returns (answer, needs_model, outcome)."""
+        match = self.prefilter.scan(question)
+        column_name = match.column_name
+        if match.rows and column_name:
+            records = [self.country_table.record(row) for row in match.rows]
+            if len(records) > 1:
+                answer = self.answer_comparison(question, records, column_name)
+            else:
+                answer = self.format_answer(records[0], column_name)
+            return answer, False, "answered"
+        if not match.rows:
+            query = self.query_engine.parse(question)
+            answer = self.render_table_query(query, column_name) if query and column_name else None
+            if answer:
+                return answer, False, "answered"
+            if not query and not match.country_like:
+                # Without a country or a table query the models would find nothing to answer either
+                return None, False, "skipped"
+        return None, True, "passed"
+
     def answer_question(self, question):
-        record = self.get_country_from_entities(question)
-        if not record:
+        return self.answer_questions([question])[0]
+
+    def answer_questions(self, questions):
+        """Answers a batch in order, with one spaCy pipe and one intent-model call for every uncached question."""
+        questions = list(questions)
+        # Every step below sees the same snapshot, even if a reload swaps it meanwhile
+        with self.pinned_snapshot():
+            answers = [None] * len(questions)
+            answer_keys = [self.normalize_question(question) if question else None for question in questions]
+            uncached = []
+            for position, answer_key in enumerate(answer_keys):
+                answers[position] = self.answer_cache.get(answer_key) if answer_key else None
+                if answers[position] is None:
+                    uncached.append(position)
+            CACHE_LOOKUPS.inc("answer", "hit", amount=len(questions) - len(uncached))
+            CACHE_LOOKUPS.inc("answer", "miss", amount=len(uncached))
+            if not uncached:
+                return answers
+
+            uncached_questions = [questions[position] for position in uncached]
+            plans = []
+            with STAGE_SECONDS.time("ner"):
+                batch_entity_texts = self.extract_entity_texts(uncached_questions)
+            with STAGE_SECONDS.time("match"):
+                for question, entity_texts in zip(uncached_questions, batch_entity_texts):
+                    plans.append(self.plan_question(question, entity_texts))
+            planned = [plan for plan in plans if plan]
+            with STAGE_SECONDS.time("intent"):
+                column_names = self.infer_columns([plan.question for plan in planned], [plan.cache_key for plan in planned])
+            for plan, column_name in zip(planned, column_names):
+                plan.column_name = column_name
+            with STAGE_SECONDS.time("format"):
+                for position, plan in zip(uncached, plans):
+                    answer = self.render_answer(plan) if plan else None
+                    answers[position] = answer
+                    # Unanswered questions are not cached: they may be answerable once the models have loaded
+                    if answer and answer_keys[position]:
+                        self.answer_cache.put(answer_keys[position], answer)
+            return answers
+
+    def plan_question(self, question, entity_texts):
+        if not question:
             return None
-        column_name = self.infer_column(question)
-        if not column_name:
+        return self.plan_from_matches(question, self.match_entities(entity_texts))
+
+    def plan_from_matches(self, question, matches):
+        """Plans question from its match_entities result; without a country it may still be a table query."""
+        if matches:
+            records = [record for record, unused_entity_text in matches]
+            matched_texts = [entity_text for unused_record, entity_text in matches]
+            return QuestionPlan(question, records, None, self.intent_cache_key(question, *matched_texts))
+        query = self.query_engine.parse(question)
+        if query:
+            return QuestionPlan(question, [], query, self.intent_cache_key(question, query.region_text))
+        return None
+
+    def render_answer(self, plan):
+        if not plan.column_name:
             return None
-        value = record.get(column_name)
-        if value is None:
-            return f"I don't have {column_name.lower()} data for {record['_display_name']}."
+        if plan.query:
+            return self.render_table_query(plan.query, plan.column_name)
+        if len(plan.records) > 1:
+            return self.answer_comparison(plan.question, plan.records, plan.column_name)
+        return self.format_answer(plan.records[0], plan.column_name)
+
+    def format_answer(self, record, column_name):
+        sentence_key = (record.row, column_name)
+        sentence = self.sentences.get(sentence_key)
+        if sentence is None:
+            sentence = self.sentences[sentence_key] = self.build_sentence(record, column_name)
+        return sentence
+
+    def build_sentence(self, record, column_name):
+        if record.is_null(column_name):
+            return f"I don't have {column_name.lower()} data for {record.display_name}."
         template = self.templates.get(column_name, "{country}: {value}")
-        return template.format(country=record["_display_name"], value=value)
+        return template.format(country=record.display_name, value=self.display_value(record, column_name))
 
-    def get_country_from_entities(self, question):
-        if not self.spacy_nlp or not question:
+    def display_value(self, record, column_name):
+        value = record.get(column_name)
+        if column_name in self.code_columns and value is not None:
+            return self.format_number(value)
+        return value
+
+    def render_table_query(self, query, column_name):
+        if column_name in self.code_columns:
+            return f"The {self.labels[column_name]} is a category, so I can't rank or average it."
+        if column_name not in self.query_engine.sort_orders:
             return None
-        document = self.spacy_nlp(question)
-        for entity in document.ents:
-            if entity.label_ in {"GPE", "LOC"}:
-                record = self.get_best_country_match(entity.text)
-                if record:
-                    return record
-        return None
+        label = self.labels[column_name]
+        scope = f" in {query.scope_name}" if query.scope_name else ""
+        if query.kind == "aggregate":
+            function = query.function or self.query_engine.default_function(column_name)
+            value, country_count = self.query_engine.aggregate(column_name, function, query.regions)
+            if value is None:
+                return f"I don't have {label} data{scope}."
+            function_name = {"mean": "average", "median": "median", "sum": "total"}[function]
+            return f"The {function_name} {label}{scope} is {self.format_number(value)} across {country_count} countries."
+
+        rows = self.query_engine.ranked_rows(column_name, query.descending, query.limit, query.regions)
+        if not rows:
+            return f"I don't have {label} data{scope}."
+        direction = "highest" if query.descending else "lowest"
+        if query.kind == "superlative":
+            record = self.country_table.record(rows[0])
+            return f"{record.display_name} has the {direction} {label}{scope}. {self.format_answer(record, column_name)}"
+        ranking = []
+        for row in rows:
+            record = self.country_table.record(row)
+            ranking.append(f"{record.display_name} ({self.display_value(record, column_name)})")
+        return f"The {len(rows)} countries{scope} with the {direction} {label}: {', '.join(ranking)}."
+
+    def answer_comparison(self, question, records, column_name):
+        """Answers one column for several countries and says which one comes out on top."""
+        sentences = [self.format_answer(record, column_name) for record in records]
+        compared = [record for record in records if not record.is_null(column_name)]
+        label = self.labels[column_name]
+        if column_name in self.code_columns and len(compared) >= 2:
+            # Codes name categories, so they can match or differ but none is "higher"
+            if len(set(record.get(column_name) for record in compared)) == 1:
+                sentences.append(f"They have the same {label}.")
+            else:
+                sentences.append(f"They have different {label}s.")
+            return " ".join(sentences)
+        if column_name not in self.query_engine.sort_orders or len(compared) < 2:
+            return " ".join(sentences)
+        text = question.lower()
+        lesser_match = self.LESSER_PATTERN.search(text)
+        greater_match = self.GREATER_PATTERN.search(text)
+        wants_lesser = bool(lesser_match and (not greater_match or lesser_match.start() < greater_match.start()))
+        values = [record.get(column_name) for record in compared]
+        if len(set(values)) == 1:
+            sentences.append(f"They have the same {label}.")
+            return " ".join(sentences)
+        if len(compared) == 2:
+            pick = min if wants_lesser else max
+            winner = compared[values.index(pick(values))]
+            sentences.append(f"{winner.display_name} has the {'lower' if wants_lesser else 'higher'} {label}.")
+            # Yes/no questions such as "Is France bigger than Spain?" compare the first country to the second.
+            if self.YES_NO_PATTERN.match(text) and (lesser_match or greater_match):
+                first_wins = (values[0] < values[1]) if wants_lesser else (values[0] > values[1])
+                sentences.insert(0, "Yes." if first_wins else "No.")
+        else:
+            pick = min if wants_lesser else max
+            winner = compared[values.index(pick(values))]
+            sentences.append(f"{winner.display_name} has the {'lowest' if wants_lesser else 'highest'} {label} of the {len(compared)}.")
+        return " ".join(sentences)
+
+    @staticmethod
+    def format_number(value):
+        if isinstance(value, int) or float(value).is_integer():
+            return str(int(value))
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+
+    def get_country_from_entities(self, question):
+        record, unused_entity_text = self.find_country_entity(question)
+        return record
+
+    def find_country_entity(self, question):
+        """Returns the first matched country record and the entity text it came from."""
+        matches = self.find_country_entities(question)
+        if not matches:
+            return None, None
+        return matches[0]
+
+    def find_country_entities(self, question):
+        """Returns (record, entity text) for every distinct country mentioned, in order."""
+        if not question:
+            return []
+        return self.match_entities(self.extract_entity_texts([question])[0])
+
+    def extract_entity_texts(self, questions):
+        """Returns the country-like texts in each question, from the gazetteer, spaCy NER, or the gazetteer then NER."""
+        if self.entity_extractor_name == "spacy":
+            return self.extract_ner_texts(questions)
+        entity_texts = self.gazetteer.extract_many(questions)
+        if self.entity_extractor_name == "gazetteer+spacy":
+            # NER only sees the questions the gazetteer found nothing in
+            missing = [position for position, texts in enumerate(entity_texts) if not texts]
+            if missing:
+                for position, texts in zip(missing, self.extract_ner_texts([questions[position] for position in missing])):
+                    entity_texts[position] = texts
+        return entity_texts
+
+    def extract_ner_texts(self, questions):
+        """Runs NER over the batch with nlp.pipe and returns the GPE/LOC texts found in each question."""
+        nlp = self.spacy_nlp
+        if not nlp:
+            return [[] for unused_question in questions]
+        entity_texts = []
+        for document in nlp.pipe([question or "" for question in questions]):
+            entity_texts.append([entity.text for entity in document.ents if entity.label_ in {"GPE", "LOC"}])
+        return entity_texts
+
+    def match_entities(self, entity_texts):
+        # Regions ("South America", "North Africa") are a few edits from countries; they belong to table queries
+        entity_texts = [entity_text for entity_text in entity_texts if not self.is_region_phrase(entity_text)]
+        matches = []
+        seen_rows = set()
+        for entity_text, row in zip(entity_texts, self.name_index.lookup_many(entity_texts)):
+            if row is None or row in seen_rows:
+                continue
+            seen_rows.add(row)
+            matches.append((self.country_table.record(row), entity_text))
+        return matches
+
+    def is_region_phrase(self, text):
+        key = self.name_index.normalize(text)
+        return key in self.query_engine.region_phrases and key not in self.name_index.entries
+
+    def intent_cache_key(self, question, *entity_texts):
+        key = self.normalize_question(question)
+        for entity_text in entity_texts:
+            if entity_text:
+                # Whole words only, so masking "oman" leaves "woman" and "romania" alone
+                key = re.sub(rf"\b{re.escape(self.normalize_question(entity_text))}\b", self.COUNTRY_PLACEHOLDER, key)
+        return self.intent_cache_prefix + key
+
+    @staticmethod
+    def normalize_question(text):
+        text = re.sub(r"[^\w\s']", " ", text.lower())
+        return re.sub(r"\s+", " ", text).strip()
 
     def get_best_country_match(self, text):
         if not text:
             return None
-        target = text.strip().lower()
-        if not target:
+        row = self.name_index.lookup(text)
+        if row is None:
             return None
-        best_record = None
-        best_distance = None
-        for record in self.country_records:
-            candidate = record["_display_name"].lower()
-            distance = Levenshtein.distance(target, candidate)
-            if best_distance is None or distance < best_distance:
-                best_distance = distance
-                best_record = record
-        return best_record
-
-    def infer_column(self, question):
+        return self.country_table.record(row)
+
+    def infer_column(self, question, cache_key=None):
         if not question:
             return None
-        comparison_pairs = []
-        for entry in self.COLUMN_BLUEPRINT:
-            comparison_pairs.append((question, entry["definition"]))
-        scores = self.cross_encoder.predict(comparison_pairs)
-        best_index = 0
-        best_score = None
-        for index, score in enumerate(scores):
-            if best_score is None or score > best_score:
-                best_score = score
-                best_index = index
-        return self.column_order[best_index]
+        if cache_key is None:
+            cache_key = self.intent_cache_key(question)
+        return self.infer_columns([question], [cache_key])[0]
+
+    def infer_columns(self, questions, cache_keys):
+        """Infers columns for a batch; cache misses (one per distinct key) share one model call."""
+        column_names = [None] * len(questions)
+        pending = {}
+        for position, (question, cache_key) in enumerate(zip(questions, cache_keys)):
+            if not question:
+                continue
+            column_name = self.intent_cache.get(cache_key)
+            if column_name in self.templates:
+                column_names[position] = column_name
+            else:
+                pending.setdefault(cache_key, []).append(position)
+        misses = sum(len(positions) for positions in pending.values())
+        CACHE_LOOKUPS.inc("intent", "hit", amount=sum(1 for question in questions if question) - misses)
+        CACHE_LOOKUPS.inc("intent", "miss", amount=misses)
+        if not pending:
+            return column_names
+        pending_keys = list(pending)
+        best_indices = self.intent_engine.best_indices([questions[pending[cache_key][0]] for cache_key in pending_keys])
+        for cache_key, best_index in zip(pending_keys, best_indices):
+            column_name = self.column_order[best_index]
+            self.intent_cache.put(cache_key, column_name)
+            for position in pending[cache_key]:
+                column_names[position] = column_name
+        return column_names
+
+    def cross_encoder_key(self):
+        return ("cross-encoder", self.model_name, self.cross_encoder_backend, self.onnx_model_dir)
+
+    def intent_engine_key(self):
+        return ("intent-engine", self.intent_engine_name, self.model_name, self.bi_encoder_name, self.rerank_top_k,
+                self.cross_encoder_backend, self.onnx_model_dir)
+
+    def set_inference_threads(self, threads):
+        """Limits the models' CPU threads, e.g. to one worker process's share of the cores."""
+        self.inference_threads = threads
+        if "torch" in sys.modules:
+            sys.modules["torch"].set_num_threads(threads)
+        if self.registry.is_loaded(self.cross_encoder_key()):
+            cross_encoder = self.cross_encoder
+            if hasattr(cross_encoder, "set_num_threads"):
+                cross_encoder.set_num_threads(threads)
+
+    def build_intent_engine(self):
+        definitions = [entry["definition"] for entry in self.COLUMN_BLUEPRINT]
+        if self.intent_engine_name == "bi-encoder":
+            bi_encoder = self.registry.get(("sentence-transformer", self.bi_encoder_name), lambda: load_sentence_transformer(self.bi_encoder_name))
+            return BiEncoderIntentEngine(bi_encoder, definitions, self.cross_encoder, self.rerank_top_k)
+        return CrossEncoderIntentEngine(self.cross_encoder, definitions)
+
+    def save_intent_cache(self):
+        self.intent_cache.save()
+
+    def spacy_key(self):
+        return ("spacy", self.spacy_model, self.SPACY_EXCLUDE)
 
     def load_spacy_model(self):
+        return self.registry.get(self.spacy_key(), self.build_spacy_model)
+
+    def build_spacy_model(self):
         try:
-            return spacy.load("en_core_web_lg")
+            return load_spacy(self.spacy_model, self.SPACY_EXCLUDE)
         except Exception as exc:
             print(f"Failed to load spaCy model: {exc}")
             return None
@@ -0,0 +1,216 @@
+import re
+import Levenshtein
+
+
+class DeletionIndex:
+    """Edit-distance search over a fixed set of words through their deletion neighborhoods (as in SymSpell).
+
+    Two words within d edits share a string reachable from each by at most d deletions, and this still
+    holds for their first PREFIX_LENGTH characters. Every deletion of each word's prefix is hashed once,
+    so a search hashes the query's own prefix deletions and compares only the words found that way.
+    """
+
+    PREFIX_LENGTH = 7
+
+    def __init__(self, max_distance=2):
+        self.max_distance = max_distance
+        self.words = []
+        # deletion of a word's prefix -> words it was made from
+        self.deletions = {}
+
+    @property
+    def size(self):
+        return len(self.words)
+
+    @staticmethod
+    def deletion_neighborhood(word, depth):
+        found = {word}
+        frontier = {word}
+        for unused_depth in range(depth):
+            frontier = {text[:position] + text[position + 1:] for text in frontier for position in range(len(text))}
+            found |= frontier
+        return found
+
+    def to_dict(self):
+        # The deletions are rebuilt on load; they are many times the size of the words
+        return {"max_distance": self.max_distance, "words": self.words}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data["max_distance"])
+        for word in data["words"]:
+            index.add(word)
+        return index
+
+    def add(self, word):
+        self.words.append(word)
+        for deletion in self.deletion_neighborhood(word[:self.PREFIX_LENGTH], self.max_distance):
+            self.deletions.setdefault(deletion, []).append(word)
+
+    def candidates(self, word, max_distance):
+        """Words that may be within max_distance of word; a superset of what search() returns."""
+        if max_distance > self.max_distance:
+            raise ValueError(f"The index was built for at most {self.max_distance} edits, not {max_distance}")
+        found = set()
+        for deletion in self.deletion_neighborhood(word[:self.PREFIX_LENGTH], max_distance):
+            words = self.deletions.get(deletion)
+            if words:
+                found.update(words)
+        return found
+
+    def search(self, word, max_distance):
+        """Returns (distance, word) pairs within max_distance of word."""
+        matches = []
+        for candidate in self.candidates(word, max_distance):
+            distance = Levenshtein.distance(word, candidate, score_cutoff=max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return matches
+
+
+class CountryNameIndex:
+    """Normalized name and alias lookup with a fuzzy fallback for misspellings."""
+
+    # Common alternate names mapped to the display name used in the dataset.
+    ALIASES = {
+        "usa": "United States",
+        "us": "United States",
+        "u s": "United States",
+        "u s a": "United States",
+        "united states of america": "United States",
+        "uk": "United Kingdom",
+        "u k": "United Kingdom",
+        "britain": "United Kingdom",
+        "great britain": "United Kingdom",
+        "england": "United Kingdom",
+        "ivory coast": "Cote d'Ivoire",
+        "cote divoire": "Cote d'Ivoire",
+        "myanmar": "Burma",
+        "timor leste": "East Timor",
+        "eswatini": "Swaziland",
+        "north macedonia": "Macedonia",
+        "czechia": "Czech Republic",
+        "korea": "South Korea",
+        "republic of korea": "South Korea",
+        "dprk": "North Korea",
+        "uae": "United Arab Emirates",
+        "emirates": "United Arab Emirates",
+        "holland": "Netherlands",
+        "the netherlands": "Netherlands",
+        "drc": "Congo, Dem. Rep.",
+        "democratic republic of the congo": "Congo, Dem. Rep.",
+        "congo": "Congo, Repub. of the",
+        "republic of the congo": "Congo, Repub. of the",
+        "congo brazzaville": "Congo, Repub. of the",
+        "central african republic": "Central African Rep.",
+        "micronesia": "Micronesia, Fed. St.",
+        "st kitts and nevis": "Saint Kitts & Nevis",
+        "st lucia": "Saint Lucia",
+        "st vincent and the grenadines": "Saint Vincent and the Grenadines",
+        "saint pierre and miquelon": "St Pierre & Miquelon",
+        "northern mariana islands": "N. Mariana Islands",
+        "british virgin islands": "British Virgin Is.",
+        "turks and caicos islands": "Turks & Caicos Is",
+        "bosnia": "Bosnia & Herzegovina",
+        "trinidad": "Trinidad & Tobago",
+        "russian federation": "Russia",
+        "viet nam": "Vietnam",
+        "persia": "Iran",
+    }
+
+    # Fraction of the query length allowed as edit distance for a fuzzy match, up to MAX_DISTANCE edits.
+    MAX_DISTANCE_RATIO = 0.34
+    # Wider searches match unrelated names and need a much larger deletion index
+    MAX_DISTANCE = 2
+
+    def __init__(self, max_distance_ratio=None):
+        self.max_distance_ratio = max_distance_ratio if max_distance_ratio is not None else self.MAX_DISTANCE_RATIO
+        self.entries = {}
+        self.fuzzy_index = DeletionIndex(self.MAX_DISTANCE)
+
+    @staticmethod
+    def normalize(text):
+        if not text:
+            return ""
+        normalized = text.strip().lower()
+        normalized = normalized.replace("&", " and ")
+        normalized = re.sub(r"'s\b", "", normalized)
+        normalized = re.sub(r"[^\w\s]", " ", normalized)
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        if normalized.startswith("the "):
+            normalized = normalized[4:]
+        return normalized
+
+    def name_variants(self, display_name):
+        variants = [self.normalize(display_name)]
+        # "Bahamas, The" and "Gambia, The" are also known without the trailing article.
+        head, separator, tail = display_name.partition(",")
+        if separator and tail.strip().lower() == "the":
+            variants.append(self.normalize(head))
+        return variants
+
+    def add(self, key, value, rank):
+        key = self.normalize(key)
+        if not key or key in self.entries:
+            return
+        self.entries[key] = (rank, value)
+        self.fuzzy_index.add(key)
+
+    def build(self, named_values, aliases=None):
+        """Indexes (display_name, value) pairs plus any aliases that point at them."""
+        self.entries = {}
+        self.fuzzy_index = DeletionIndex(self.MAX_DISTANCE)
+        values_by_name = {}
+        rank = 0
+        for display_name, value in named_values:
+            values_by_name[display_name] = value
+            for variant in self.name_variants(display_name):
+                self.add(variant, value, rank)
+            rank += 1
+        alias_table = self.ALIASES if aliases is None else aliases
+        for alias, display_name in alias_table.items():
+            if display_name in values_by_name:
+                self.add(alias, values_by_name[display_name], rank)
+                rank += 1
+        return self
+
+    def to_dict(self):
+        return {
+            "max_distance_ratio": self.max_distance_ratio,
+            "entries": [[key, rank, value] for key, (rank, value) in self.entries.items()],
+            "fuzzy_index": self.fuzzy_index.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data["max_distance_ratio"])
+        index.entries = {key: (rank, value) for key, rank, value in data["entries"]}
+        index.fuzzy_index = DeletionIndex.from_dict(data["fuzzy_index"])
+        return index
+
+    def max_distance_for(self, key):
+        return min(self.MAX_DISTANCE, max(1, int(len(key) * self.max_distance_ratio + 0.5)))
+
+    def lookup_many(self, texts):
+        """Looks up several names at once; repeated names are only resolved once."""
+        resolved = {}
+        results = []
+        for text in texts:
+            key = self.normalize(text)
+            if key not in resolved:
+                resolved[key] = self.lookup(key)
+            results.append(resolved[key])
+        return results
+
+    def lookup(self, text):
+        key = self.normalize(text)
+        if not key:
+            return None
+        exact = self.entries.get(key)
+        if exact:
+            return exact[1]
+        matches = self.fuzzy_index.search(key, self.max_distance_for(key))
+        if not matches:
+            return None
+        best_distance, best_key = min(matches, key=lambda match: (match[0], self.entries[match[1]][0]))
+        return self.entries[best_key][1]
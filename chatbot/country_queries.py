@@ -0,0 +1,171 @@
+import re
+import numpy as np
+from chatbot.country_name_index import CountryNameIndex
+
+
+class CountryQuery:
+    """A ranking or aggregate question over many countries."""
+
+    def __init__(self, kind, descending=True, limit=1, regions=None, region_text=None, scope_name=None, function=None):
+        self.kind = kind
+        self.descending = descending
+        self.limit = limit
+        self.regions = regions or ()
+        self.region_text = region_text
+        self.scope_name = scope_name
+        self.function = function
+
+
+class CountryQueryEngine:
+    """Detects superlative, top-k and aggregate questions and answers them with whole-column operations."""
+
+    # Phrases that name a group of regions instead of one region from the dataset.
+    REGION_ALIASES = {
+        "europe": ("Western Europe", "Eastern Europe", "Baltics"),
+        "africa": ("Sub-Saharan Africa", "Northern Africa"),
+        "asia": ("Asia (Ex. Near East)",),
+        "latin america": ("Latin Amer. & Carib",),
+        "south america": ("Latin Amer. & Carib",),
+        "central america": ("Latin Amer. & Carib",),
+        "caribbean": ("Latin Amer. & Carib",),
+        "north america": ("Northern America",),
+        "north africa": ("Northern Africa",),
+        "middle east": ("Near East",),
+        "sub saharan africa": ("Sub-Saharan Africa",),
+        "commonwealth of independent states": ("C.W. Of Ind. States",),
+        "former soviet union": ("C.W. Of Ind. States",),
+        "baltic states": ("Baltics",),
+    }
+    NUMBER_WORDS = {
+        "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    }
+    MAX_LIMIT = 20
+    # Extensive columns are summed over a region when no aggregate is named ("How many people live in Europe?").
+    SUMMABLE_COLUMNS = ("Population", "Area (sq. mi.)")
+
+    # "most", "least" and "fewest" are only superlatives after "the" or "is/are" ("the most people", "is most
+    # populous"); on their own they usually quantify ("most countries have high literacy").
+    DESCENDING_PATTERN = re.compile(r"\b(highest|largest|biggest|greatest|(?:the|is|are) most|richest|top|maximum|max)\b")
+    ASCENDING_PATTERN = re.compile(r"\b(lowest|smallest|(?:the|is|are) (?:least|fewest)|poorest|tiniest|minimum|min|bottom)\b")
+    TOP_K_PATTERN = re.compile(
+        r"\b(?:top|bottom)\s+(\d+|two|three|four|five|six|seven|eight|nine|ten)\b"
+        r"|\b(\d+|two|three|four|five|six|seven|eight|nine|ten)\s+(?:countries|nations|most|least|highest|lowest|largest|smallest|biggest|richest|poorest)\b"
+    )
+    # Without a region, a ranking or aggregate only counts when it is clearly about countries.
+    SCOPE_PATTERN = re.compile(r"\b(country|countries|nation|nations|world|worldwide)\b")
+    AGGREGATE_PATTERNS = (
+        ("mean", re.compile(r"\b(average|mean|typical)\b")),
+        ("median", re.compile(r"\bmedian\b")),
+        ("sum", re.compile(r"\b(total|sum|combined|altogether)\b")),
+    )
+
+    def __init__(self, table, region_column="Region", code_columns=()):
+        self.table = table
+        regions = table.columns[region_column]
+        self.region_masks = {}
+        for region in sorted(set(str(region) for region in regions)):
+            if region:
+                self.region_masks[region] = regions == region
+        # Row order per measured column, largest first, with null rows left out. Code columns (Climate)
+        # hold categories, which are neither ranked nor averaged.
+        self.sort_orders = {}
+        for column_name, values in table.columns.items():
+            if column_name in table.TEXT_COLUMNS or column_name in code_columns:
+                continue
+            valid_rows = np.flatnonzero(~table.null_masks[column_name])
+            self.sort_orders[column_name] = valid_rows[np.argsort(-values[valid_rows], kind="stable")]
+        self.scope_masks = {}
+        self.region_phrases = {}
+        for region in self.region_masks:
+            self.region_phrases[CountryNameIndex.normalize(region)] = (region,)
+        for phrase, aliased_regions in self.REGION_ALIASES.items():
+            known_regions = tuple(region for region in aliased_regions if region in self.region_masks)
+            if known_regions:
+                self.region_phrases.setdefault(phrase, known_regions)
+        alternatives = "|".join(re.escape(phrase) for phrase in sorted(self.region_phrases, key=len, reverse=True))
+        self.region_pattern = re.compile(r"\b(" + alternatives + r")\b")
+
+    def find_regions(self, question):
+        """Returns (regions, matched phrase) for the first region named in the question."""
+        match = self.region_pattern.search(CountryNameIndex.normalize(question))
+        if not match:
+            return (), None
+        return self.region_phrases[match.group(1)], match.group(1)
+
+    def parse(self, question):
+        if not question:
+            return None
+        text = question.lower()
+        regions, region_text = self.find_regions(question)
+        if not regions and not self.SCOPE_PATTERN.search(text):
+            return None
+        if len(regions) == 1:
+            scope_name = regions[0]
+        else:
+            scope_name = region_text.title() if region_text else None
+
+        for function, pattern in self.AGGREGATE_PATTERNS:
+            if pattern.search(text):
+                return CountryQuery("aggregate", regions=regions, region_text=region_text, scope_name=scope_name, function=function)
+
+        descending_match = self.DESCENDING_PATTERN.search(text)
+        ascending_match = self.ASCENDING_PATTERN.search(text)
+        top_k_match = self.TOP_K_PATTERN.search(text)
+        if descending_match or ascending_match or top_k_match:
+            # When both directions appear ("most ... least"), the first one mentioned wins.
+            descending = not ascending_match or bool(descending_match and descending_match.start() < ascending_match.start())
+            if top_k_match and top_k_match.group(0).startswith("bottom"):
+                descending = False
+            limit = 1
+            if top_k_match:
+                count_text = top_k_match.group(1) or top_k_match.group(2)
+                limit = int(count_text) if count_text.isdigit() else self.NUMBER_WORDS[count_text]
+                limit = max(1, min(limit, self.MAX_LIMIT))
+            kind = "top" if limit > 1 else "superlative"
+            return CountryQuery(kind, descending, limit, regions, region_text, scope_name)
+
+        if regions:
+            return CountryQuery("aggregate", regions=regions, region_text=region_text, scope_name=scope_name)
+        return None
+
+    def scope_mask(self, regions):
+        if not regions:
+            return None
+        if regions not in self.scope_masks:
+            self.scope_masks[regions] = np.logical_or.reduce([self.region_masks[region] for region in regions])
+        return self.scope_masks[regions]
+
+    def ranked_rows(self, column_name, descending=True, limit=1, regions=()):
+        order = self.sort_orders.get(column_name)
+        if order is None:
+            return []
+        if not descending:
+            order = order[::-1]
+        mask = self.scope_mask(regions)
+        if mask is not None:
+            order = order[mask[order]]
+        return [int(row) for row in order[:limit]]
+
+    def default_function(self, column_name):
+        return "sum" if column_name in self.SUMMABLE_COLUMNS else "mean"
+
+    def aggregate(self, column_name, function=None, regions=()):
+        """Returns (value, number of countries with data) or (None, 0)."""
+        if column_name not in self.sort_orders:
+            return None, 0
+        if function is None:
+            function = self.default_function(column_name)
+        valid = ~self.table.null_masks[column_name]
+        mask = self.scope_mask(regions)
+        if mask is not None:
+            valid = valid & mask
+        values = self.table.columns[column_name][valid]
+        if not len(values):
+            return None, 0
+        if function == "sum":
+            result = values.sum()
+        elif function == "median":
+            result = np.median(values)
+        else:
+            result = values.mean()
+        return result.item(), len(values)
@@ -0,0 +1,105 @@
+import re
+import numpy as np
+
+
+class CountryRecord:
+    """Lightweight view of one row of a CountryTable."""
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __eq__(self, other):
+        return isinstance(other, CountryRecord) and other.table is self.table and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    def __repr__(self):
+        return f"CountryRecord({self.display_name!r})"
+
+    @property
+    def display_name(self):
+        return self.table.display_name(self.row)
+
+    def get(self, column_name, default=None):
+        return self.table.value(self.row, column_name, default)
+
+    def is_null(self, column_name):
+        return self.table.is_null(self.row, column_name)
+
+
+class CountryTable:
+    """Country statistics stored as typed NumPy columns with per-column null masks."""
+
+    NAME_COLUMN = "Country"
+    TEXT_COLUMNS = ("Country", "Region")
+
+    # Numbers in the source data use either "." or "," as the decimal separator (e.g. "-4,93").
+    NUMBER_PATTERN = re.compile(r"^[-+]?(\d+([.,]\d*)?|[.,]\d+)$")
+
+    def __init__(self, column_names, columns, null_masks):
+        self.column_names = list(column_names)
+        self.columns = columns
+        self.null_masks = null_masks
+        self.names = columns[self.NAME_COLUMN]
+        self.row_index = {str(name): row for row, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def clean_text(value):
+        return re.sub(r"\s+", " ", (value or "").strip().strip('"')).strip()
+
+    @classmethod
+    def parse_number(cls, value):
+        text = cls.clean_text(value)
+        if not cls.NUMBER_PATTERN.match(text):
+            return None
+        return float(text.replace(",", "."))
+
+    @classmethod
+    def from_rows(cls, header, rows):
+        name_position = header.index(cls.NAME_COLUMN)
+        rows = sorted(rows, key=lambda row: cls.clean_text(row[name_position]).lower())
+        columns = {}
+        null_masks = {}
+        for position, column_name in enumerate(header):
+            raw_values = [row[position] for row in rows]
+            if column_name in cls.TEXT_COLUMNS:
+                values = [cls.clean_text(value) for value in raw_values]
+                columns[column_name] = np.array(values, dtype=str)
+                null_masks[column_name] = np.array([not value for value in values], dtype=bool)
+                continue
+            numbers = [cls.parse_number(value) for value in raw_values]
+            null_mask = np.array([number is None for number in numbers], dtype=bool)
+            values = np.array([0.0 if number is None else number for number in numbers], dtype=np.float64)
+            # Columns written without any decimals (Population, Area, GDP) are kept as integers.
+            has_decimals = any(re.search(r"[.,]", value) for value in raw_values if value)
+            if not has_decimals:
+                values = values.astype(np.int64)
+            columns[column_name] = values
+            null_masks[column_name] = null_mask
+        return cls(header, columns, null_masks)
+
+    def record(self, row):
+        return CountryRecord(self, row)
+
+    def records(self):
+        return [CountryRecord(self, row) for row in range(len(self))]
+
+    def display_name(self, row):
+        return str(self.names[row])
+
+    def is_null(self, row, column_name):
+        null_mask = self.null_masks.get(column_name)
+        return null_mask is None or bool(null_mask[row])
+
+    def value(self, row, column_name, default=None):
+        if self.is_null(row, column_name):
+            return default
+        # .item() turns NumPy scalars into plain int/float/str for formatting.
+        return self.columns[column_name][row].item()
@@ -0,0 +1,87 @@
+import json
+import os
+import numpy as np
+
+
+# "torch" is the stock sentence-transformers CrossEncoder; the others trade a little precision for speed and memory
+CROSS_ENCODER_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+# Written by tools/export_cross_encoder.py next to the exported model files
+EXPORT_CONFIG_NAME = "export_config.json"
+
+
+def sigmoid(scores):
+    return 1.0 / (1.0 + np.exp(-scores))
+
+
+def quantize_cross_encoder(cross_encoder):
+    """Swaps the cross-encoder's Linear layers for int8 dynamically quantized ones, in place."""
+    import torch
+
+    torch.quantization.quantize_dynamic(cross_encoder.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return cross_encoder
+
+
+class OnnxCrossEncoder:
+    """Runs a cross-encoder exported by tools/export_cross_encoder.py on ONNX Runtime.
+
+    predict() matches sentence_transformers.CrossEncoder.predict, so the intent engines use it
+    unchanged. Pairs are tokenized with the exported tokenizer.json, so neither torch nor transformers
+    is imported. ONNX Runtime sessions do not survive fork; a forked worker opens its own on first use.
+    """
+
+    def __init__(self, model_dir, quantized=False, threads=None):
+        with open(os.path.join(model_dir, EXPORT_CONFIG_NAME), encoding="utf-8") as config_file:
+            self.config = json.load(config_file)
+        model_file = self.config["quantized_model"] if quantized else self.config["model"]
+        if not model_file:
+            raise ValueError(f"No quantized model was exported to {model_dir}")
+        self.model_path = os.path.join(model_dir, model_file)
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config["max_length"])
+        # Pads each batch to its longest pair, as the transformers tokenizer does for CrossEncoder
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+        self.threads = threads
+        self.session = None
+        self.session_pid = None
+        self.input_names = ()
+
+    def set_num_threads(self, threads):
+        self.threads = threads
+        # Reopened with the new thread count on the next predict
+        self.session = None
+
+    def get_session(self):
+        if self.session is None or self.session_pid != os.getpid():
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+            options.inter_op_num_threads = 1
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            self.session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+            self.session_pid = os.getpid()
+        return self.session
+
+    def predict(self, sentence_pairs, batch_size=32):
+        sentence_pairs = [tuple(pair) for pair in sentence_pairs]
+        if not sentence_pairs:
+            return np.zeros(0, dtype=np.float32)
+        session = self.get_session()
+        scores = []
+        for start in range(0, len(sentence_pairs), batch_size):
+            encodings = self.tokenizer.encode_batch(sentence_pairs[start:start + batch_size])
+            inputs = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+            }
+            logits = session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+            scores.append(logits[:, 0])
+        scores = np.concatenate(scores)
+        # CrossEncoder applies a sigmoid to single-label models; doing the same keeps scores comparable
+        return sigmoid(scores) if self.config.get("activation") == "sigmoid" else scores
@@ -0,0 +1,221 @@
+"""
+Precompiled country dataset: typed column arrays plus the name index, stored next to the CSV.
+
+Build it (and the cleaned CSV) from the raw export with:
+    python -m chatbot.dataset_artifact
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+from chatbot.country_name_index import CountryNameIndex
+from chatbot.country_table import CountryTable
+
+
+ARTIFACT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+REQUIRED_COLUMNS = ("Country", "Region", "Population", "Area (sq. mi.)")
+
+
+class DatasetValidationError(ValueError):
+    pass
+
+
+def default_artifact_path(data_path):
+    return os.path.splitext(data_path)[0] + ".cache"
+
+
+def source_hash(data_path):
+    digest = hashlib.sha256()
+    with open(data_path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def clean_region(region):
+    if not region:
+        return ""
+    region = region.strip().strip('"').strip()
+    region = re.sub(r"\s+", " ", region)
+    return region.title()
+
+
+def clean_decimal(value):
+    if not value:
+        return value
+    value = value.strip().strip('"').strip()
+    # Decimal commas, including negatives and a missing leading zero: "0,38", "-4,93", ",5"
+    if re.match(r"^[-+]?\d*,\d+$", value):
+        value = value.replace(",", ".")
+    return value
+
+
+def clean_rows(header, rows):
+    region_position = header.index("Region")
+    cleaned_rows = []
+    for row in rows:
+        row = list(row)
+        row[region_position] = clean_region(row[region_position])
+        for position in range(len(row)):
+            if position not in (0, region_position):
+                row[position] = clean_decimal(row[position])
+        cleaned_rows.append(row)
+    return cleaned_rows
+
+
+def validate_rows(header, rows):
+    problems = []
+    for column_name in REQUIRED_COLUMNS:
+        if column_name not in header:
+            problems.append(f"missing column {column_name!r}")
+    if problems:
+        raise DatasetValidationError("; ".join(problems))
+    seen_names = set()
+    for line_number, row in enumerate(rows, start=2):
+        if len(row) > len(header):
+            problems.append(f"line {line_number}: {len(row)} fields, expected {len(header)}")
+            continue
+        name = CountryTable.clean_text(row[0])
+        if not name:
+            problems.append(f"line {line_number}: empty country name")
+        elif name in seen_names:
+            problems.append(f"line {line_number}: duplicate country {name!r}")
+        seen_names.add(name)
+        for column_name, value in zip(header, row):
+            if column_name in CountryTable.TEXT_COLUMNS or not value.strip():
+                continue
+            if CountryTable.parse_number(value) is None:
+                problems.append(f"line {line_number}: {column_name} value {value!r} is not a number")
+    if problems:
+        raise DatasetValidationError("; ".join(problems))
+
+
+def read_csv_rows(data_path):
+    """Returns (header, rows) with blank lines dropped and short rows padded to the header's width."""
+    with open(data_path, newline="", encoding="utf-8") as data_file:
+        reader = csv.reader(data_file)
+        header = [CountryTable.clean_text(column_name) for column_name in next(reader)]
+        rows = [row + [""] * (len(header) - len(row)) for row in reader if any(field.strip() for field in row)]
+    return header, rows
+
+
+def table_from_csv(data_path):
+    """Cleans and validates the CSV the same way build_dataset does, so both sources give the same table."""
+    header, rows = read_csv_rows(data_path)
+    rows = clean_rows(header, rows)
+    validate_rows(header, rows)
+    return CountryTable.from_rows(header, rows)
+
+
+def build_name_index(table):
+    return CountryNameIndex().build((table.display_name(row), row) for row in range(len(table)))
+
+
+def write_artifact(table, name_index, artifact_path, data_path):
+    """Writes the artifact into a temporary directory and swaps it into place."""
+    temp_path = f"{artifact_path}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    column_files = []
+    for position, column_name in enumerate(table.column_names):
+        values_file = f"column_{position}.npy"
+        nulls_file = f"column_{position}.null.npy"
+        np.save(os.path.join(temp_path, values_file), np.ascontiguousarray(table.columns[column_name]))
+        np.save(os.path.join(temp_path, nulls_file), np.ascontiguousarray(table.null_masks[column_name]))
+        column_files.append({"name": column_name, "values": values_file, "nulls": nulls_file})
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "source": os.path.basename(data_path),
+        "source_sha256": source_hash(data_path),
+        "rows": len(table),
+        "columns": column_files,
+        "name_index": name_index.to_dict(),
+    }
+    with open(os.path.join(temp_path, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file)
+    old_path = f"{artifact_path}.old-{os.getpid()}"
+    if os.path.exists(artifact_path):
+        os.replace(artifact_path, old_path)
+    os.replace(temp_path, artifact_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_artifact(artifact_path, data_path):
+    """Returns (table, name_index) memory-mapped from the artifact, or None if it is missing, stale or damaged."""
+    manifest_path = os.path.join(artifact_path, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("source_sha256") != source_hash(data_path):
+        return None
+    columns = {}
+    null_masks = {}
+    column_names = []
+    try:
+        for column_file in manifest["columns"]:
+            column_name = column_file["name"]
+            column_names.append(column_name)
+            columns[column_name] = np.load(os.path.join(artifact_path, column_file["values"]), mmap_mode="r")
+            null_masks[column_name] = np.load(os.path.join(artifact_path, column_file["nulls"]), mmap_mode="r")
+            if len(columns[column_name]) != manifest["rows"] or len(null_masks[column_name]) != manifest["rows"]:
+                raise ValueError(f"column {column_name!r} does not have {manifest['rows']} rows")
+        return CountryTable(column_names, columns, null_masks), CountryNameIndex.from_dict(manifest["name_index"])
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"Ignoring damaged dataset artifact {artifact_path}: {exc}")
+        return None
+
+
+def load_country_data(data_path, artifact_path=None):
+    """Loads the artifact for data_path, rebuilding it from the CSV when it is missing or stale."""
+    artifact_path = artifact_path or default_artifact_path(data_path)
+    started = time.perf_counter()
+    loaded = load_artifact(artifact_path, data_path)
+    if loaded:
+        print(f"Loaded country data from {artifact_path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return loaded
+    table = table_from_csv(data_path)
+    name_index = build_name_index(table)
+    try:
+        write_artifact(table, name_index, artifact_path, data_path)
+    except OSError as exc:
+        print(f"Failed to write dataset artifact {artifact_path}: {exc}")
+    print(f"Parsed country data from {data_path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return table, name_index
+
+
+def build_dataset(raw_path, clean_path, artifact_path=None):
+    """Cleans the raw CSV export, validates it, writes the clean CSV and compiles its artifact."""
+    header, rows = read_csv_rows(raw_path)
+    rows = clean_rows(header, rows)
+    validate_rows(header, rows)
+    with open(clean_path, "w", newline="", encoding="utf-8") as clean_file:
+        writer = csv.writer(clean_file, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    table = CountryTable.from_rows(header, rows)
+    artifact_path = artifact_path or default_artifact_path(clean_path)
+    write_artifact(table, build_name_index(table), artifact_path, clean_path)
+    return table
+
+
+def main():
+    data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    parser = argparse.ArgumentParser(description="Build the cleaned country CSV and its binary artifact")
+    parser.add_argument("raw_path", nargs="?", default=os.path.join(data_directory, "countries of the world.csv"))
+    parser.add_argument("--clean-path", default=os.path.join(data_directory, "countries_clean.csv"))
+    parser.add_argument("--artifact-path", default=None)
+    arguments = parser.parse_args()
+    table = build_dataset(arguments.raw_path, arguments.clean_path, arguments.artifact_path)
+    print(f"Built {arguments.artifact_path or default_artifact_path(arguments.clean_path)} ({len(table)} countries)")
+
+
+if __name__ == "__main__":
+    main()
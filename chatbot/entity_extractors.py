@@ -0,0 +1,177 @@
+import re
+
+
+# "spacy" runs en_core_web_lg NER; "gazetteer+spacy" asks spaCy only about questions the gazetteer found nothing in
+ENTITY_EXTRACTORS = ("spacy", "gazetteer", "gazetteer+spacy")
+
+
+class GazetteerEntityExtractor:
+    """Finds the dataset's country names and aliases in a question without a statistical model.
+
+    Names are matched longest-first on a trie of normalized tokens, so "papua new guinea" wins over
+    "guinea". Words left over are checked against the name index's deletion index for misspellings, more
+    strictly than the index's own lookup, but only where a name is expected: capitalized words ("Itlay"),
+    a lowercase word between "in/of/is/than/and..." and the end of the clause ("how big is itlay"), and a
+    sentence's first word when a verb or column keyword follows ("Swedn has ..."). Anywhere else, too
+    many everyday words ("child", "begin") are one edit away from a country. Even where a name is expected,
+    a word not capitalized mid-sentence only matches a short name by a swap ("inida"): "woman" is one edit
+    from Oman.
+    """
+
+    name = "gazetteer"
+    # Marks the end of a name in the trie; normalized tokens are never empty
+    TERMINAL = ""
+    # Aliases that are also everyday words ("tell us"); they only count when written "US" or "U.S."
+    AMBIGUOUS_KEYS = {"us", "u s"}
+    UPPERCASE_US_PATTERN = re.compile(r"\bU\.? ?S\b")
+    # Shorter tokens are within one edit of too many words to be checked fuzzily
+    MIN_FUZZY_TOKEN_LENGTH = 5
+    # A misspelling is one edit or one swap of adjacent letters ("itlay") away from a name
+    MAX_FUZZY_DISTANCE = 1
+    # Names this short are one edit from everyday words ("oman"/"woman", "chile"/"child"), so a word not
+    # capitalized mid-sentence only matches them by a swap of adjacent letters
+    SHORT_NAME_LENGTH = 5
+    # Words starting with a capital other than a sentence's first word, which is capitalized anyway
+    CAPITALIZED_WORD_PATTERN = re.compile(r"(?<![.!?])\s+\W*([A-Z][^\sA-Z]+)")
+    SENTENCE_START_PATTERN = re.compile(r"(?:^|[.!?]\s+)\W*(\w+)")
+    # A lowercase word right after one of these (or after it and "the") is likely a name ("in inida", "than
+    # the philipines"), as long as the clause ends after it: "of child mortality" is not
+    NAME_CUES = frozenset(("in", "of", "is", "than", "and", "or", "about", "for", "from", "vs"))
+    CLAUSE_ENDS = NAME_CUES | {"has", "have", "to", "with", "compared"}
+    # A sentence's first word is likely a name when one of these follows it ("Swedn has", "Itlay's population")
+    SENTENCE_START_CUES = frozenset(("is", "has", "how", "population", "area", "gdp"))
+    MAX_MEMO_SIZE = 20000
+
+    def __init__(self, name_index):
+        self.name_index = name_index
+        self.trie = {}
+        for key in name_index.entries:
+            node = self.trie
+            for token in key.split():
+                node = node.setdefault(token, {})
+            node[self.TERMINAL] = key
+        self.fuzzy_memo = {}
+
+    def extract_many(self, questions):
+        return [self.extract(question) for question in questions]
+
+    def extract(self, question):
+        """Returns the country-like spans of the normalized question, in the order they appear."""
+        if not question:
+            return []
+        tokens = self.name_index.normalize(question).split()
+        allow_ambiguous = bool(self.UPPERCASE_US_PATTERN.search(question))
+        found = []
+        unmatched = []
+        position = 0
+        while position < len(tokens):
+            length = self.longest_match(tokens, position, allow_ambiguous)
+            if length:
+                found.append((position, " ".join(tokens[position:position + length])))
+                position += length
+            else:
+                unmatched.append(position)
+                position += 1
+        if unmatched:
+            positions, capitalized = self.fuzzy_positions(question, tokens, unmatched)
+            found.extend(self.fuzzy_matches(tokens, unmatched, positions, capitalized))
+        return [text for unused_position, text in sorted(found)]
+
+    def fuzzy_positions(self, question, tokens, unmatched):
+        """The unmatched positions where a name is expected, and the subset of them written capitalized."""
+        capitalized = self.capitalized_tokens(question)
+        sentence_starts = {self.name_index.normalize(word) for word in self.SENTENCE_START_PATTERN.findall(question)}
+        positions = {}
+        capitalized_positions = set()
+        for position in unmatched:
+            token = tokens[position]
+            next_token = tokens[position + 1] if position + 1 < len(tokens) else None
+            if token in capitalized:
+                positions[position] = (1, 2)
+                capitalized_positions.add(position)
+            elif token in sentence_starts and next_token in self.SENTENCE_START_CUES:
+                positions[position] = (1, 2)
+            elif self.follows_cue(tokens, position):
+                lengths = self.clause_lengths(tokens, position)
+                if lengths:
+                    positions[position] = lengths
+        return positions, capitalized_positions
+
+    def follows_cue(self, tokens, position):
+        if position >= 2 and tokens[position - 1] == "the":
+            position -= 1
+        return position >= 1 and tokens[position - 1] in self.NAME_CUES
+
+    def clause_lengths(self, tokens, position):
+        """Name lengths (one or two words) from position that the end or a function word follows."""
+        return tuple(length for length in (1, 2) if position + length == len(tokens)
+                     or (position + length < len(tokens) and tokens[position + length] in self.CLAUSE_ENDS))
+
+    def capitalized_tokens(self, question):
+        """Normalized tokens of the words written capitalized ("Itlay", not "ITLAY") other than at a sentence start."""
+        tokens = set()
+        for word in self.CAPITALIZED_WORD_PATTERN.findall(question):
+            tokens.update(self.name_index.normalize(word).split())
+        return tokens
+
+    def longest_match(self, tokens, start, allow_ambiguous):
+        node = self.trie
+        length = 0
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            key = node.get(self.TERMINAL)
+            if key and (allow_ambiguous or key not in self.AMBIGUOUS_KEYS):
+                length = position - start + 1
+        return length
+
+    def fuzzy_matches(self, tokens, unmatched, positions, capitalized):
+        """Misspelled names at positions (position -> allowed name lengths); "south afrika" as a pair wins over its single tokens."""
+        found = []
+        unmatched_positions = set(unmatched)
+        skipped = set()
+        for position in unmatched:
+            if position in skipped or position not in positions:
+                continue
+            lengths = positions[position]
+            if 2 in lengths and position + 1 in unmatched_positions and self.fuzzy_candidate(tokens[position], 2) \
+                    and self.fuzzy_candidate(tokens[position + 1], 2):
+                key = self.fuzzy_name(tokens[position] + " " + tokens[position + 1], position in capitalized)
+                if key:
+                    found.append((position, key))
+                    skipped.add(position + 1)
+                    continue
+            token = tokens[position]
+            key = self.fuzzy_name(token, position in capitalized) \
+                if 1 in lengths and self.fuzzy_candidate(token, self.MIN_FUZZY_TOKEN_LENGTH) else None
+            if key:
+                found.append((position, key))
+        return found
+
+    def fuzzy_candidate(self, token, min_length):
+        return len(token) >= min_length and not token.isdigit()
+
+    def fuzzy_name(self, candidate, capitalized=True):
+        """Returns the name key candidate is a misspelling of, or None; results are memoized per candidate."""
+        memo_key = (candidate, capitalized)
+        key = self.fuzzy_memo.get(memo_key)
+        if key is None:
+            if len(self.fuzzy_memo) >= self.MAX_MEMO_SIZE:
+                self.fuzzy_memo.clear()
+            # A swap costs two edits, so the index is searched one wider and swaps are told apart below
+            matches = [(distance, self.name_index.entries[name][0], name)
+                       for distance, name in self.name_index.fuzzy_index.search(candidate, self.MAX_FUZZY_DISTANCE + 1)
+                       if (distance <= self.MAX_FUZZY_DISTANCE and (capitalized or len(name) > self.SHORT_NAME_LENGTH))
+                       or self.is_adjacent_swap(candidate, name)]
+            key = min(matches)[2] if matches else ""
+            self.fuzzy_memo[memo_key] = key
+        return key or None
+
+    @staticmethod
+    def is_adjacent_swap(first, second):
+        if len(first) != len(second):
+            return False
+        differences = [position for position, (left, right) in enumerate(zip(first, second)) if left != right]
+        return (len(differences) == 2 and differences[1] == differences[0] + 1
+                and first[differences[0]] == second[differences[1]] and first[differences[1]] == second[differences[0]])
@@ -1,244 +1,306 @@
+import asyncio
 import random
 import time
+from chatbot.metrics import metrics_registry
+from chatbot.scheduler import Scheduler
 
 
-class GreetingFSM:
-    """Implements the Phase II greeting finite state machine."""
+TRANSITIONS = metrics_registry.counter("chatbot_greeting_transitions_total", "Greeting FSM state changes", ("state",))
 
-    TIMEOUT_RANGE = (20, 30)
-    PENDING_OUTREACH_STATES = {"1_INITIAL_OUTREACH", "1_SECONDARY_OUTREACH"}  # during outreach, bot can still receive greetings from other users
 
-    def __init__(self):
+class GreetingSession:
+    """State of one greeting conversation with a single partner."""
+
+    __slots__ = ("partner", "channel", "irc_client", "role", "state", "timer", "last_time", "timeout_inquiry_prompted",
+                 "replying")
+
+    def __init__(self, partner, irc_client, channel_name, role):
+        self.partner = partner
+        self.irc_client = irc_client
+        self.channel = channel_name
+        self.role = role
         self.state = "START"
-        self.partner = None
-        self.channel = None
-        self.irc_client = None
-        self.role = None
-        self.wait_deadline = None
-        self.last_time = 0
+        # Pending timeout in the shared scheduler, if any
+        self.timer = None
+        self.last_time = time.time()
         self.timeout_inquiry_prompted = False
+        # Set while a reply is being delayed; lines arriving meanwhile do not advance the state
+        self.replying = False
+
+
+class GreetingFSM:
+    """Implements the Phase II greeting finite state machine, one session per partner nick."""
+
+    TIMEOUT_RANGE = (20, 30)
+    # Upper bound on concurrent conversations; the least recently active one is evicted beyond it
+    MAX_SESSIONS = 256
+    # Phrase lists are shared by every channel's FSM
+    state_1_initial_outreach_prompts = [
+        "Hello!",
+        "Hi!",
+    ]
+    state_1_secondary_outreach_prompts = [
+        "I said HI!",
+        "Excuse me, hello?",
+        "Hellllloooooo!",
+    ]
+    state_2_outreach_reply_phrases = [
+        "Hello back at you!",
+        "Hi",
+        "Howdy there, pardner! 🤠",
+    ]
+    state_1_inquiry_prompts = [
+        "How are you?",
+        "How are you doing?",
+        "What's happening?",
+    ]
+    state_2_inquiry_prompts = [
+        "How about you?",
+        "And yourself?",
+    ]
+    state_2_inquiry_reply_phrases = [
+        "I'm fine.",
+        "I'm good.",
+        "I'm great, thanks for asking.",
+    ]
+    state_1_inquiry_reply_phrases = [
+        "I'm good.",
+        "I'm fine, thanks for asking.",
+        "Not too shabby.",
+    ]
+    state_1_giveup_frustrated_messages = [
+        "Ok, forget you.",
+        "Whatever.",
+        "Screw you!",
+        "Whatever, fine. Don't answer."
+    ]
+    state_2_inquiry_prompt_messages = [
+        "Feel free to ask how I'm doing!",
+        "Don't you think you should ask how I'm doing?",
+        "Oh, I guess my feelings don't matter. 😒"
+    ]
+
+    def __init__(self, scheduler=None):
+        # Timeouts are registered here rather than polled
+        self.scheduler = scheduler if scheduler is not None else Scheduler()
+        # Keyed by lowercased nick (IRC nicks are case-insensitive); ordered from least to most recently active
+        self.sessions = {}
         # Tracks whether a full greeting conversation has completed; will avoid outreach if so
         self.conversation_completed = False
-        self.state_1_initial_outreach_prompts = [
-            "Hello!",
-            "Hi!",
-        ]
-        self.state_1_secondary_outreach_prompts = [
-            "I said HI!",
-            "Excuse me, hello?",
-            "Hellllloooooo!",
-        ]
-        self.state_2_outreach_reply_phrases = [
-            "Hello back at you!",
-            "Hi",
-            "Howdy there, pardner! 🤠",
-        ]
-        self.state_1_inquiry_prompts = [
-            "How are you?",
-            "How are you doing?",
-            "What's happening?",
-        ]
-        self.state_2_inquiry_prompts = [
-            "How about you?",
-            "And yourself?",
-        ]
-        self.state_2_inquiry_reply_phrases = [
-            "I'm fine.",
-            "I'm good.",
-            "I'm great, thanks for asking.",
-        ]
-        self.state_1_inquiry_reply_phrases = [
-            "I'm good.",
-            "I'm fine, thanks for asking.",
-            "Not too shabby.",
-        ]
-        self.state_1_giveup_frustrated_messages = [
-            "Ok, forget you.",
-            "Whatever.",
-            "Screw you!",
-            "Whatever, fine. Don't answer."
-        ]
-        self.state_2_inquiry_prompt_messages = [
-            "Feel free to ask how I'm doing!",
-            "Don't you think you should ask how I'm doing?",
-            "Oh, I guess my feelings don't matter. 😒"
-        ]
+
+    @staticmethod
+    def session_key(nick):
+        return nick.lower()
 
     def reset(self):
-        self.state = "START"
-        self.partner = None
-        self.channel = None
-        self.irc_client = None
-        self.role = None
-        self.wait_deadline = None
-        self.last_time = 0
-        self.timeout_inquiry_prompted = False
+        for session in self.sessions.values():
+            self.clear_timer(session)
+        self.sessions.clear()
+
+    def has_active_sessions(self):
+        return bool(self.sessions)
+
+    def get_session(self, nick):
+        return self.sessions.get(self.session_key(nick)) if nick else None
+
+    def is_live(self, session):
+        return self.sessions.get(self.session_key(session.partner)) is session
+
+    def open_session(self, partner, irc_client, channel_name, role):
+        while len(self.sessions) >= self.MAX_SESSIONS:
+            self.end_session(next(iter(self.sessions.values())))
+        session = GreetingSession(partner, irc_client, channel_name, role)
+        self.sessions[self.session_key(partner)] = session
+        return session
+
+    def touch(self, session):
+        # Re-inserting moves the session to the most recently active end
+        key = self.session_key(session.partner)
+        self.sessions[key] = self.sessions.pop(key, session)
+        session.last_time = time.time()
+
+    def transition(self, session, state):
+        session.state = state
+        TRANSITIONS.inc(state)
 
     def initiate_greeting(self, partner, irc_client, channel_name):
         """Bot starts the greeting sequence as Speaker 1."""
-        if self.state != "START":
+        if self.get_session(partner):
             return False
 
-        self.partner = partner
-        self.irc_client = irc_client
-        self.channel = channel_name
-        self.role = 1
+        session = self.open_session(partner, irc_client, channel_name, 1)
         greeting = random.choice(self.state_1_initial_outreach_prompts)
-        self.state = "1_INITIAL_OUTREACH"
-        self.send_message_to_partner(greeting)
-        self.start_timer()
+        self.transition(session, "1_INITIAL_OUTREACH")
+        self.send_message_to_partner(session, greeting)
+        self.start_timer(session)
         return True
 
-    def receive_greeting(self, sender, irc_client, channel_name):
-        if self.state != "START":
-            if self.state in self.PENDING_OUTREACH_STATES and sender != self.partner:
-                self.reset()
-            else:
-                if sender == self.partner:
-                    self.handle_conversation_message(sender, "hello", irc_client, channel_name)
-                return
+    async def receive_greeting(self, sender, irc_client, channel_name):
+        if self.get_session(sender):
+            # A greeting from someone we are already talking to counts as their reply
+            await self.handle_conversation_message(sender, "hello", irc_client, channel_name)
+            return
 
-        self.partner = sender
-        self.irc_client = irc_client
-        self.channel = channel_name
-        self.role = 2
-        self.state = "2_OUTREACH_REPLY"
-        self.send_message_to_partner(random.choice(self.state_2_outreach_reply_phrases))
-        self.start_timer()
+        session = self.open_session(sender, irc_client, channel_name, 2)
+        self.transition(session, "2_OUTREACH_REPLY")
+        self.send_message_to_partner(session, random.choice(self.state_2_outreach_reply_phrases))
+        self.start_timer(session)
 
-    def handle_conversation_message(self, sender, message, irc_client, channel_name):
-        if self.state == "START" or sender != self.partner:
+    async def handle_conversation_message(self, sender, message, irc_client, channel_name):
+        session = self.get_session(sender)
+        if not session:
             return False
 
-        self.update_context(irc_client, channel_name)
+        self.update_context(session, irc_client, channel_name)
+        self.touch(session)
         clean_message = (message or "").strip()
         if not clean_message:
             return True
 
-        time.sleep(1)
-
-        if self.state in ("1_INITIAL_OUTREACH", "1_SECONDARY_OUTREACH"):
-            self.handle_speaker1_outreach_reply()
-        elif self.state == "1_INQUIRY":
-            self.handle_speaker1_status_reply(clean_message)
-        elif self.state == "1_INQUIRY_REPLY":
-            self.complete_conversation()
-        elif self.state == "2_OUTREACH_REPLY":
-            if self.looks_like_inquiry(clean_message):
-                self.handle_speaker2_inquiry()
-            else:
-                self.prompt_for_inquiry()
-        elif self.state == "2_INQUIRY_REPLY" and self.role == 1:
-            self.handle_speaker1_partner_inquiry(clean_message)
-        elif self.state == "2_INQUIRY":
-            self.handle_speaker2_reply()
-        return True
-
-    def check_timeout(self, irc_client, channel_name):
-        if self.state == "START" or not self.wait_deadline:
-            return
+        if session.replying:
+            # Still answering an earlier line from this partner; this one must not advance the state again
+            return True
+        session.replying = True
+        # The reply is accepted, so the pending timeout must not fire during the reply delay; each handler
+        # re-arms it once the bot's answer has been sent
+        self.clear_timer(session)
+        try:
+            await asyncio.sleep(1)
+            # forget, reset or eviction may have ended the conversation while we waited
+            if not self.is_live(session):
+                return True
 
-        self.update_context(irc_client, channel_name)
-        if time.time() < self.wait_deadline:
-            return
+            if session.state in ("1_INITIAL_OUTREACH", "1_SECONDARY_OUTREACH"):
+                self.handle_speaker1_outreach_reply(session)
+            elif session.state == "1_INQUIRY":
+                self.handle_speaker1_status_reply(session, clean_message)
+            elif session.state == "1_INQUIRY_REPLY":
+                self.complete_conversation(session)
+            elif session.state == "2_OUTREACH_REPLY":
+                if self.looks_like_inquiry(clean_message):
+                    await self.handle_speaker2_inquiry(session)
+                else:
+                    self.prompt_for_inquiry(session)
+            elif session.state == "2_INQUIRY_REPLY" and session.role == 1:
+                self.handle_speaker1_partner_inquiry(session, clean_message)
+            elif session.state == "2_INQUIRY":
+                self.handle_speaker2_reply(session)
+            if self.is_live(session) and session.timer is None:
+                # A line that did not advance the state still leaves the conversation waiting on the partner
+                self.start_timer(session)
+        finally:
+            session.replying = False
+        return True
 
-        if self.state == "1_INITIAL_OUTREACH":
-            self.send_secondary_outreach()
-        elif self.state == "2_INQUIRY_REPLY":
+    def handle_timeout(self, session):
+        session.timer = None
+        if session.state == "1_INITIAL_OUTREACH":
+            self.send_secondary_outreach(session)
+        elif session.state == "2_INQUIRY_REPLY":
             # On first timeout in 2_INQUIRY_REPLY, prompt once; on second timeout, give up.
-            if not self.timeout_inquiry_prompted:
-                self.timeout_inquiry_prompted = True
-                self.prompt_for_inquiry()
+            if not session.timeout_inquiry_prompted:
+                session.timeout_inquiry_prompted = True
+                self.prompt_for_inquiry(session)
             else:
-                self.enter_giveup_state()
-        elif self.state in {"1_SECONDARY_OUTREACH", "1_INQUIRY", "1_INQUIRY_REPLY", "2_OUTREACH_REPLY", "2_INQUIRY"}:
-            self.enter_giveup_state()
+                self.enter_giveup_state(session)
+        elif session.state in {"1_SECONDARY_OUTREACH", "1_INQUIRY", "1_INQUIRY_REPLY", "2_OUTREACH_REPLY", "2_INQUIRY"}:
+            self.enter_giveup_state(session)
 
-    def update_context(self, irc_client, channel_name):
+    def update_context(self, session, irc_client, channel_name):
         if irc_client:
-            self.irc_client = irc_client
+            session.irc_client = irc_client
         if channel_name:
-            self.channel = channel_name
+            session.channel = channel_name
 
-    def start_timer(self):
-        self.wait_deadline = time.time() + random.uniform(*self.TIMEOUT_RANGE)
+    def start_timer(self, session):
+        self.clear_timer(session)
+        session.timer = self.scheduler.call_later(random.uniform(*self.TIMEOUT_RANGE), self.handle_timeout, session)
 
-    def clear_timer(self):
-        self.wait_deadline = None
+    def clear_timer(self, session):
+        self.scheduler.cancel(session.timer)
+        session.timer = None
 
-    def send_message_to_partner(self, text):
-        if not self.irc_client or not self.channel:
+    def send_message_to_partner(self, session, text):
+        if not session.irc_client or not session.channel:
             return
-        if self.partner:
-            message = f"{self.partner}: {text}"
+        if session.partner:
+            message = f"{session.partner}: {text}"
         else:
             message = text
-        self.irc_client.send(self.channel, message)
-        self.last_time = time.time()
+        session.irc_client.send(session.channel, message)
+        session.last_time = time.time()
 
-    def handle_speaker1_outreach_reply(self):
-        self.state = "1_INQUIRY"
+    def handle_speaker1_outreach_reply(self, session):
+        self.transition(session, "1_INQUIRY")
         inquiry = random.choice(self.state_1_inquiry_prompts)
-        self.send_message_to_partner(inquiry)
-        self.start_timer()
+        self.send_message_to_partner(session, inquiry)
+        self.start_timer(session)
 
-    def handle_speaker1_inquiry_response(self):
-        self.state = "1_INQUIRY_REPLY"
+    def handle_speaker1_inquiry_response(self, session):
+        self.transition(session, "1_INQUIRY_REPLY")
         acknowledgment = random.choice(self.state_1_inquiry_reply_phrases)
-        self.send_message_to_partner(acknowledgment)
-        self.complete_conversation()
+        self.send_message_to_partner(session, acknowledgment)
+        self.complete_conversation(session)
 
-    def handle_speaker1_status_reply(self, message):
+    def handle_speaker1_status_reply(self, session, message):
         # If message ALSO includes an inquiry about us, treat it as both the status reply and the partner inquiry in one
         if self.looks_like_inquiry(message):
-            self.state = "2_INQUIRY"
-            self.handle_speaker1_inquiry_response()
+            self.transition(session, "2_INQUIRY")
+            self.handle_speaker1_inquiry_response(session)
         else:
             # Otherwise, wait for follow up
-            self.state = "2_INQUIRY_REPLY"
-            self.timeout_inquiry_prompted = False
-            self.start_timer()
+            self.transition(session, "2_INQUIRY_REPLY")
+            session.timeout_inquiry_prompted = False
+            self.start_timer(session)
 
-    def handle_speaker1_partner_inquiry(self, message):
+    def handle_speaker1_partner_inquiry(self, session, message):
         if not self.looks_like_inquiry(message):
-            self.prompt_for_inquiry()
+            self.prompt_for_inquiry(session)
             return
-        self.state = "2_INQUIRY"
-        self.handle_speaker1_inquiry_response()
+        self.transition(session, "2_INQUIRY")
+        self.handle_speaker1_inquiry_response(session)
 
-    def handle_speaker2_inquiry(self):
+    async def handle_speaker2_inquiry(self, session):
         reply = random.choice(self.state_2_inquiry_reply_phrases)
         followup = random.choice(self.state_2_inquiry_prompts)
-        self.state = "2_INQUIRY_REPLY"
-        self.send_message_to_partner(reply)
-        time.sleep(1)
-        self.state = "2_INQUIRY"
-        self.send_message_to_partner(followup)
-        self.start_timer()
-
-    def handle_speaker2_reply(self):
-        self.state = "1_INQUIRY_REPLY"
-        self.complete_conversation()
-
-    def prompt_for_inquiry(self):
-        self.send_message_to_partner(random.choice(self.state_2_inquiry_prompt_messages))
-        self.start_timer()
-
-    def send_secondary_outreach(self):
-        self.state = "1_SECONDARY_OUTREACH"
-        self.send_message_to_partner(random.choice(self.state_1_secondary_outreach_prompts))
-        self.start_timer()
-
-    def enter_giveup_state(self):
-        self.state = "GIVEUP_FRUSTRATED"
-        self.send_message_to_partner(random.choice(self.state_1_giveup_frustrated_messages))
-        self.complete_conversation()
-
-    def complete_conversation(self):
+        self.transition(session, "2_INQUIRY_REPLY")
+        self.send_message_to_partner(session, reply)
+        await asyncio.sleep(1)
+        if not self.is_live(session):
+            return
+        self.transition(session, "2_INQUIRY")
+        self.send_message_to_partner(session, followup)
+        self.start_timer(session)
+
+    def handle_speaker2_reply(self, session):
+        self.transition(session, "1_INQUIRY_REPLY")
+        self.complete_conversation(session)
+
+    def prompt_for_inquiry(self, session):
+        self.send_message_to_partner(session, random.choice(self.state_2_inquiry_prompt_messages))
+        self.start_timer(session)
+
+    def send_secondary_outreach(self, session):
+        self.transition(session, "1_SECONDARY_OUTREACH")
+        self.send_message_to_partner(session, random.choice(self.state_1_secondary_outreach_prompts))
+        self.start_timer(session)
+
+    def enter_giveup_state(self, session):
+        self.transition(session, "GIVEUP_FRUSTRATED")
+        self.send_message_to_partner(session, random.choice(self.state_1_giveup_frustrated_messages))
+        self.complete_conversation(session)
+
+    def complete_conversation(self, session):
         self.conversation_completed = True
-        self.state = "END"
-        self.clear_timer()
-        self.reset()
+        self.transition(session, "END")
+        self.clear_timer(session)
+        self.end_session(session)
+
+    def end_session(self, session):
+        self.clear_timer(session)
+        key = self.session_key(session.partner)
+        if self.sessions.get(key) is session:
+            del self.sessions[key]
 
     def looks_like_inquiry(self, message):
         text = message.lower()
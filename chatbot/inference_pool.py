@@ -0,0 +1,99 @@
+import asyncio
+import gc
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Set in the parent just before the workers fork, so every worker inherits the loaded store
+worker_store = None
+# Cache generation the worker's caches belong to; a newer one from the parent clears them
+worker_cache_generation = 0
+
+
+def init_worker(threads_per_worker):
+    # Each worker gets its share of the cores instead of every model runtime using all of them
+    worker_store.set_inference_threads(threads_per_worker)
+    # Intent cache entries a worker learns are sent back with its answers, so the parent's cache (the one saved) stays warm
+    worker_store.intent_cache.record_new_entries()
+
+
+def worker_ready():
+    return os.getpid()
+
+
+def answer_in_worker(questions, cache_generation):
+    global worker_cache_generation
+    if cache_generation != worker_cache_generation:
+        worker_store.clear_caches()
+        worker_cache_generation = cache_generation
+    return worker_store.answer_questions(questions), worker_store.intent_cache.take_new_entries()
+
+
+class InferencePool:
+    """Answers question batches on forked worker processes that share the parent's loaded models.
+
+    The store must be fully loaded before start(): workers are forked from it, so the models are
+    shared copy-on-write instead of being loaded again per process. At most max_pending batches are
+    in flight; further callers wait, which keeps every worker's backlog short. Intent cache entries
+    the workers add are merged into the parent's cache, which is the one saved to disk and inherited
+    by workers forked on recycle().
+    """
+
+    def __init__(self, store, workers=None, max_pending=None):
+        self.store = store
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending or self.workers * 2
+        self.executor = None
+        self.slots = None
+        self.cache_generation = 0
+
+    @staticmethod
+    def is_supported():
+        return "fork" in multiprocessing.get_all_start_methods()
+
+    def start(self):
+        global worker_store
+        if not self.store.is_ready():
+            raise RuntimeError("InferencePool needs the store's models loaded before forking")
+        worker_store = self.store
+        # Moves everything allocated so far out of the collector's view, so gc passes in the
+        # workers do not touch (and copy) the pages holding the shared models
+        gc.freeze()
+        threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"),
+                                            initializer=init_worker, initargs=(threads_per_worker,))
+        # With fork, the first submit starts every worker; doing it here forks before the event loop runs
+        self.executor.submit(worker_ready).result()
+        print(f"Started {self.workers} inference workers")
+        return self
+
+    def recycle(self):
+        """Replaces the workers with fresh forks of the store, e.g. after a dataset reload.
+
+        Batches already running finish on the old workers.
+        """
+        previous_executor = self.executor
+        self.start()
+        if previous_executor:
+            previous_executor.shutdown(wait=False)
+
+    def invalidate_caches(self):
+        """Makes each worker drop its cached answers before its next batch."""
+        self.cache_generation += 1
+
+    async def answer_questions(self, questions):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_pending)
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            answers, new_intent_entries = await loop.run_in_executor(self.executor, answer_in_worker, list(questions),
+                                                                     self.cache_generation)
+        for key, value in new_intent_entries:
+            self.store.intent_cache.put(key, value)
+        return answers
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
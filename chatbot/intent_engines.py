@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class CrossEncoderIntentEngine:
+    """Scores the question against every column definition with a cross-encoder."""
+
+    name = "cross-encoder"
+
+    def __init__(self, cross_encoder, definitions):
+        self.cross_encoder = cross_encoder
+        self.definitions = list(definitions)
+
+    def best_index(self, question):
+        return self.best_indices([question])[0]
+
+    def best_indices(self, questions):
+        comparison_pairs = [(question, definition) for question in questions for definition in self.definitions]
+        scores = np.asarray(self.cross_encoder.predict(comparison_pairs)).reshape(len(questions), len(self.definitions))
+        return [int(index) for index in np.argmax(scores, axis=1)]
+
+
+class BiEncoderIntentEngine:
+    """Embeds column definitions once and scores questions with a single dot product.
+
+    When a cross-encoder is supplied, only the top_k bi-encoder candidates are re-ranked with it.
+    """
+
+    name = "bi-encoder"
+
+    def __init__(self, bi_encoder, definitions, cross_encoder=None, top_k=3):
+        self.bi_encoder = bi_encoder
+        self.definitions = list(definitions)
+        self.cross_encoder = cross_encoder
+        self.top_k = top_k
+        self.definition_vectors = self.encode(self.definitions)
+
+    def encode(self, texts):
+        return np.asarray(self.bi_encoder.encode(texts, normalize_embeddings=True, convert_to_numpy=True), dtype=np.float32)
+
+    def best_index(self, question):
+        return self.best_indices([question])[0]
+
+    def best_indices(self, questions):
+        scores = self.encode(questions) @ self.definition_vectors.T
+        if not self.cross_encoder or self.top_k <= 1:
+            return [int(index) for index in np.argmax(scores, axis=1)]
+        top_k = min(self.top_k, len(self.definitions))
+        candidates = np.argsort(-scores, axis=1)[:, :top_k]
+        comparison_pairs = []
+        for question, question_candidates in zip(questions, candidates):
+            comparison_pairs.extend((question, self.definitions[index]) for index in question_candidates)
+        rerank_scores = np.asarray(self.cross_encoder.predict(comparison_pairs)).reshape(len(questions), top_k)
+        best_candidates = np.argmax(rerank_scores, axis=1)
+        return [int(question_candidates[best]) for question_candidates, best in zip(candidates, best_candidates)]
@@ -1,39 +1,358 @@
-import socket
+import asyncio
+import re
 import time
+from collections import deque
+from chatbot.irc_message import IRCMessage
+from chatbot.metrics import metrics_registry
+
+
+LINES = metrics_registry.counter("chatbot_irc_lines_total", "IRC lines sent and received", ("direction",))
+BYTES = metrics_registry.counter("chatbot_irc_bytes_total", "IRC bytes sent and received", ("direction",))
+SEND_LATENCY = metrics_registry.histogram("chatbot_irc_send_latency_seconds", "Time lines waited in the send queue")
+
+
+class TokenBucket:
+    """Allows bursts of up to `burst` sends, refilled at `rate` per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutboundLine:
+    __slots__ = ("command_text", "target", "text", "enqueued")
+
+    def __init__(self, command_text, target=None, text=None):
+        self.command_text = command_text
+        self.target = target
+        self.text = text
+        self.enqueued = time.monotonic()
+
+
+def split_message(text, max_bytes, continuation_prefix=""):
+    """Splits text into pieces of at most max_bytes UTF-8 bytes, preferring word boundaries.
+
+    A piece never holds only the continuation prefix: a word too long for a line is cut starting right after it.
+    """
+    pieces = []
+    current = ""
+    bare_prefix = continuation_prefix.strip()
+    for word in text.split(" "):
+        candidate = current + " " + word if current else word
+        if len(candidate.encode("UTF-8")) <= max_bytes:
+            current = candidate
+            continue
+        if current.strip() and current.strip() != bare_prefix:
+            pieces.append(current)
+            current = continuation_prefix + word
+        elif current.strip():
+            # Only the "nick:" prefix so far; the word's first chunk goes on the same line
+            current = bare_prefix + " " + word
+        else:
+            current = word
+        # A single word longer than the limit is cut on character boundaries.
+        while len(current.encode("UTF-8")) > max_bytes:
+            cut = 0
+            used_bytes = 0
+            for character in current:
+                character_bytes = len(character.encode("UTF-8"))
+                if used_bytes + character_bytes > max_bytes:
+                    break
+                used_bytes += character_bytes
+                cut += 1
+            pieces.append(current[:cut])
+            current = continuation_prefix + current[cut:]
+    if current.strip() and (not pieces or current.strip() != bare_prefix):
+        pieces.append(current)
+    return pieces
 
 
 class IRC:
-    def __init__(self):
-        self.connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # RFC 1459 line limit, including the trailing CRLF
+    MAX_LINE_BYTES = 512
+    # Room for the ":nick!user@host " prefix the server adds when relaying our PRIVMSGs
+    RELAY_PREFIX_BYTES = 100
+    REPLY_PREFIX_PATTERN = re.compile(r"^[^\s:]+: ")
+
+    def __init__(self, receive_buffer_size=16384, send_rate=1.0, send_burst=5, idle_timeout=120.0, ping_timeout=60.0,
+                 connect_timeout=30.0, nick_reclaim_interval=60.0):
+        # Longest line the stream reader will buffer before giving up on it
+        self.receive_buffer_size = receive_buffer_size
+        # After idle_timeout seconds of silence we PING the server; no reply within ping_timeout means the link is dead
+        self.idle_timeout = idle_timeout
+        self.ping_timeout = ping_timeout
+        self.connect_timeout = connect_timeout
+        # Registered under a fallback nick, we ask for the wanted one again this often until it is free
+        self.nick_reclaim_interval = nick_reclaim_interval
+        self.wanted_nick = None
+        self.nick = None
+        self.reclaim_task = None
+        self.reader = None
+        self.writer = None
+        self.channel_names = []
+        # Set on RPL_WELCOME (001); channel messages are held in the queue until then
+        self.welcomed = asyncio.Event()
+        # Outgoing lines wait here; the sender task drains them through the token bucket
+        self.outbound = deque()
+        self.outbound_ready = asyncio.Event()
+        self.rate_limiter = TokenBucket(send_rate, send_burst)
+        self.sender_task = None
+        self.lines_sent = 0
+        self.bytes_sent = 0
+        self.total_send_latency = 0.0
+        self.max_send_latency = 0.0
 
-    def command(self, command_text):
-        self.connection.send(bytes(command_text + "\n", "UTF-8"))
+    @property
+    def queue_depth(self):
+        return len(self.outbound)
+
+    def send_stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "lines_sent": self.lines_sent,
+            "bytes_sent": self.bytes_sent,
+            "mean_send_latency": self.total_send_latency / self.lines_sent if self.lines_sent else 0.0,
+            "max_send_latency": self.max_send_latency,
+        }
+
+    def command(self, command_text, urgent=False):
+        line = OutboundLine(command_text.replace("\r", " ").replace("\n", " "))
+        if urgent:
+            self.outbound.appendleft(line)
+        else:
+            self.outbound.append(line)
+        self.outbound_ready.set()
 
     def send(self, channel_name, message_text):
-        self.command("PRIVMSG " + channel_name + " :" + message_text)
+        message_text = message_text.replace("\r", " ").replace("\n", " ")
+        max_bytes = self.max_text_bytes(channel_name)
+        reply_prefix = self.REPLY_PREFIX_PATTERN.match(message_text)
+        continuation_prefix = reply_prefix.group(0) if reply_prefix else ""
+        for piece in split_message(message_text, max_bytes, continuation_prefix):
+            self.outbound.append(OutboundLine("PRIVMSG " + channel_name + " :" + piece, channel_name, piece))
+        self.outbound_ready.set()
+
+    def max_text_bytes(self, target):
+        overhead = len(("PRIVMSG " + target + " :\r\n").encode("UTF-8")) + self.RELAY_PREFIX_BYTES
+        return self.MAX_LINE_BYTES - overhead
+
+    def reply_prefix(self, text):
+        """The "nick: " a reply is addressed with, lowercased as IRC nicks are case-insensitive, or None."""
+        match = self.REPLY_PREFIX_PATTERN.match(text)
+        return match.group(0).lower() if match else None
+
+    def next_sendable_position(self):
+        """Queue position of the next line allowed out, or None.
+
+        Before RPL_WELCOME replies are held, so the first line without a target (registration, an
+        urgent PONG) goes ahead of them.
+        """
+        if self.welcomed.is_set():
+            return 0 if self.outbound else None
+        for position, line in enumerate(self.outbound):
+            if line.target is None:
+                return position
+        return None
+
+    def next_outbound_line(self, position=0):
+        """Pops the line at position, merging queued replies to the same target and nick while they fit on one line.
 
-    def connect(self, server, port, channel_name, botnick, botpass, botnickpass):
+        "alice: a" followed by "alice: b" becomes "alice: a b"; a reply to bob is never folded into a
+        line addressed to alice.
+        """
+        line = self.outbound[position]
+        del self.outbound[position]
+        if line.target is None:
+            return line
+        max_bytes = self.max_text_bytes(line.target)
+        reply_prefix = self.reply_prefix(line.text)
+        text = line.text
+        while self.outbound and self.outbound[0].target == line.target \
+                and self.reply_prefix(self.outbound[0].text) == reply_prefix:
+            following = self.outbound[0].text
+            if reply_prefix:
+                following = following[len(reply_prefix):]
+            merged = text + " " + following
+            if len(merged.encode("UTF-8")) > max_bytes:
+                break
+            text = merged
+            self.outbound.popleft()
+        if text == line.text:
+            return line
+        merged_line = OutboundLine("PRIVMSG " + line.target + " :" + text, line.target, text)
+        merged_line.enqueued = line.enqueued
+        return merged_line
+
+    async def run_sender(self):
+        while True:
+            if self.next_sendable_position() is None:
+                # Nothing queued, or only replies held for RPL_WELCOME, which sets outbound_ready as well
+                self.outbound_ready.clear()
+                await self.outbound_ready.wait()
+                continue
+            await self.rate_limiter.acquire()
+            position = self.next_sendable_position()
+            if position is None:
+                continue
+            line = self.next_outbound_line(position)
+            data = bytes(line.command_text + "\r\n", "UTF-8")
+            try:
+                # write() buffers the whole line and drain() waits until it is flushed (sendall semantics)
+                self.writer.write(data)
+                await self.writer.drain()
+            except (ConnectionError, OSError) as exc:
+                print(f"Failed to send to server: {exc}")
+                return
+            latency = time.monotonic() - line.enqueued
+            LINES.inc("sent")
+            BYTES.inc("sent", amount=len(data))
+            SEND_LATENCY.observe(latency)
+            self.lines_sent += 1
+            self.bytes_sent += len(data)
+            self.total_send_latency += latency
+            self.max_send_latency = max(self.max_send_latency, latency)
+
+    async def connect(self, server, port, channel_names, botnick, botpass, botnickpass):
+        """Opens the connection and registers; channels are joined once the server sends RPL_WELCOME.
+
+        Lines still queued from a previous connection are kept and sent after the new registration.
+        """
+        await self.disconnect()
         print("Connecting to: " + server)
-        self.connection.connect((server, port))
-        self.connection.settimeout(1.0)
-        self.command("USER " + botnick + " " + botnick + " " + botnick + " :python")
-        self.command("NICK " + botnick)
+        self.welcomed.clear()
+        self.channel_names = list(channel_names)
+        self.wanted_nick = self.nick = botnick
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(server, port, limit=self.receive_buffer_size), self.connect_timeout)
+        registration = ["USER " + botnick + " " + botnick + " " + botnick + " :python", "NICK " + botnick]
         if botnickpass and botpass:
-            credential_command = "NICKSERV IDENTIFY " + botnickpass + " " + botpass
-            self.connection.send(bytes(credential_command + "\n", "UTF-8"))
-        time.sleep(5)
-        self.command("JOIN " + channel_name)
+            registration.append("NICKSERV IDENTIFY " + botnickpass + " " + botpass)
+        self.outbound.extendleft(OutboundLine(command_text) for command_text in reversed(registration))
+        self.outbound_ready.set()
+        self.sender_task = asyncio.create_task(self.run_sender())
 
-    def get_response(self):
+    async def flush(self, timeout=5.0):
+        """Waits (up to timeout seconds) for queued lines to be written."""
+        deadline = time.monotonic() + timeout
+        while self.outbound and self.sender_task and not self.sender_task.done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def disconnect(self):
+        """Drops the connection without flushing, keeping queued lines for the next connect."""
+        if self.reclaim_task:
+            self.reclaim_task.cancel()
+            self.reclaim_task = None
+        if self.sender_task:
+            self.sender_task.cancel()
+            self.sender_task = None
+        if not self.writer:
+            return
+        writer, self.reader, self.writer = self.writer, None, None
         try:
-            response = self.connection.recv(2040).decode("UTF-8")
-        except socket.timeout:
-            return ""
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def close(self):
+        if not self.writer:
+            return
+        await self.flush()
+        if self.writer:
+            try:
+                await self.writer.drain()
+            except (ConnectionError, OSError):
+                pass
+        await self.disconnect()
+
+    async def reclaim_nick(self):
+        """Asks for the wanted nick until the server gives it back, e.g. once a ghost of our last connection times out."""
+        while self.nick.lower() != self.wanted_nick.lower():
+            self.command("NICK " + self.wanted_nick)
+            await asyncio.sleep(self.nick_reclaim_interval)
+        self.reclaim_task = None
 
-        if not response:
-            return ""
+    async def read_line(self):
+        """Returns the next complete line, or None once the server closes the connection."""
+        discarding = False
+        while True:
+            try:
+                line = await self.reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as exc:
+                # Drop an over-long line (up to its newline) instead of failing the whole connection.
+                await self.reader.readexactly(exc.consumed)
+                discarding = True
+                continue
+            LINES.inc("received")
+            BYTES.inc("received", amount=len(line))
+            if discarding:
+                discarding = False
+                continue
+            line = line.rstrip(b"\r\n").decode("UTF-8", errors="replace")
+            if line:
+                return line
 
-        if response.find("PING") != -1:
-            self.command("PONG " + response.split()[1] + "\r")
+    async def get_message(self):
+        """Returns the next parsed IRCMessage, answering server PINGs along the way.
 
-        return response
+        Returns None at EOF or when the server stops answering our keepalive PING.
+        """
+        awaiting_pong = False
+        while True:
+            try:
+                line = await asyncio.wait_for(self.read_line(), self.ping_timeout if awaiting_pong else self.idle_timeout)
+            except asyncio.TimeoutError:
+                if awaiting_pong:
+                    print("Ping timeout")
+                    return None
+                awaiting_pong = True
+                self.command("PING :keepalive", urgent=True)
+                continue
+            except (ConnectionError, OSError) as exc:
+                print(f"Connection error: {exc}")
+                return None
+            awaiting_pong = False
+            if line is None:
+                return None
+            message = IRCMessage.parse(line)
+            if not message:
+                continue
+            if message.command == "PING":
+                self.command("PONG :" + (message.trailing or " ".join(message.params)), urgent=True)
+                continue
+            if message.command == "433":
+                # ERR_NICKNAMEINUSE: before RPL_WELCOME try "nick_", "nick__", ...; afterwards a reclaim failed, retried later
+                if not self.welcomed.is_set():
+                    self.nick += "_"
+                    self.command("NICK " + self.nick, urgent=True)
+                continue
+            if message.command == "NICK" and message.nick and self.nick and message.nick.lower() == self.nick.lower():
+                self.nick = message.trailing or message.target
+            if message.command == "001":
+                if message.params:
+                    self.nick = message.params[0]
+                if self.nick.lower() != self.wanted_nick.lower() and not self.reclaim_task:
+                    print(f"Registered as {self.nick}, {self.wanted_nick} is in use")
+                    self.reclaim_task = asyncio.create_task(self.reclaim_nick())
+                self.welcomed.set()
+                # JOIN goes ahead of any replies held while we were disconnected
+                self.outbound.extendleft(OutboundLine("JOIN " + channel_name) for channel_name in reversed(self.channel_names))
+                self.outbound_ready.set()
+            return message
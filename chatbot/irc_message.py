@@ -0,0 +1,46 @@
+class IRCMessage:
+    """One IRC protocol line split into prefix, command, middle params and trailing text."""
+
+    __slots__ = ("raw", "prefix", "command", "params", "trailing")
+
+    def __init__(self, raw, prefix, command, params, trailing):
+        self.raw = raw
+        self.prefix = prefix
+        self.command = command
+        self.params = params
+        self.trailing = trailing
+
+    def __repr__(self):
+        return f"IRCMessage({self.raw!r})"
+
+    @property
+    def nick(self):
+        if not self.prefix:
+            return None
+        return self.prefix.split("!", 1)[0]
+
+    @property
+    def target(self):
+        return self.params[0] if self.params else None
+
+    @classmethod
+    def parse(cls, line):
+        raw = line.rstrip("\r\n")
+        rest = raw
+        # IRCv3 message tags ("@time=...") are not used by the bot.
+        if rest.startswith("@"):
+            rest = rest.split(" ", 1)[1] if " " in rest else ""
+        prefix = None
+        if rest.startswith(":"):
+            prefix, _, rest = rest[1:].partition(" ")
+        trailing = None
+        if rest.startswith(":"):
+            trailing = rest[1:]
+            rest = ""
+        elif " :" in rest:
+            rest, trailing = rest.split(" :", 1)
+        params = rest.split()
+        if not params:
+            return None
+        command = params.pop(0).upper()
+        return cls(raw, prefix, command, params, trailing)
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+
+# A worker forked while another thread held a cache's lock would inherit it locked, so forks get fresh locks
+live_caches = weakref.WeakSet()
+
+
+def reset_locks_after_fork():
+    for cache in live_caches:
+        cache.lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_locks_after_fork)
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters and optional JSON persistence.
+
+    Safe to share between the event loop thread and executor threads; every access holds a lock.
+    """
+
+    def __init__(self, max_size=1024, persist_path=None):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        live_caches.add(self)
+        self.hits = 0
+        self.misses = 0
+        # A list while recording: entries put since the last take_new_entries(), e.g. in a forked worker
+        self.new_entries = None
+        if persist_path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if self.new_entries is not None:
+                self.new_entries.append((key, value))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def record_new_entries(self):
+        with self.lock:
+            self.new_entries = []
+
+    def take_new_entries(self):
+        """Returns the (key, value) pairs put since the last call and starts a new list."""
+        with self.lock:
+            new_entries, self.new_entries = self.new_entries or [], []
+        return new_entries
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, encoding="utf-8") as cache_file:
+                saved_entries = json.load(cache_file)
+        except (OSError, ValueError) as exc:
+            print(f"Failed to load cache from {self.persist_path}: {exc}")
+            return
+        for key, value in saved_entries:
+            self.put(key, value)
+
+    def save(self):
+        if not self.persist_path:
+            return
+        temp_path = self.persist_path + ".tmp"
+        with self.lock:
+            saved_entries = list(self.entries.items())
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(saved_entries, cache_file)
+        os.replace(temp_path, self.persist_path)
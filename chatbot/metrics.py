@@ -0,0 +1,229 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds; spans a cached answer (microseconds) up to a model call under load
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Workers are forked from an executor thread (InferencePool.recycle) while other threads may be updating
+# a metric; a lock held at that moment would stay locked in the child forever, so forks get fresh locks
+locked_objects = weakref.WeakSet()
+
+
+def reset_locks_after_fork():
+    for locked_object in locked_objects:
+        locked_object.lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_locks_after_fork)
+
+
+def format_labels(label_names, label_values):
+    if not label_names:
+        return ""
+    pairs = (f'{name}="{value}"' for name, value in zip(label_names, label_values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """A count that only goes up, kept separately for each combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+        locked_objects.add(self)
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def render(self):
+        return [f"{self.name}{format_labels(self.label_names, label_values)} {value}"
+                for label_values, value in sorted(self.values.items())]
+
+    def summary(self):
+        if not self.label_names:
+            return f"{self.name}={self.total()}"
+        return " ".join(f"{self.name}[{','.join(str(value) for value in label_values)}]={value}"
+                        for label_values, value in sorted(self.values.items()))
+
+
+class Gauge:
+    """A current value, either set directly or read from function when the metrics are rendered."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def read(self):
+        return self.function() if self.function else self.value
+
+    def render(self):
+        return [f"{self.name} {self.read()}"]
+
+    def summary(self):
+        return f"{self.name}={self.read():g}"
+
+
+class Histogram:
+    """Durations in seconds counted into fixed buckets (Prometheus style), plus their sum, per label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., overflow count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+        locked_objects.add(self)
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(label_values)
+            if counts is None:
+                counts = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def quantile(self, fraction, label_values):
+        """Estimates a quantile as the upper bound of the bucket it falls in."""
+        counts = self.values[label_values]
+        count = sum(counts[:-1])
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            if running >= fraction * count:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = []
+        for label_values, counts in sorted(self.values.items()):
+            running = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                running += bucket_count
+                bucket_labels = format_labels(self.label_names + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {running}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+            lines.append(f"{self.name}_count{labels} {running}")
+        return lines
+
+    def summary(self):
+        parts = []
+        for label_values, counts in sorted(self.values.items()):
+            count = sum(counts[:-1])
+            name = self.name + ("[" + ",".join(str(value) for value in label_values) + "]" if label_values else "")
+            parts.append(f"{name} n={count} mean={counts[-1] / count * 1000:.1f}ms "
+                         f"p95<={self.quantile(0.95, label_values) * 1000:g}ms")
+        return " ".join(parts)
+
+
+class MetricsRegistry:
+    """Every counter, gauge and histogram in the process, rendered as Prometheus text or one log line.
+
+    Asking for a metric that already exists returns it, so modules can declare theirs at import time.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        locked_objects.add(self)
+
+    def get_or_create(self, metric_class, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, function=None):
+        gauge = self.get_or_create(Gauge, name, help_text)
+        if function:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.get_or_create(Histogram, name, help_text, label_names, buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line with every metric that has recorded something."""
+        parts = []
+        for metric in list(self.metrics.values()):
+            if isinstance(metric, Gauge) or metric.values:
+                parts.append(metric.summary())
+        return "Metrics: " + " ".join(parts)
+
+
+async def handle_metrics_request(reader, writer, registry):
+    try:
+        request_line = await reader.readline()
+        # Headers are read and ignored
+        while (await reader.readline()).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1] in ("/", "/metrics"):
+            status, body = "200 OK", registry.render()
+        else:
+            status, body = "404 Not Found", "Not found\n"
+        payload = body.encode("UTF-8")
+        writer.write((f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                      f"Content-Length: {len(payload)}\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(port, host="127.0.0.1", registry=None):
+    """Serves the registry as Prometheus text on http://host:port/metrics; returns the asyncio server."""
+    registry = registry or metrics_registry
+    return await asyncio.start_server(lambda reader, writer: handle_metrics_request(reader, writer, registry), host, port)
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+
+
+class ModelRegistry:
+    """Loads each model exactly once and shares it between everything that asks for it."""
+
+    def __init__(self):
+        self.models = {}
+        self.load_seconds = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def is_loaded(self, key):
+        return key in self.models
+
+    def get(self, key, loader):
+        if key in self.models:
+            return self.models[key]
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        # Different models load in parallel; callers asking for the same one wait for the first load.
+        with key_lock:
+            if key not in self.models:
+                started = time.perf_counter()
+                self.models[key] = loader()
+                self.load_seconds[key] = time.perf_counter() - started
+                print(f"Loaded {key[0]} model {key[1]} in {self.load_seconds[key]:.1f}s")
+        return self.models[key]
+
+    def warm_up(self, loaders, background=True, on_complete=None, on_failure=None):
+        """Runs loader callables now, or on a daemon thread when background is set.
+
+        on_complete runs only when every loader succeeded; otherwise on_failure gets the first exception.
+        """
+        def load_all():
+            failure = None
+            for loader in loaders:
+                try:
+                    loader()
+                except Exception as exc:
+                    print(f"Model warm-up failed: {exc}")
+                    failure = failure or exc
+            if failure is None:
+                if on_complete:
+                    on_complete()
+            elif on_failure:
+                on_failure(failure)
+
+        if not background:
+            load_all()
+            return None
+        warm_up_thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        warm_up_thread.start()
+        return warm_up_thread
+
+
+def load_spacy(model_name, exclude=()):
+    import spacy
+
+    try:
+        return spacy.load(model_name, exclude=list(exclude))
+    except OSError:
+        spacy.cli.download(model_name)
+        return spacy.load(model_name, exclude=list(exclude))
+
+
+def load_cross_encoder(model_name, backend="torch", onnx_model_dir=None, threads=None):
+    """Loads the cross-encoder on one of CROSS_ENCODER_BACKENDS; every backend has CrossEncoder's predict()."""
+    if backend in ("onnx", "onnx-int8"):
+        from chatbot.cross_encoder_backends import OnnxCrossEncoder
+
+        return OnnxCrossEncoder(onnx_model_dir, quantized=backend == "onnx-int8", threads=threads)
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    if threads:
+        torch.set_num_threads(threads)
+    cross_encoder = CrossEncoder(model_name)
+    if backend == "torch-int8":
+        from chatbot.cross_encoder_backends import quantize_cross_encoder
+
+        quantize_cross_encoder(cross_encoder)
+    return cross_encoder
+
+
+def load_sentence_transformer(model_name):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def resident_memory_mb():
+    """Current resident set size in MB, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere.
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+model_registry = ModelRegistry()
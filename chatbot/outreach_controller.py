@@ -5,28 +5,28 @@ import time
 class OutreachController:
     """Manages automatic outreach timing and channel presence data."""
 
-    def __init__(self, greeting_fsm, botnick):
+    OUTREACH_DELAY_RANGE = (10, 20)
+    # How long to wait before trying again when outreach is blocked by a conversation or an empty channel
+    OUTREACH_RETRY_DELAY = 5
+
+    def __init__(self, greeting_fsm, botnick, scheduler=None):
         self.greeting_fsm = greeting_fsm
         self.botnick = botnick
+        self.scheduler = scheduler if scheduler is not None else greeting_fsm.scheduler
         self.channel_users = set()
         self.join_timestamp = None
-        self.auto_outreach_deadline = None
+        self.auto_outreach_timer = None
         self.auto_outreach_done = False
 
-    def reset_on_join(self):
+    def reset_on_join(self, irc_client, channel_name):
         self.join_timestamp = time.time()
-        self.auto_outreach_deadline = self.join_timestamp + random.uniform(10, 20)
+        self.schedule_outreach(random.uniform(*self.OUTREACH_DELAY_RANGE), irc_client, channel_name)
         self.auto_outreach_done = False
         # Clear any record of prior completed greetings.
         if hasattr(self.greeting_fsm, "conversation_completed"):
             self.greeting_fsm.conversation_completed = False
 
-    def update_users_from_names(self, names_line):
-        try:
-            raw_names = names_line.split(" :")[-1].strip().split()
-        except Exception:
-            return
-
+    def update_users_from_names(self, raw_names):
         for name in raw_names:
             stripped_name = name.lstrip("@+%~&")
             if stripped_name and stripped_name != self.botnick:
@@ -36,22 +36,27 @@ class OutreachController:
         if nickname and nickname != self.botnick:
             self.channel_users.add(nickname)
 
-    def attempt_auto_outreach(self, irc_client, channel_name):
-        if self.auto_outreach_done or not self.auto_outreach_deadline:
-            return
+    def schedule_outreach(self, delay, irc_client, channel_name):
+        self.scheduler.cancel(self.auto_outreach_timer)
+        self.auto_outreach_timer = self.scheduler.call_later(delay, self.attempt_auto_outreach, irc_client, channel_name)
 
-        if time.time() < self.auto_outreach_deadline:
+    def attempt_auto_outreach(self, irc_client, channel_name):
+        self.auto_outreach_timer = None
+        if self.auto_outreach_done:
             return
 
         # If we've already completed a greeting conversation don't initiate auto outreach again
         if getattr(self.greeting_fsm, "conversation_completed", False):
             return
 
-        if self.greeting_fsm.state != "START":
+        # Only reach out while no one else is being greeted
+        if self.greeting_fsm.has_active_sessions():
+            self.schedule_outreach(self.OUTREACH_RETRY_DELAY, irc_client, channel_name)
             return
 
         candidates = list(self.channel_users)
         if not candidates:
+            self.schedule_outreach(self.OUTREACH_RETRY_DELAY, irc_client, channel_name)
             return
 
         partner = random.choice(candidates)
@@ -0,0 +1,52 @@
+import asyncio
+
+
+class QuestionBatcher:
+    """Collects questions for a short window and answers each batch off the event loop.
+
+    answer_batch is either a plain function, run on executor, or a coroutine function that is awaited.
+    """
+
+    def __init__(self, answer_batch, executor=None, window=0.25, max_size=16):
+        self.answer_batch = answer_batch
+        self.executor = executor
+        self.window = window
+        self.max_size = max_size
+        self.pending = []
+        self.flush_handle = None
+        self.flush_tasks = set()
+
+    async def answer(self, question):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((question, future))
+        if len(self.pending) >= self.max_size:
+            self.start_flush()
+        elif not self.flush_handle:
+            self.flush_handle = loop.call_later(self.window, self.start_flush)
+        return await future
+
+    def start_flush(self):
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            flush_task = asyncio.ensure_future(self.flush(batch))
+            self.flush_tasks.add(flush_task)
+            flush_task.add_done_callback(self.flush_tasks.discard)
+
+    async def flush(self, batch):
+        loop = asyncio.get_running_loop()
+        questions = [question for question, unused_future in batch]
+        try:
+            if asyncio.iscoroutinefunction(self.answer_batch):
+                answers = await self.answer_batch(questions)
+            else:
+                answers = await loop.run_in_executor(self.executor, self.answer_batch, questions)
+        except Exception as exc:
+            print(f"Failed to answer question batch: {exc}")
+            answers = [None] * len(batch)
+        for (unused_question, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
@@ -0,0 +1,137 @@
+import re
+from chatbot.entity_extractors import GazetteerEntityExtractor
+from chatbot.metrics import metrics_registry
+
+
+OUTCOMES = metrics_registry.counter("chatbot_prefilter_questions_total", "Prefilter decisions", ("outcome",))
+
+
+class PrefilterMatch:
+    """What the rule-based scan found in one question."""
+
+    __slots__ = ("rows", "matched_texts", "column_names", "country_like", "qualified")
+
+    def __init__(self, rows, matched_texts, column_names, country_like, qualified=False):
+        self.rows = rows
+        self.matched_texts = matched_texts
+        self.column_names = column_names
+        self.country_like = country_like
+        # A qualifier pointed at some other statistic ("people per square mile", "area code")
+        self.qualified = qualified
+
+    @property
+    def column_name(self):
+        """The column when exactly one was named and nothing qualified it, otherwise None."""
+        return self.column_names[0] if len(self.column_names) == 1 and not self.qualified else None
+
+
+class QuestionPrefilter:
+    """Scans a question for known country names and column keywords without running any model.
+
+    Country names and aliases are found with one compiled alternation over the name index keys.
+    Misspellings ("inida") still mark the question as country-like, so they reach the full pipeline,
+    but only where the gazetteer would look for one: "thank you" or "my child" is small talk, not a typo.
+    """
+
+    KEYWORD_PATTERNS = {
+        "Region": r"\b(region|continent|part of the world)\b",
+        "Population": r"\b(population(?! density)|inhabitants|people live|populous)\b",
+        "Area (sq. mi.)": r"\b(area|square miles|land mass|how (big|large) is)\b",
+        "Pop. Density (per sq. mi.)": r"\b(population density|density|densely)\b",
+        "Coastline (coast/area ratio)": r"\b(coastline|coast)\b",
+        "Net migration": r"\b(migration|migrants|immigration|emigration)\b",
+        "Infant mortality (per 1000 births)": r"\b(infant|infants)\b",
+        "GDP ($ per capita)": r"\b(gdp|per capita|income)\b",
+        "Literacy (%)": r"\b(literacy|literate|read and write)\b",
+        "Phones (per 1000)": r"\b(phones?|cell ?phones?|mobile|cellular)\b",
+        "Birthrate": r"\b(birth ?rate|births)\b",
+        "Deathrate": r"\b(death ?rate|deaths)\b",
+        "Arable (%)": r"\b(arable|farmland)\b",
+        "Crops (%)": r"\b(crops|orchards|vineyards)\b",
+        "Climate": r"\b(climate|weather)\b",
+        "Agriculture": r"\b(agriculture|agricultural|farming)\b",
+        "Industry": r"\b(industry|industrial|manufacturing)\b",
+        "Service": r"\b(services?)\b",
+    }
+    # Words that turn a keyword into a different statistic, with the column they point at (None when
+    # no column holds it): "how many people live per square mile" is density, "area code" is not area.
+    # A question whose one keyword column differs from a qualifier's is left to the model.
+    QUALIFIER_PATTERNS = {
+        "Pop. Density (per sq. mi.)": r"\b(per (square|sq) (miles?|mi|km|kilometers?)|density|dense|crowded)\b",
+        "Literacy (%)": r"\b(read|reading|literacy|literate)\b",
+        "Deathrate": r"\b(die|dies|died|dying|death|deaths)\b",
+        "Birthrate": r"\b(born|birth|births)\b",
+        None: r"\b(code|codes)\b",
+    }
+    # Aliases that are also everyday words ("tell us"); they never count as an exact match
+    AMBIGUOUS_KEYS = {"us", "u s"}
+    # A hit-rate line is printed after this many questions
+    LOG_INTERVAL = 100
+
+    def __init__(self, name_index, column_names, gazetteer=None):
+        self.name_index = name_index
+        # Finds misspelled names by the gazetteer's rules (capitalized, or where a name is expected)
+        self.gazetteer = gazetteer or GazetteerEntityExtractor(name_index)
+        keys = sorted((key for key in name_index.entries if key not in self.AMBIGUOUS_KEYS), key=len, reverse=True)
+        # Longest names first, so "papua new guinea" wins over "guinea"
+        self.name_pattern = re.compile(r"\b(" + "|".join(re.escape(key) for key in keys) + r")\b")
+        self.keyword_patterns = [(column_name, re.compile(self.KEYWORD_PATTERNS[column_name]))
+                                 for column_name in column_names if column_name in self.KEYWORD_PATTERNS]
+        self.qualifier_patterns = [(column_name, re.compile(pattern)) for column_name, pattern in self.QUALIFIER_PATTERNS.items()]
+        self.answered = 0
+        self.skipped = 0
+        self.passed = 0
+
+    def scan(self, question):
+        text = self.name_index.normalize(question)
+        rows = []
+        matched_texts = []
+        for match in self.name_pattern.finditer(text):
+            row = self.name_index.entries[match.group(0)][1]
+            if row not in rows:
+                rows.append(row)
+                matched_texts.append(match.group(0))
+        column_names = [column_name for column_name, pattern in self.keyword_patterns if pattern.search(text)]
+        country_like = bool(rows) or bool(self.gazetteer.extract(question))
+        if column_names and not country_like:
+            # A statistic was asked about, so a misspelled name anywhere ("population of swedn please") counts
+            country_like = self.has_misspelled_name(text.split())
+        qualified = len(column_names) == 1 and any(
+            column_name != column_names[0] and pattern.search(text) for column_name, pattern in self.qualifier_patterns)
+        return PrefilterMatch(rows, matched_texts, column_names, country_like, qualified)
+
+    def has_misspelled_name(self, tokens):
+        return any(self.gazetteer.fuzzy_name(token, capitalized=False) for token in tokens
+                   if self.gazetteer.fuzzy_candidate(token, self.gazetteer.MIN_FUZZY_TOKEN_LENGTH))
+
+    def carry_counts(self, previous):
+        """Continues the hit-rate counters of the prefilter this one replaces."""
+        self.answered += previous.answered
+        self.skipped += previous.skipped
+        self.passed += previous.passed
+
+    def record(self, outcome):
+        """Counts an outcome ("answered", "skipped" or "passed") and logs hit rates periodically."""
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        OUTCOMES.inc(outcome)
+        if self.total() % self.LOG_INTERVAL == 0:
+            print(self.describe())
+
+    def total(self):
+        return self.answered + self.skipped + self.passed
+
+    def stats(self):
+        total = self.total()
+        return {
+            "questions": total,
+            "answered": self.answered,
+            "skipped": self.skipped,
+            "passed": self.passed,
+            "model_free_rate": (self.answered + self.skipped) / total if total else 0.0,
+        }
+
+    def describe(self):
+        stats = self.stats()
+        return (f"Prefilter: {stats['questions']} questions, {stats['answered']} answered by rules, "
+                f"{stats['skipped']} skipped as not country questions, {stats['passed']} sent to the models "
+                f"({stats['model_free_rate']:.0%} needed no model)")
@@ -0,0 +1,89 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class TimerHandle:
+    """A scheduled callback; pass it to Scheduler.cancel to stop it from running."""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class Scheduler:
+    """Heap of timers on the monotonic clock, run by a single task that sleeps until the next deadline."""
+
+    def __init__(self):
+        self.heap = []
+        self.sequence = itertools.count()
+        self.cancelled_count = 0
+        # Set when a timer earlier than the one being waited on is added
+        self.wakeup = asyncio.Event()
+
+    @staticmethod
+    def now():
+        return time.monotonic()
+
+    def call_at(self, deadline, callback, *args):
+        handle = TimerHandle(deadline, callback, args)
+        if not self.heap or deadline < self.heap[0][0]:
+            self.wakeup.set()
+        # The sequence number keeps timers with equal deadlines in insertion order
+        heapq.heappush(self.heap, (deadline, next(self.sequence), handle))
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now() + delay, callback, *args)
+
+    def cancel(self, handle):
+        if handle and not handle.cancelled:
+            handle.cancelled = True
+            self.cancelled_count += 1
+            # Cancelled entries are skipped lazily; rebuild once they make up most of the heap
+            if self.cancelled_count > len(self.heap) // 2:
+                self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+                heapq.heapify(self.heap)
+                self.cancelled_count = 0
+
+    def __len__(self):
+        return len(self.heap) - self.cancelled_count
+
+    def next_deadline(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+            self.cancelled_count -= 1
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self):
+        """Runs every timer whose deadline has passed and returns how many ran."""
+        ran = 0
+        now = self.now()
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return ran
+            unused_deadline, unused_sequence, handle = heapq.heappop(self.heap)
+            # Marked so a late cancel() of a timer that already fired is not counted as pending
+            handle.cancelled = True
+            ran += 1
+            try:
+                handle.callback(*handle.args)
+            except Exception as exc:
+                print(f"Timer callback {handle.callback.__name__} failed: {exc}")
+
+    async def run(self):
+        while True:
+            self.run_due()
+            deadline = self.next_deadline()
+            self.wakeup.clear()
+            timeout = None if deadline is None else max(0.0, deadline - self.now())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,38 +1,61 @@
+import argparse
+import asyncio
 import os
 import random
 import re
-import sys
+import signal
 import time
-import spacy
-from chatbot.outreach_controller import OutreachController
+from concurrent.futures import ThreadPoolExecutor
+from chatbot.channel_context import ChannelDirectory
 from chatbot.country_information_store import CountryInformationStore
-from chatbot.greeting_fsm import GreetingFSM
+from chatbot.cross_encoder_backends import CROSS_ENCODER_BACKENDS
+from chatbot.entity_extractors import ENTITY_EXTRACTORS
+from chatbot.inference_pool import InferencePool
 from chatbot.irc_client import IRC
+from chatbot.metrics import metrics_registry, serve_metrics
+from chatbot.model_registry import resident_memory_mb
+from chatbot.question_batcher import QuestionBatcher
+from chatbot.scheduler import Scheduler
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 COUNTRY_DATA_PATH = os.path.join(BASE_DIR, "data", "countries_clean.csv")
+INTENT_CACHE_PATH = os.path.join(BASE_DIR, "data", "intent_cache.json")
+# Written by tools/export_cross_encoder.py; used by the onnx and onnx-int8 intent backends
+ONNX_MODEL_DIR = os.path.join(BASE_DIR, "data", "cross-encoder-onnx")
 country_information_store = None
-
-try:
-    spacy.load("en_core_web_lg")
-except OSError:
-    spacy.cli.download("en_core_web_lg")
-
-
-def parse_message(raw_text, botnick):
+# Worker processes answering questions when started with --workers
+inference_pool = None
+STARTUP_TIME = time.perf_counter()
+# Questions arriving within this window (or until the batch is full) are answered together
+QUESTION_BATCH_WINDOW = 0.25
+QUESTION_BATCH_SIZE = 16
+# Outbound lines per second and burst size; keeps the bot under libera.chat's flood limits
+SEND_RATE = 1.0
+SEND_BURST = 5
+# How often the country CSV is checked for changes (it is reloaded without restarting)
+DATA_WATCH_INTERVAL = 10.0
+# Reconnect backoff doubles from the initial delay up to the maximum after each failed attempt
+RECONNECT_INITIAL_DELAY = 1.0
+RECONNECT_MAX_DELAY = 300.0
+# How often the intent cache is written to INTENT_CACHE_PATH; it is also written at shutdown
+INTENT_CACHE_SAVE_INTERVAL = 600.0
+# Seconds between metrics log lines; 0 turns them off
+METRICS_LOG_INTERVAL = 300.0
+COMMAND_SECONDS = metrics_registry.histogram("chatbot_command_seconds", "Time from an addressed message to its reply",
+                                             ("kind",))
+
+
+def parse_message(message, botnick):
     """
-    Extracts the sender and message text.
+    Extracts the sender and message text from a parsed PRIVMSG.
     Detects if message is addressed to the bot: botnick:
     """
-    if " PRIVMSG " not in raw_text:
+    if message.command != "PRIVMSG" or message.trailing is None or not message.nick:
         return None, None, False
 
-    try:
-        sender = raw_text.split("!")[0].replace(":", "")
-        message_text = raw_text.split("PRIVMSG", 1)[1].split(":", 1)[1].strip()
-    except Exception:
-        return None, None, False
+    sender = message.nick
+    message_text = message.trailing.strip()
 
     is_addressed = message_text.lower().startswith(botnick.lower() + ":")
     if is_addressed:
@@ -41,139 +64,413 @@ def parse_message(raw_text, botnick):
     return sender, message_text, is_addressed
 
 
-# Memory store (for forget command)
-memory = {}
+question_batcher = None
+shutdown_event = None
+# Handler tasks are kept referenced until they finish
+handler_tasks = set()
 
-def handle_command(sender, message_text, irc_client, channel_name, botnick, auto_greeting_controller):
+async def handle_command(sender, message_text, irc_client, context, botnick):
+    channel_name = context.name
     message_lower = message_text.lower()
 
     # die
     if message_lower == "die":
-        time.sleep(1)
+        await asyncio.sleep(1)
         irc_client.send(channel_name, f"{sender}: I shall!")
         irc_client.command("QUIT")
-        sys.exit()
+        shutdown_event.set()
+        return "die"
 
     # forget
     elif message_lower == "forget":
-        time.sleep(1)
-        memory.clear()
-        greeting_state_machine.reset()
-        auto_greeting_controller.reset_on_join()
+        await asyncio.sleep(1)
+        context.forget(irc_client)
+        # Cached answers are shared by every channel
+        if country_information_store:
+            country_information_store.clear_caches()
+        if inference_pool:
+            inference_pool.invalidate_caches()
         irc_client.send(channel_name, f"{sender}: forgetting everything")
-        return
+        return "forget"
+
+    # reload
+    elif message_lower == "reload":
+        if not country_information_store:
+            irc_client.send(channel_name, f"{sender}: I have no country data to reload.")
+            return "reload"
+        report = await reload_country_data()
+        irc_client.send(channel_name, f"{sender}: {report}")
+        return "reload"
 
     # who are you? / usage
     elif message_lower in ("who are you", "who are you?", "usage"):
-        time.sleep(1)
+        await asyncio.sleep(1)
         irc_client.send(channel_name, f"{sender}: My name is {botnick}. I was created by Braeden Alonge, Lucas Summers, Rory Smail, and Nathan Lim.")
         irc_client.send(channel_name, f"{sender}: I can answer questions about country stats (population, area, region, coastline, population density, "
-        "GDP, literacy, cellular subscriptions, birthrate, deathrate). Nathan and Braeden worked on applying the cross-encoder model to detect "
+        "GDP, literacy, cellular subscriptions, birthrate, deathrate, arable land, crops, climate, and the agriculture/industry/service share of GDP). Nathan and Braeden worked on applying the cross-encoder model to detect "
         "the type of question, and Lucas and Rory worked on the the country lookup. All of us worked on putting everything together and final answer generation. ")
 
         irc_client.send(channel_name, f"Example question: \"How many people live in Italy?\"")
-        return
+        return "usage"
 
     # users
     elif message_lower == "users":
-        time.sleep(1)
+        await asyncio.sleep(1)
         # send a list of users in the channel
+        context.requesting_user = sender
         irc_client.command(f"NAMES {channel_name}")
         return "users"
 
     # greetings (handed off to FSM)
     elif re.search(r"\b(hi|hello|hey)\b", message_lower):
-        greeting_state_machine.receive_greeting(sender, irc_client, channel_name)
-        return
+        await context.greeting_fsm.receive_greeting(sender, irc_client, channel_name)
+        return "greeting"
 
     smart_response = None
+    needs_model = False
     if country_information_store:
-        smart_response = country_information_store.answer_question(message_text)
+        # Exact country names plus column keywords are answered by rules; chit-chat skips the models entirely
+        smart_response, needs_model = country_information_store.prefilter_question(message_text)
+
+    if needs_model and country_information_store.warm_up_error is not None:
+        # The models could not be loaded; fall through to conversation and fallback replies like a bot without data
+        needs_model = False
+    elif needs_model and not country_information_store.is_ready():
+        # Lazy start: the first question kicks off loading in the background
+        country_information_store.warm_up(on_complete=lambda: report_startup("Models loaded"))
+        # A greeting partner's reply ("I am doing well thank you") can look country-like; it belongs to the FSM
+        if await context.greeting_fsm.handle_conversation_message(sender, message_text, irc_client, channel_name):
+            return "conversation"
+        await asyncio.sleep(1)
+        irc_client.send(channel_name, f"{sender}: I'm still warming up, ask me again in a moment.")
+        return "warming_up"
+
+    if needs_model:
+        # Batched with other questions and answered on the inference thread, so the event loop keeps running
+        smart_response = await question_batcher.answer(message_text)
     if smart_response:
-        time.sleep(1)
+        await asyncio.sleep(1)
         irc_client.send(channel_name, f"{sender}: {smart_response}")
-        return
-
+        return "model" if needs_model else "rules"
 
     # Greeting FSM may still need to consume the message if we are mid-conversation
-    if greeting_state_machine.handle_conversation_message(sender, message_text, irc_client, channel_name):
-        return
+    if await context.greeting_fsm.handle_conversation_message(sender, message_text, irc_client, channel_name):
+        return "conversation"
 
     # If we reached this point, bot did not understand the message
-    time.sleep(1)
+    await asyncio.sleep(1)
     fallback_responses = [
         "Sorry, I don't know that one.",
         "Can you try asking something I would know?"
     ]
     irc_client.send(channel_name, f"{sender}: {random.choice(fallback_responses)}")
-    return
+    return "fallback"
+
 
+async def run_command(sender, message_text, irc_client, context, botnick):
+    """Runs handle_command and records how long the reply took, by the kind of command it turned out to be."""
+    started = time.perf_counter()
+    kind = await handle_command(sender, message_text, irc_client, context, botnick)
+    COMMAND_SECONDS.observe(time.perf_counter() - started, kind)
 
-if os.path.exists(COUNTRY_DATA_PATH):
+
+async def reload_country_data():
+    """Reloads the dataset on a worker thread, then refreshes the inference workers; returns the report."""
+    loop = asyncio.get_running_loop()
+    reloaded, report = await loop.run_in_executor(None, country_information_store.reload_dataset)
+    print(report)
+    if reloaded and inference_pool:
+        # Workers hold a forked copy of the old snapshot; forking them again blocks, so it runs off the loop
+        await loop.run_in_executor(None, inference_pool.recycle)
+    return report
+
+
+def watch_country_data():
+    """Scheduler callback: reloads the dataset when its CSV has changed, then checks again later."""
+    if country_information_store.data_changed() and not country_information_store.reload_lock.locked():
+        reload_task = asyncio.ensure_future(reload_country_data())
+        handler_tasks.add(reload_task)
+        reload_task.add_done_callback(handler_tasks.discard)
+    scheduler.call_later(DATA_WATCH_INTERVAL, watch_country_data)
+
+
+def save_intent_cache():
+    """Writes the intent cache so the next start begins warm; a failed write is reported, not raised."""
     try:
-        country_information_store = CountryInformationStore(COUNTRY_DATA_PATH)
+        country_information_store.save_intent_cache()
+    except OSError as exc:
+        print(f"Failed to save the intent cache to {INTENT_CACHE_PATH}: {exc}")
+
+
+def flush_intent_cache():
+    """Scheduler callback: saves the intent cache, then again after the interval."""
+    save_intent_cache()
+    scheduler.call_later(INTENT_CACHE_SAVE_INTERVAL, flush_intent_cache)
+
+
+def log_metrics():
+    """Scheduler callback: prints every metric on one line, then again after the interval."""
+    print(metrics_registry.summary())
+    scheduler.call_later(metrics_log_interval, log_metrics)
+
+
+def register_gauges(irc_client):
+    metrics_registry.gauge("chatbot_irc_queue_depth", "Lines waiting in the send queue", lambda: irc_client.queue_depth)
+    metrics_registry.gauge("chatbot_commands_in_flight", "Addressed messages still being handled", lambda: len(handler_tasks))
+    metrics_registry.gauge("chatbot_greeting_sessions", "Open greeting conversations",
+                           lambda: sum(len(context.greeting_fsm.sessions) for context in channel_directory))
+    metrics_registry.gauge("chatbot_resident_memory_mb", "Resident set size of the bot process", resident_memory_mb)
+    if country_information_store:
+        # With --workers lookups happen in the workers, so hits and misses stay at zero here; the size still grows
+        intent_cache = country_information_store.intent_cache
+        metrics_registry.gauge("chatbot_intent_cache_hits", "Intent cache hits since startup", lambda: intent_cache.hits)
+        metrics_registry.gauge("chatbot_intent_cache_misses", "Intent cache misses since startup", lambda: intent_cache.misses)
+        metrics_registry.gauge("chatbot_intent_cache_size", "Entries in the intent cache", lambda: len(intent_cache))
+
+
+def handle_message(message, irc_client):
+    """Handles one server message; addressed commands run as their own task so they never block the reader."""
+    if debug_logging:
+        print("RECEIVED ==> ", message.raw)
+
+    # The server may have given us a fallback nick ("botnick_") while ours is in use
+    nick = irc_client.nick or botnick
+    if message.command in ("001", "NICK"):
+        for context in channel_directory:
+            context.outreach_controller.botnick = nick
+
+    if message.command == "001":
+        report_startup("Registered with " + server + " as " + nick)
+
+    # RPL_NAMREPLY: "<botnick> = <channel> :<names>"
+    if message.command == "353" and len(message.params) >= 3:
+        context = channel_directory.get(message.params[2])
+        if context:
+            raw_name_list = (message.trailing or "").split()
+            context.outreach_controller.update_users_from_names(raw_name_list)
+            if context.requesting_user:
+                filtered_names = []
+                for name_value in raw_name_list:
+                    if name_value not in (context.requesting_user, nick):
+                        filtered_names.append(name_value)
+                irc_client.send(context.name, f"{context.requesting_user}: {' '.join(filtered_names)}")
+        return
+
+    # RPL_ENDOFNAMES: "<botnick> <channel> :End of /NAMES list."
+    if message.command == "366" and len(message.params) >= 2:
+        context = channel_directory.get(message.params[1])
+        if context:
+            context.requesting_user = None
+        return
+
+    # Our own JOIN: the first one starts the outreach timer, later ones are rejoins after a reconnect
+    if message.command == "JOIN" and message.nick == nick:
+        context = channel_directory.get(message.target or message.trailing)
+        if not context:
+            return
+        if context.outreach_controller.join_timestamp is None:
+            report_startup("Joined " + context.name)
+            context.outreach_controller.reset_on_join(irc_client, context.name)
+        else:
+            print(f"Rejoined {context.name}, resuming with {len(context.outreach_controller.channel_users)} known users")
+        return
+
+    sender, message_text, is_addressed = parse_message(message, nick)
+    if not message_text:
+        return
+    context = channel_directory.get(message.target)
+    if not context:
+        return
+
+    context.outreach_controller.note_activity(sender)
+
+    # Handle addressed commands
+    if is_addressed:
+        handler_task = asyncio.create_task(run_command(sender, message_text, irc_client, context, nick))
+        handler_tasks.add(handler_task)
+        handler_task.add_done_callback(handler_tasks.discard)
+
+
+async def read_messages(irc_client):
+    while True:
+        message = await irc_client.get_message()
+        if message is None:
+            print("Connection to server lost")
+            return
+        handle_message(message, irc_client)
+
+
+async def run_session(irc_client):
+    """Runs the reader until the connection drops or the bot is told to die."""
+    reader_task = asyncio.create_task(read_messages(irc_client))
+    shutdown_task = asyncio.create_task(shutdown_event.wait())
+    await asyncio.wait([reader_task, shutdown_task], return_when=asyncio.FIRST_COMPLETED)
+    reader_task.cancel()
+    shutdown_task.cancel()
+    if not shutdown_event.is_set():
+        await irc_client.disconnect()
+
+
+async def run_bot():
+    global question_batcher, shutdown_event
+    shutdown_event = asyncio.Event()
+    try:
+        # SIGTERM shuts down like "die", so the intent cache is saved below
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, shutdown_event.set)
+    except (NotImplementedError, AttributeError):
+        pass
+    # spaCy and the cross-encoder are CPU-bound, so they run on their own thread (or on worker processes)
+    inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+    if inference_pool:
+        question_batcher = QuestionBatcher(inference_pool.answer_questions, None, QUESTION_BATCH_WINDOW, QUESTION_BATCH_SIZE)
+    elif country_information_store:
+        question_batcher = QuestionBatcher(country_information_store.answer_questions, inference_executor,
+                                           QUESTION_BATCH_WINDOW, QUESTION_BATCH_SIZE)
+
+    # One client for the whole run: replies queued while disconnected are sent after the reconnect.
+    # Channel contexts live for the whole run, so users and conversations survive too.
+    irc_client = IRC(send_rate=send_rate, send_burst=SEND_BURST)
+    register_gauges(irc_client)
+    metrics_server = None
+    if metrics_port:
+        metrics_server = await serve_metrics(metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
+    # Greeting timeouts and the outreach deadline fire from here, also while reconnecting
+    scheduler_task = asyncio.create_task(scheduler.run())
+    if country_information_store:
+        scheduler.call_later(DATA_WATCH_INTERVAL, watch_country_data)
+        scheduler.call_later(INTENT_CACHE_SAVE_INTERVAL, flush_intent_cache)
+    if metrics_log_interval:
+        scheduler.call_later(metrics_log_interval, log_metrics)
+    reconnect_delay = RECONNECT_INITIAL_DELAY
+    try:
+        while not shutdown_event.is_set():
+            try:
+                await irc_client.connect(server, port, channel_directory.names(), botnick, botpass, botnickpass)
+            except (OSError, asyncio.TimeoutError) as exc:
+                print(f"Could not connect to {server}: {exc}")
+            else:
+                await run_session(irc_client)
+                if irc_client.welcomed.is_set():
+                    reconnect_delay = RECONNECT_INITIAL_DELAY
+            if shutdown_event.is_set():
+                break
+            # Jitter keeps a crowd of bots from reconnecting in lockstep
+            delay = reconnect_delay * random.uniform(1.0, 1.25)
+            print(f"Reconnecting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(shutdown_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_DELAY)
+    finally:
+        # Also reached on Ctrl-C or a crash, so the warmed cache survives any restart
+        if country_information_store:
+            save_intent_cache()
+
+    scheduler_task.cancel()
+    if metrics_server:
+        metrics_server.close()
+    await irc_client.close()
+    inference_executor.shutdown(wait=False)
+    if inference_pool:
+        inference_pool.shutdown()
+    if country_information_store:
+        print(country_information_store.prefilter.describe())
+    send_stats = irc_client.send_stats()
+    print(f"Sent {send_stats['lines_sent']} lines, mean send latency {send_stats['mean_send_latency']:.2f}s, "
+          f"max {send_stats['max_send_latency']:.2f}s")
+    print(metrics_registry.summary())
+
+
+def create_country_information_store(spacy_model, intent_backend="torch", onnx_model_dir=ONNX_MODEL_DIR, inference_threads=None,
+                                     entity_extractor="spacy"):
+    if not os.path.exists(COUNTRY_DATA_PATH):
+        print(f"Country data file not found: {COUNTRY_DATA_PATH}")
+        return None
+    try:
+        return CountryInformationStore(COUNTRY_DATA_PATH, intent_cache_path=INTENT_CACHE_PATH, spacy_model=spacy_model,
+                                       cross_encoder_backend=intent_backend, onnx_model_dir=onnx_model_dir,
+                                       inference_threads=inference_threads, entity_extractor=entity_extractor)
     except Exception as exc:
         print(f"Failed to initialize CountryInformationStore: {exc}")
-        country_information_store = None
-else:
-    print(f"Country data file not found: {COUNTRY_DATA_PATH}")
+        return None
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="IRC country-stats chatbot")
+    parser.add_argument("--warm-up", choices=("eager", "background", "lazy"), default="background",
+                        help="load models before joining, on a background thread while joining, or on the first question")
+    parser.add_argument("--channel", action="append", dest="channels",
+                        help="channel to join; repeat for several channels, all served by one model instance")
+    parser.add_argument("--spacy-model", default="en_core_web_lg",
+                        help="spaCy pipeline used for NER, e.g. en_core_web_sm for a faster, smaller start")
+    parser.add_argument("--entity-extractor", choices=ENTITY_EXTRACTORS, default="spacy",
+                        help="find countries with spaCy NER, with the dataset's names and aliases (no spaCy model "
+                             "loaded), or with the names first and NER for questions where none were found")
+    parser.add_argument("--intent-backend", choices=CROSS_ENCODER_BACKENDS, default="torch",
+                        help="how the cross-encoder runs: PyTorch, PyTorch int8, or an ONNX Runtime export (fp32/int8)")
+    parser.add_argument("--onnx-model", default=ONNX_MODEL_DIR,
+                        help="directory written by tools/export_cross_encoder.py, for the onnx backends")
+    parser.add_argument("--inference-threads", type=int,
+                        help="CPU threads for the intent model (default: every core; with --workers, each worker's share)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="answer questions on this many forked worker processes (implies --warm-up eager); "
+                             "0 answers them on a single background thread")
+    parser.add_argument("--server", default=server, help="IRC server to connect to, e.g. 127.0.0.1 for the stub server")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--nick", help="nickname to use instead of a random one")
+    parser.add_argument("--send-rate", type=float, default=SEND_RATE,
+                        help="outbound lines per second; raise it only on servers without flood limits")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus-text metrics on this local port (0: no endpoint)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_LOG_INTERVAL,
+                        help="seconds between metrics log lines (0: none)")
+    parser.add_argument("--debug", action="store_true", help="print every line received from the server")
+    return parser.parse_args()
+
+
+def report_startup(stage):
+    print(f"{stage}: {time.perf_counter() - STARTUP_TIME:.1f}s since start, RSS {resident_memory_mb():.0f} MB")
+
 
 ## IRC Config
 server = "irc.libera.chat"  # server IP/Hostname
 port = 6667
-channel = "#CSC482"
+channels = ["#CSC482"]
 botnick = "Braethan-bot" + str(random.randint(0, 999))
 botnickpass = ""  # for a registered nickname
 botpass = ""  # for a registered bot
+send_rate = SEND_RATE
+metrics_port = 0
+metrics_log_interval = METRICS_LOG_INTERVAL
+debug_logging = False
 
-greeting_state_machine = GreetingFSM()
-auto_greeting_controller = OutreachController(greeting_state_machine, botnick)
+scheduler = Scheduler()
+channel_directory = ChannelDirectory(channels, botnick, scheduler)
 
 if __name__ == "__main__":
-    irc_client = IRC()
-    irc_client.connect(server, port, channel, botnick, botpass, botnickpass)
-
-    auto_greeting_controller.reset_on_join()
-
-    requesting_user = None
-
-    while True:
-        response_text = irc_client.get_response()
-        if response_text:
-            print("RECEIVED ==> ", response_text)
-
-            for response_line in response_text.split("\n"):
-                response_line = response_line.strip()
-                if not response_line:
-                    continue
-
-                if " 353 " in response_line and channel in response_line:
-                    auto_greeting_controller.update_users_from_names(response_line)
-                    if requesting_user:
-                        try:
-                            raw_name_list = response_line.split(" :")[-1].strip().split()
-                            filtered_names = []
-                            for name_value in raw_name_list:
-                                if name_value not in (requesting_user, botnick):
-                                    filtered_names.append(name_value)
-                            irc_client.send(channel, f"{requesting_user}: {' '.join(filtered_names)}")
-                        except Exception:
-                            pass
-
-                if " 366 " in response_line and channel in response_line:
-                    requesting_user = None
-
-                sender, message_text, is_addressed = parse_message(response_line, botnick)
-                if not message_text:
-                    continue
-
-                auto_greeting_controller.note_activity(sender)
-
-                # Handle addressed commands
-                if is_addressed:
-                    if handle_command(sender, message_text, irc_client, channel, botnick, auto_greeting_controller) == "users":
-                        requesting_user = sender
-                    continue
-
-        greeting_state_machine.check_timeout(irc_client, channel)
-        auto_greeting_controller.attempt_auto_outreach(irc_client, channel)
+    arguments = parse_arguments()
+    server, port, send_rate = arguments.server, arguments.port, arguments.send_rate
+    metrics_port, metrics_log_interval, debug_logging = arguments.metrics_port, arguments.metrics_interval, arguments.debug
+    if arguments.nick:
+        botnick = arguments.nick
+    if arguments.channels or arguments.nick:
+        channel_directory = ChannelDirectory(arguments.channels or channels, botnick, scheduler)
+    country_information_store = create_country_information_store(arguments.spacy_model, arguments.intent_backend,
+                                                                 arguments.onnx_model, arguments.inference_threads,
+                                                                 arguments.entity_extractor)
+    if country_information_store and arguments.workers > 0:
+        if InferencePool.is_supported():
+            # Workers are forked from the loaded store, so the models must be in memory first
+            country_information_store.warm_up(background=False, on_complete=lambda: report_startup("Models loaded"))
+            try:
+                inference_pool = InferencePool(country_information_store, arguments.workers).start()
+            except RuntimeError as exc:
+                print(f"Not starting inference workers: {exc}")
+        else:
+            print("Worker processes need fork support; answering questions on a thread instead")
+    if country_information_store and not inference_pool and arguments.warm_up != "lazy":
+        country_information_store.warm_up(background=arguments.warm_up == "background", on_complete=lambda: report_startup("Models loaded"))
+
+    asyncio.run(run_bot())
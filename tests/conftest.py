@@ -0,0 +1,12 @@
+import os
+import pytest
+from chatbot.country_information_store import CountryInformationStore
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "countries_clean.csv")
+
+
+@pytest.fixture(scope="session")
+def store():
+    """A store over the real dataset; its models are never loaded unless a test asks for them."""
+    return CountryInformationStore(DATA_PATH)
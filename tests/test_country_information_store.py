@@ -0,0 +1,47 @@
+import pytest
+
+
+def answer_with(store, monkeypatch, question, entity_texts, column_name):
+    """Answers question as if spaCy found entity_texts and the intent model chose column_name."""
+    store.answer_cache.clear()
+    monkeypatch.setattr(store, "extract_ner_texts", lambda questions: [list(entity_texts) for unused_question in questions])
+    monkeypatch.setattr(store, "infer_columns", lambda questions, cache_keys: [column_name for unused_question in questions])
+    return store.answer_question(question)
+
+
+@pytest.mark.parametrize("question, region_span, expected", [
+    ("What is the largest country in South America?", "South America", "Brazil"),
+    ("Which country in North Africa is the largest?", "North Africa", "Algeria"),
+])
+def test_region_superlative_ignores_ner_span_of_the_region(store, monkeypatch, question, region_span, expected):
+    answer = answer_with(store, monkeypatch, question, [region_span], "Area (sq. mi.)")
+    assert expected in answer
+    assert "South Africa" not in answer
+
+
+def test_country_span_still_answers_for_that_country(store, monkeypatch):
+    answer = answer_with(store, monkeypatch, "How big is South Africa?", ["South Africa"], "Area (sq. mi.)")
+    assert answer.startswith("South Africa")
+
+
+def test_code_columns_are_not_ranked_or_averaged(store, monkeypatch):
+    assert "Climate" not in store.query_engine.sort_orders
+    for question in ("Which country has the highest climate?", "What is the average climate in Western Europe?"):
+        answer = answer_with(store, monkeypatch, question, [], "Climate")
+        assert answer == "The climate zone code is a category, so I can't rank or average it."
+
+
+def test_measured_columns_are_still_ranked(store, monkeypatch):
+    answer = answer_with(store, monkeypatch, "Which country has the highest GDP per capita?", [], "GDP ($ per capita)")
+    assert answer.startswith("Luxembourg has the highest GDP per capita.")
+
+
+@pytest.mark.parametrize("countries, expected", [
+    (["Spain", "Portugal"], "They have the same climate zone code."),
+    (["Chad", "Niger"], "They have different climate zone codes."),
+])
+def test_comparison_on_a_code_column_says_same_or_different(store, monkeypatch, countries, expected):
+    question = f"Is {countries[0]} hotter than {countries[1]}?"
+    answer = answer_with(store, monkeypatch, question, countries, "Climate")
+    assert answer.endswith(expected)
+    assert "higher" not in answer and not answer.startswith(("Yes", "No"))
@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from chatbot.inference_pool import InferencePool
+from chatbot.lru_cache import LRUCache
+
+
+class EchoStore:
+    """Answers each question with itself and caches an intent for it, as the real store does on a model call."""
+
+    def __init__(self):
+        self.intent_cache = LRUCache(16)
+
+    def is_ready(self):
+        return True
+
+    def set_inference_threads(self, threads):
+        pass
+
+    def clear_caches(self):
+        pass
+
+    def answer_questions(self, questions):
+        for question in questions:
+            self.intent_cache.put(question, "Population")
+        return list(questions)
+
+
+@pytest.mark.skipif(not InferencePool.is_supported(), reason="needs fork")
+def test_worker_intent_entries_reach_the_parent_cache():
+    store = EchoStore()
+    pool = InferencePool(store, workers=1).start()
+    try:
+        answers = asyncio.run(pool.answer_questions(["population of peru", "population of chile"]))
+    finally:
+        pool.shutdown()
+    assert answers == ["population of peru", "population of chile"]
+    assert store.intent_cache.get("population of peru") == "Population"
+    assert store.intent_cache.get("population of chile") == "Population"
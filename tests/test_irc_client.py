@@ -0,0 +1,39 @@
+import asyncio
+from benchmarks.irc_stub_server import StubIRCServer
+from chatbot.irc_client import IRC
+
+
+async def read_until(irc_client, command):
+    while True:
+        message = await asyncio.wait_for(irc_client.get_message(), 5.0)
+        assert message is not None, "connection closed"
+        if message.command == command:
+            return message
+
+
+async def register_while_nick_is_taken():
+    server = await StubIRCServer().start()
+    holder = server.add_virtual_user("rando-bot", "#test")
+    server.add_virtual_user("rando-bot_", "#test")
+    irc_client = IRC(send_rate=100.0, send_burst=100, nick_reclaim_interval=0.05)
+    try:
+        await irc_client.connect(server.host, server.port, ["#test"], "rando-bot", "", "")
+        await read_until(irc_client, "001")
+        registered_as = irc_client.nick
+        joined = await read_until(irc_client, "JOIN")
+        server.remove_virtual_user(holder)
+        nick_change = await read_until(irc_client, "NICK")
+        return registered_as, joined.nick, nick_change, irc_client.nick, server.find_member("rando-bot")
+    finally:
+        await irc_client.disconnect()
+        await server.stop()
+
+
+def test_taken_nick_gets_a_suffix_and_is_reclaimed():
+    registered_as, joined_as, nick_change, final_nick, member = asyncio.run(register_while_nick_is_taken())
+    # "rando-bot" and "rando-bot_" are both taken, so the server welcomes the second fallback
+    assert registered_as == "rando-bot__"
+    assert joined_as == "rando-bot__"
+    assert nick_change.nick == "rando-bot__"
+    assert final_nick == "rando-bot"
+    assert member is not None and member.nick == "rando-bot"
@@ -0,0 +1,33 @@
+import pytest
+from benchmarks.question_corpus import LABELED_QUESTIONS
+
+
+@pytest.mark.parametrize("line", [
+    "i'm doing well thank you",
+    "I'm good",
+    "my child is in the hospital",
+    "tell us about the weather",
+    "Im hungry",
+    "I am doing well thank you",
+])
+def test_small_talk_skips_the_models(store, line):
+    answer, needs_model, outcome = store.prefilter_decision(line)
+    assert (answer, needs_model, outcome) == (None, False, "skipped")
+
+
+@pytest.mark.parametrize("question", [
+    "tell me about germny",
+    "what do you know about Itlay?",
+    "and inida?",
+])
+def test_misspelled_country_without_keyword_reaches_the_models(store, question):
+    assert store.prefilter_decision(question)[2] == "passed"
+
+
+@pytest.mark.parametrize("question", [question for question, unused_country, unused_column in LABELED_QUESTIONS])
+def test_corpus_questions_are_never_skipped(store, question):
+    assert store.prefilter_decision(question)[2] != "skipped"
+
+
+def test_statistic_with_misspelled_name_anywhere_reaches_the_models(store):
+    assert store.prefilter_decision("population of swedn please")[2] == "passed"
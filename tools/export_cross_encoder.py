@@ -0,0 +1,161 @@
+"""
+Exports the intent cross-encoder to ONNX (plus an int8-quantized copy) and validates it against PyTorch.
+
+Validation scores every (question, column definition) pair of the labeled corpus with the original
+model and with each faster backend, reporting score drift, per-question latency and every question
+whose chosen column changed. The exit status is 1 if any column changed.
+
+The bot's --intent-backend picks one of: "torch" (the sentence-transformers CrossEncoder in full
+precision), "torch-int8" (its Linear layers dynamically quantized), or "onnx"/"onnx-int8" (this export,
+needing only onnxruntime and tokenizers at run time). --inference-threads caps the model's CPU threads;
+with --workers each worker gets its share of the cores.
+
+Needs torch, sentence-transformers, onnx, onnxruntime and tokenizers. Run from the repository root:
+    python -m tools.export_cross_encoder --output data/cross-encoder-onnx
+    python -m tools.export_cross_encoder --output data/cross-encoder-onnx --validate-only --threads 4
+Then start the bot with --intent-backend onnx-int8.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder
+from benchmarks.question_corpus import LABELED_QUESTIONS
+from chatbot.country_information_store import CountryInformationStore
+from chatbot.cross_encoder_backends import EXPORT_CONFIG_NAME, OnnxCrossEncoder, quantize_cross_encoder
+from chatbot.intent_engines import CrossEncoderIntentEngine
+
+
+DEFAULT_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L6-v2"
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class LogitsOnly(torch.nn.Module):
+    """Returns just the logits tensor, which is all the exported graph needs to output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+
+def export(model_name, output_dir, opset, quantize):
+    os.makedirs(output_dir, exist_ok=True)
+    cross_encoder = CrossEncoder(model_name)
+    tokenizer = cross_encoder.tokenizer
+    sample = tokenizer(["How many people live in Italy?"], ["The number of people living in the country."],
+                       return_tensors="pt")
+    input_names = [name for name in INPUT_NAMES if name in sample]
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(LogitsOnly(cross_encoder.model.eval()), ({name: sample[name] for name in input_names},),
+                          model_path, input_names=input_names, output_names=["logits"], opset_version=opset,
+                          do_constant_folding=True,
+                          dynamic_axes=dict({name: {0: "batch", 1: "sequence"} for name in input_names},
+                                            logits={0: "batch"}))
+    # tokenizer.json is what OnnxCrossEncoder reads; the rest keeps the directory loadable by transformers
+    tokenizer.save_pretrained(output_dir)
+
+    quantized_model = None
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_model = "model.int8.onnx"
+        quantize_dynamic(model_path, os.path.join(output_dir, quantized_model), weight_type=QuantType.QInt8)
+
+    config = {
+        "model_name": model_name,
+        "model": "model.onnx",
+        "quantized_model": quantized_model,
+        "max_length": getattr(cross_encoder, "max_length", None) or min(tokenizer.model_max_length, 512),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        # CrossEncoder applies a sigmoid when the model has a single label
+        "activation": "sigmoid" if cross_encoder.config.num_labels == 1 else None,
+        "opset": opset,
+    }
+    with open(os.path.join(output_dir, EXPORT_CONFIG_NAME), "w", encoding="utf-8") as config_file:
+        json.dump(config, config_file, indent=2)
+    for file_name in filter(None, (config["model"], quantized_model)):
+        size_mb = os.path.getsize(os.path.join(output_dir, file_name)) / (1024 * 1024)
+        print(f"Exported {file_name} ({size_mb:.1f} MB)")
+
+
+def score_all(cross_encoder, questions, definitions):
+    pairs = [(question, definition) for question in questions for definition in definitions]
+    return np.asarray(cross_encoder.predict(pairs)).reshape(len(questions), len(definitions))
+
+
+def time_questions(cross_encoder, questions, definitions):
+    engine = CrossEncoderIntentEngine(cross_encoder, definitions)
+    # One untimed call so lazy initialization (session creation, allocator warm-up) isn't counted
+    engine.best_index(questions[0])
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        engine.best_index(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def validate(model_name, output_dir, threads):
+    if threads:
+        torch.set_num_threads(threads)
+    definitions = [entry["definition"] for entry in CountryInformationStore.COLUMN_BLUEPRINT]
+    column_order = [entry["column"] for entry in CountryInformationStore.COLUMN_BLUEPRINT]
+    questions = [question for question, unused_country, unused_column in LABELED_QUESTIONS]
+
+    reference = CrossEncoder(model_name)
+    reference_scores = score_all(reference, questions, definitions)
+    reference_columns = np.argmax(reference_scores, axis=1)
+    baseline_ms = time_questions(reference, questions, definitions)
+    print(f"{len(questions)} questions x {len(definitions)} columns, {threads or 'default'} threads")
+    print(f"{'backend':<12}{'p50 ms':>10}{'speedup':>10}{'max diff':>10}{'columns same':>14}")
+    print(f"{'torch':<12}{baseline_ms:>10.2f}{1.0:>9.1f}x{0.0:>10.4f}{len(questions):>10}/{len(questions)}")
+
+    backends = [("torch-int8", lambda: quantize_cross_encoder(CrossEncoder(model_name))),
+                ("onnx", lambda: OnnxCrossEncoder(output_dir, threads=threads))]
+    with open(os.path.join(output_dir, EXPORT_CONFIG_NAME), encoding="utf-8") as config_file:
+        if json.load(config_file)["quantized_model"]:
+            backends.append(("onnx-int8", lambda: OnnxCrossEncoder(output_dir, quantized=True, threads=threads)))
+
+    changed_total = 0
+    for backend, load in backends:
+        cross_encoder = load()
+        scores = score_all(cross_encoder, questions, definitions)
+        columns = np.argmax(scores, axis=1)
+        changed = [position for position in range(len(questions)) if columns[position] != reference_columns[position]]
+        changed_total += len(changed)
+        backend_ms = time_questions(cross_encoder, questions, definitions)
+        print(f"{backend:<12}{backend_ms:>10.2f}{baseline_ms / backend_ms:>9.1f}x"
+              f"{float(np.max(np.abs(scores - reference_scores))):>10.4f}{len(questions) - len(changed):>10}/{len(questions)}")
+        for position in changed:
+            print(f"  changed: {questions[position]!r} {column_order[reference_columns[position]]} -> "
+                  f"{column_order[columns[position]]}")
+    return changed_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--output", required=True, help="directory for the exported model, tokenizer and config")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8-quantized ONNX copy")
+    parser.add_argument("--validate-only", action="store_true", help="validate an earlier export without exporting")
+    parser.add_argument("--threads", type=int, help="CPU threads for every backend during validation")
+    arguments = parser.parse_args()
+
+    if not arguments.validate_only:
+        export(arguments.model, arguments.output, arguments.opset, not arguments.no_quantize)
+    # A non-zero exit status lets a script refuse an export that changes answers
+    sys.exit(1 if validate(arguments.model, arguments.output, arguments.threads) else 0)
+
+
+if __name__ == "__main__":
+    main()